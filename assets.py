@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+
+"""assets.py -- build the fingerprinted static bundles of the web client
+
+Bundles the stylesheets and scripts between the build:css / build:js markers
+of templates/index.html into one minified, content-hashed file each under
+static/dist/ (served with far-future expiration), dropping the CSS rules whose
+classes the client never uses and inlining static/partials/*.html into the
+Angular template cache. The page pointing at them is written to
+templates/dist/index.html; rebuild after changing any of the sources.
+
+    python assets.py            build static/dist/ & templates/dist/index.html
+    python assets.py --check    exit 1 if the build output is out of date
+
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SOURCE_INDEX = 'templates/index.html'
+BUILT_INDEX = 'templates/dist/index.html'
+DIST_DIR = 'static/dist'
+DIST_URL = '/dist/'
+PARTIALS = 'static/partials/*.html'
+PARTIALS_URL = '/partials/'
+# url prefix -> directory, as mapped by the static_dir handlers in app.yaml
+STATIC_DIRS = {
+    '/css/': 'static/bootstrap/css/',
+    '/js/': 'static/js/',
+}
+
+# classes set at runtime by bootstrap.js and the ui-bootstrap templates
+# (both loaded from CDNs, so not scanned) for the widgets the client uses:
+# alerts, collapse, datepicker popup, modal, pagination and tabset
+RUNTIME_CLASSES = set('''
+    active disabled open in fade collapse collapsing modal-open
+    alert close
+    modal modal-backdrop modal-dialog modal-content
+    dropdown-menu table btn btn-default btn-sm btn-info btn-group
+    pull-left pull-right text-center text-muted text-info
+    glyphicon glyphicon-chevron-left glyphicon-chevron-right
+    pagination pager previous next
+    nav nav-tabs nav-pills nav-stacked tab-content tab-pane
+'''.split())
+
+BUILD_BLOCK = re.compile(
+    r'([ \t]*)<!-- build:(css|js) ([\w.]+).*?-->(.*?)<!-- endbuild -->',
+    re.S)
+
+
+def _read(path):
+    with io.open(os.path.join(HERE, path), encoding='utf-8') as f:
+        return f.read()
+
+
+def _fingerprint(name, content):
+    """Return name with the content hash inserted before its extension."""
+    base, ext = os.path.splitext(name)
+    return '%s.%s%s' % (base, hashlib.md5(content.encode('utf-8')).hexdigest()[:10], ext)
+
+
+# - - - CSS - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def _collapse(text):
+    """Collapse whitespace runs outside quoted strings to one space."""
+    parts = re.split(r'("[^"]*"|\'[^\']*\')', text)
+    return ''.join(part if i % 2 else re.sub(r'\s+', ' ', part)
+                   for i, part in enumerate(parts)).strip()
+
+
+def _cssStatements(css):
+    """Yield (prelude, body) of the top level statements of comment-free
+    css; body is None for statements ending in ';' (like @import)."""
+    pos = 0
+    while True:
+        brace, semi = css.find('{', pos), css.find(';', pos)
+        if css[pos:].lstrip().startswith('@') and 0 <= semi and \
+                (brace < 0 or semi < brace):
+            yield css[pos:semi].strip(), None
+            pos = semi + 1
+            continue
+        if brace < 0:
+            return
+        depth, end = 0, brace
+        while True:
+            depth += {'{': 1, '}': -1}.get(css[end], 0)
+            if depth == 0:
+                break
+            end += 1
+        yield css[pos:brace].strip(), css[brace + 1:end]
+        pos = end + 1
+
+
+def _declarations(body):
+    """Return minified declarations."""
+    minified = []
+    for declaration in body.split(';'):
+        declaration = _collapse(declaration)
+        if ':' in declaration:
+            name, value = declaration.split(':', 1)
+            declaration = '%s:%s' % (name.strip(), value.strip())
+        if declaration:
+            minified.append(declaration)
+    return ';'.join(minified)
+
+
+def _selectorUsed(selector, used):
+    """Return True if every class in the selector is in used."""
+    unquoted = re.sub(r'"[^"]*"|\'[^\']*\'', '', selector)
+    return all(c in used
+               for c in re.findall(r'\.(-?[_a-zA-Z][\w-]*)', unquoted))
+
+
+def minifyCss(css, used=None):
+    """Return comment-free css minified, leaving out selectors with classes
+    not in used (None keeps every selector)."""
+    out = []
+    for prelude, body in _cssStatements(css):
+        prelude = _collapse(prelude)
+        if body is None:
+            out.append(prelude + ';')
+        elif prelude.startswith(('@media', '@supports')):
+            inner = minifyCss(body, used)
+            if inner:
+                out.append('%s{%s}' % (prelude, inner))
+        elif prelude.startswith('@'):
+            # @font-face, @keyframes, @-ms-viewport...: kept whole
+            inner = minifyCss(body) if '{' in body else _declarations(body)
+            out.append('%s{%s}' % (prelude, inner))
+        else:
+            selectors = [s for s in (_collapse(s) for s in prelude.split(','))
+                         if used is None or _selectorUsed(s, used)]
+            if selectors:
+                out.append('%s{%s}' % (','.join(selectors), _declarations(body)))
+    return ''.join(out)
+
+
+def usedClasses(sources):
+    """Return every word of the html/js sources that may be a class name,
+    plus classes built from templates like alert-{{alertStatus}} with the
+    values scripts assign (alertStatus = 'success')."""
+    text = '\n'.join(sources)
+    used = set(re.findall(r'[\w-]+', text)) | RUNTIME_CLASSES
+    for prefix, name in re.findall(r'([\w-]+-)\{\{\s*(\w+)\s*\}\}', text):
+        for value in re.findall(r'\b%s\s*=\s*[\'"]([\w-]+)[\'"]' % name, text):
+            used.add(prefix + value)
+    return used
+
+
+def bundleCss(paths, used):
+    """Return the minified bundle of the stylesheets; license comments
+    (/*! ... */) are kept at its top."""
+    css = '\n'.join(_read(path) for path in paths)
+    licenses = re.findall(r'/\*!.*?\*/', css, re.S)
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    # @import must precede all other rules, so keep it first
+    imports = re.findall(r'@import[^;]*;', css)
+    css = re.sub(r'@import[^;]*;', '', css)
+    return '\n'.join(licenses + [''.join(imports) + minifyCss(css, used)]) + '\n'
+
+
+# - - - JS - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+JS_REGEX_AFTER = '(,=:[!&|?{};+-*%<>~^'
+JS_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'new',
+                     'delete', 'void', 'throw')
+
+
+def _isWord(c):
+    return c.isalnum() or c in '_$' or ord(c) > 127
+
+
+def _regexAllowed(before):
+    """Return True if a '/' after the code before starts a regex literal
+    rather than a division."""
+    before = before.rstrip()
+    if not before or before[-1] in JS_REGEX_AFTER:
+        return True
+    word = re.search(r'[\w$]+$', before)
+    return bool(word) and word.group() in JS_REGEX_KEYWORDS
+
+
+def minifyJs(js):
+    """Return js without comments and needless whitespace. Line breaks are
+    kept wherever automatic semicolon insertion may depend on them, and
+    names are left alone, so implicit Angular injection keeps working."""
+    out = []
+    i, n = 0, len(js)
+    while i < n:
+        c = js[i]
+        if c.isspace() or js.startswith(('//', '/*'), i):
+            # a run of whitespace & comments
+            j, newline = i, False
+            while j < n:
+                if js[j].isspace():
+                    newline = newline or js[j] == '\n'
+                    j += 1
+                elif js.startswith('//', j):
+                    j = js.find('\n', j)
+                    j = n if j < 0 else j
+                elif js.startswith('/*', j):
+                    end = js.index('*/', j + 2) + 2
+                    newline = newline or '\n' in js[j:end]
+                    j = end
+                else:
+                    break
+            prev = out[-1][-1] if out else ''
+            nxt = js[j] if j < n else ''
+            if not prev or not nxt:
+                pass
+            elif newline and prev not in '{;,([' and nxt not in '}])':
+                out.append('\n')
+            elif (_isWord(prev) and _isWord(nxt)) or \
+                    prev + nxt in ('++', '--', '//') or \
+                    (prev.isdigit() and nxt == '.'):
+                out.append(' ')
+            i = j
+        elif c in '"\'':
+            j = i + 1
+            while js[j] != c:
+                j += 2 if js[j] == '\\' else 1
+            out.append(js[i:j + 1])
+            i = j + 1
+        elif c == '/' and _regexAllowed(''.join(out[-40:])):
+            j, in_class = i + 1, False
+            while in_class or js[j] != '/':
+                if js[j] == '\\':
+                    j += 1
+                elif js[j] in '[]':
+                    in_class = js[j] == '['
+                j += 1
+            j += 1
+            while j < n and _isWord(js[j]):  # flags
+                j += 1
+            out.append(js[i:j])
+            i = j
+        else:
+            out.append(c)
+            i += 1
+    return ''.join(out) + '\n'
+
+
+def minifyHtml(html):
+    """Return html without comments and indentation."""
+    html = re.sub(r'<!--.*?-->', '', html, flags=re.S)
+    return re.sub(r'\n\s+', '\n', html).strip()
+
+
+def templateCacheJs(paths):
+    """Return a script putting the partials into the Angular template cache
+    under the URLs the routes and modals request them by."""
+    puts = ['$templateCache.put(%s,%s);' % (
+        json.dumps(PARTIALS_URL + os.path.basename(path)),
+        json.dumps(minifyHtml(_read(path))))
+        for path in paths]
+    return ("angular.module('conferenceApp').run(['$templateCache',"
+            "function($templateCache){\n%s\n}]);\n" % '\n'.join(puts))
+
+
+def bundleJs(paths, partials):
+    """Return the minified bundle of the scripts and partials."""
+    return ''.join(minifyJs(_read(path)) for path in paths) + \
+        templateCacheJs(partials)
+
+
+# - - - Build - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def _sourcePath(url):
+    for prefix, directory in STATIC_DIRS.items():
+        if url.startswith(prefix):
+            return directory + url[len(prefix):]
+    raise ValueError('No static_dir mapped for %s' % url)
+
+
+def build():
+    """Return {path: content} of every build output."""
+    index = _read(SOURCE_INDEX)
+    partials = sorted(os.path.relpath(p, HERE)
+                      for p in glob.glob(os.path.join(HERE, PARTIALS)))
+    scripts = re.findall(r'<script src="(/[^"]+)"', index)
+    used = usedClasses([index] + [_read(p) for p in partials] +
+                       [_read(_sourcePath(url)) for url in scripts
+                        if url.startswith(tuple(STATIC_DIRS))])
+    outputs = {}
+
+    def replace(match):
+        indent, kind, name, block = match.groups()
+        urls = re.findall(r'(?:href|src)="(/[^"]+)"', block)
+        paths = [_sourcePath(url) for url in urls]
+        if kind == 'css':
+            content = bundleCss(paths, used)
+            tag = '<link rel="stylesheet" href="%s">'
+        else:
+            content = bundleJs(paths, partials)
+            tag = '<script src="%s"></script>'
+        filename = _fingerprint(name, content)
+        outputs[os.path.join(DIST_DIR, filename)] = content
+        return indent + tag % (DIST_URL + filename)
+
+    outputs[BUILT_INDEX] = BUILD_BLOCK.sub(replace, index)
+    return outputs
+
+
+def write(outputs):
+    """Write the build outputs, removing bundles of earlier builds."""
+    for path in glob.glob(os.path.join(HERE, DIST_DIR, '*')):
+        if os.path.relpath(path, HERE) not in outputs:
+            os.remove(path)
+    for path, content in outputs.items():
+        directory = os.path.dirname(os.path.join(HERE, path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with io.open(os.path.join(HERE, path), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def check(outputs):
+    """Return the paths of build outputs missing or out of date."""
+    return sorted(path for path, content in outputs.items()
+                  if not os.path.exists(os.path.join(HERE, path)) or
+                  _read(path) != content)
+
+
+if __name__ == '__main__':
+    outputs = build()
+    if '--check' in sys.argv:
+        stale = check(outputs)
+        if stale:
+            sys.stderr.write('out of date, run assets.py: %s\n' % ', '.join(stale))
+            sys.exit(1)
+    else:
+        write(outputs)
+        for path in sorted(outputs):
+            sys.stdout.write('%8d  %s\n' % (len(outputs[path]), path))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""caching.py
+
+Udacity conference server-side Python App Engine memcache keys & helpers;
+    kept free of the endpoints/protorpc service stack so the cron and task
+    handlers in main.py can use them without loading the API
+
+"""
+
+import logging
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import Conference
+from models import Session
+
+MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT ANNOUNCEMENTS"
+MEMCACHE_FEAT_SPKR_KEY = "FEATURED SPEAKER"
+
+
+def cacheAnnouncement():
+    """Create Announcement & assign to memcache; used by
+    memcache cron job & putAnnouncement().
+    """
+    confs = Conference.query(ndb.AND(
+        Conference.seatsAvailable <= 5,
+        Conference.seatsAvailable > 0)
+    ).fetch(projection=[Conference.name])
+
+    if confs:
+        # If there are almost sold out conferences,
+        # format announcement and set it in memcache
+        announcement = '%s %s' % (
+            'Last chance to attend! The following conferences '
+            'are nearly sold out:',
+            ', '.join(conf.name for conf in confs))
+        memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
+    else:
+        # If there are no sold out conferences,
+        # delete the memcache announcements entry
+        announcement = ""
+        memcache.delete(MEMCACHE_ANNOUNCEMENTS_KEY)
+
+    return announcement
+
+
+def cacheFeaturedSpeaker(speaker):
+    """Set speaker as featured speaker in memcache if they give more than
+    one session; used by the set_featured_speaker task.
+    """
+    sessions = Session.query(Session.speaker == speaker).fetch(
+        projection=[Session.name])
+    if len(sessions) > 1:
+        cache_data = {}
+        cache_data['speaker'] = speaker
+        cache_data['sessionNames'] = [session.name for session in sessions]
+        if not memcache.set(MEMCACHE_FEAT_SPKR_KEY, cache_data):
+            logging.error('Memcache error: set op fail.')
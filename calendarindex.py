@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""calendarindex.py
+
+Udacity conference server-side Python App Engine conference calendar index;
+    per-week CalendarWeek buckets of the conference keys running in that
+    week, cached in memcache, so date range listings are a memcache read
+    plus one get_multi
+
+Conferences running longer than MAX_CALENDAR_WEEKS are kept in a single
+bucket read with every range instead of in each of their weeks.
+
+"""
+
+from datetime import timedelta
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import CalendarWeek
+from tracing import addTask
+
+MEMCACHE_CALENDAR_WEEK_KEY = "CALENDAR WEEK %s"
+# conferences running longer go to the LONG_BUCKET, read with every range
+MAX_CALENDAR_WEEKS = 12
+LONG_BUCKET = 'long'
+
+
+def weekStart(date):
+    """Return the Monday of the week of date."""
+    return date - timedelta(days=date.weekday())
+
+
+def weeksSpanned(startDate, endDate=None, limit=None):
+    """Return the week ids (Monday isoformat) from startDate to endDate,
+    at most limit of them."""
+    if not startDate:
+        return []
+    week = weekStart(startDate)
+    last = weekStart(max(endDate or startDate, startDate))
+    weeks = []
+    while week <= last and (limit is None or len(weeks) < limit):
+        weeks.append(week.isoformat())
+        week += timedelta(weeks=1)
+    return weeks
+
+
+def calendarBuckets(startDate, endDate=None):
+    """Return the ids of the buckets a conference is kept in: its weeks,
+    or the LONG_BUCKET if it runs longer than MAX_CALENDAR_WEEKS."""
+    weeks = weeksSpanned(startDate, endDate, limit=MAX_CALENDAR_WEEKS + 1)
+    return [LONG_BUCKET] if len(weeks) > MAX_CALENDAR_WEEKS else weeks
+
+
+@ndb.transactional()
+def _updateWeek(week, conf_key, add):
+    """Add or remove a conference key in a week bucket."""
+    bucket = CalendarWeek.get_by_id(week) or CalendarWeek(id=week)
+    present = conf_key in bucket.conferenceKeys
+    if add and not present:
+        bucket.conferenceKeys.append(conf_key)
+    elif not add and present:
+        bucket.conferenceKeys.remove(conf_key)
+    else:
+        return
+    bucket.put()
+
+
+def enqueueCalendarUpdate(conf_key, oldStartDate=None, oldEndDate=None,
+                          transactional=False):
+    """Add an update_calendar task re-indexing a conference; pass its dates
+    from before the change so it can be taken out of weeks it left.
+    """
+    params = {'websafeConferenceKey': conf_key.urlsafe()}
+    if oldStartDate:
+        params['oldStartDate'] = oldStartDate.isoformat()
+    if oldEndDate:
+        params['oldEndDate'] = oldEndDate.isoformat()
+    addTask('/tasks/update_calendar', params, transactional=transactional)
+
+
+def updateCalendar(conf_key, oldStartDate=None, oldEndDate=None):
+    """Move a conference from the weeks of its old dates to the weeks of
+    its current ones (none if it has been deleted).
+    """
+    conf = conf_key.get()
+    new_weeks = calendarBuckets(conf.startDate, conf.endDate) if conf else []
+    old_weeks = calendarBuckets(oldStartDate, oldEndDate)
+    changed = set(old_weeks) ^ set(new_weeks)
+    for week in changed:
+        _updateWeek(week, conf_key, week in new_weeks)
+    memcache.delete_multi([MEMCACHE_CALENDAR_WEEK_KEY % w for w in changed])
+
+
+def conferenceKeysBetween(startDate, endDate):
+    """Return keys of conferences possibly running between the dates, from
+    the cached week buckets and the long conferences."""
+    weeks = weeksSpanned(startDate, endDate) + [LONG_BUCKET]
+    cache_keys = dict((MEMCACHE_CALENDAR_WEEK_KEY % w, w) for w in weeks)
+    cached = memcache.get_multi(cache_keys.keys())
+
+    missing = [cache_keys[k] for k in cache_keys if k not in cached]
+    if missing:
+        buckets = ndb.get_multi([ndb.Key(CalendarWeek, w) for w in missing])
+        loaded = {}
+        for week, bucket in zip(missing, buckets):
+            loaded[MEMCACHE_CALENDAR_WEEK_KEY % week] = \
+                [k.urlsafe() for k in bucket.conferenceKeys] if bucket else []
+        memcache.set_multi(loaded)
+        cached.update(loaded)
+
+    websafeKeys = set()
+    for keys in cached.values():
+        websafeKeys.update(keys)
+    return [ndb.Key(urlsafe=k) for k in sorted(websafeKeys)]
@@ -13,18 +13,20 @@ created by wesc on 2014 apr 21
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 
+import functools
+import httplib
 import logging
+import operator
 import endpoints
 from protorpc import messages
 from protorpc import message_types
 from protorpc import remote
 
+from google.appengine.api import datastore_errors
 from google.appengine.api import memcache
-from google.appengine.api import urlfetch
 from google.appengine.ext import ndb
-from google.appengine.api import taskqueue
 
 from models import Profile
 from models import ProfileMiniForm
@@ -33,25 +35,98 @@ from models import TeeShirtSize
 from models import Conference
 from models import ConferenceForm
 from models import ConferenceForms
+from models import ConferenceSummaryForm
+from models import ConferenceSummaryForms
 from models import ConferenceQueryForm
 from models import ConferenceQueryForms
 from models import BooleanMessage
-from models import ConflictException
 from models import StringMessage
 from models import Session
 from models import SessionForm
 from models import SessionForms
+from models import SessionSummaryForm
+from models import SessionSummaryForms
+from models import WaitlistEntry
+from models import Attendance
 from models import SpeakerForm
+from models import PopularSessionForm
+from models import PopularSessionForms
+from models import ScheduledSessionForm
+from models import TimeSlotForm
+from models import ScheduleDayForm
+from models import ScheduleForm
+from models import FacetValueForm
+from models import FacetForm
+from models import FacetForms
+from models import WebsafeKeysForm
+from models import ConferenceLookupForm
+from models import ConferenceLookupForms
+from models import SessionLookupForm
+from models import SessionLookupForms
 
 
 from settings import WEB_CLIENT_ID
 
+from caching import MEMCACHE_ANNOUNCEMENTS_KEY
+from caching import MEMCACHE_FEAT_SPKR_KEY
+from caching import cacheAnnouncement
+
+from schedule import sessionInterval
+from schedule import formatMinutes
+from schedule import groupByDay
+from schedule import findConflicts
+from schedule import mergeBusy
+from schedule import freeGaps
+from schedule import fitsFree
+from schedule import getSessionIndex
+from schedule import clearSessionIndex
+
+from profilelists import attendanceKey
+from profilelists import attendedConferenceKeys
+from profilelists import attendedWebsafeKeys
+from profilelists import addWishlistItem
+from profilelists import removeWishlistItem
+from profilelists import wishlistSessionKeys
+from profilelists import hasLegacyLists
+from profilelists import migrateProfile
+from waitlist import waitlistKey
+from waitlist import enqueuePromotion
+
+from deletion import enqueueConferenceCleanup
+
+from calendarindex import conferenceKeysBetween
+from calendarindex import enqueueCalendarUpdate
+
+from facets import FACET_FIELDS
+from facets import facetValues
+from facets import enqueueFacetUpdate
+from facets import getFacetCounts
+from feeds import bumpFeed
+from feeds import conferenceFeedId
+from feeds import wishlistFeedId
+from feeds import resetWishlistToken
+from feeds import wishlistToken
+
+from popularity import changeInterest
+from popularity import getLeaderboard
+from keyresolver import decodeWebsafeKey
+from keyresolver import markConferenceDeleted
+from keyresolver import requireConference
+
+from ratelimit import admit
+from recommendations import popularConferencesKey
+from recommendations import similarConferencesKey
+from recommendations import userRecommendationsKey
+from tracing import TRACE_HEADER
+from tracing import addTask
+from tracing import installRpcHooks
+from tracing import startTrace
+from tracing import traceIdFromHeader
+
 from utils import getUserId
 
 EMAIL_SCOPE = endpoints.EMAIL_SCOPE
 API_EXPLORER_CLIENT_ID = endpoints.API_EXPLORER_CLIENT_ID
-MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT ANNOUNCEMENTS"
-MEMCACHE_FEAT_SPKR_KEY = "FEATURED SPEAKER"
 
 DEFAULTS = {
     "city": "Default City",
@@ -74,8 +149,43 @@ FIELDS = {
     'TOPIC': 'topics',
     'MONTH': 'month',
     'MAX_ATTENDEES': 'maxAttendees',
+    'START_DATE': 'startDate',
+    'END_DATE': 'endDate',
+}
+
+# fields that may take an inequality filter run by the datastore; topics is a
+# repeated property and every composite index over it costs one row per
+# topic on each put
+INEQUALITY_FIELDS = ('city', 'month', 'maxAttendees')
+
+# fields taking range (inequality) filters only; values are YYYY-MM-DD. They
+# are served by the calendar index or applied in memory, so they need no
+# composite index per filter field
+DATE_FIELDS = ('startDate', 'endDate')
+# longest date window read from the calendar index
+CALENDAR_QUERY_MAX_DAYS = 366
+
+MEMORY_OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '!=': operator.ne,
 }
 
+# indexed properties served by projection for the listing (summary) endpoints;
+# repeated properties are left out as they would multiply projected results
+CONF_SUMMARY_PROPERTIES = ('name', 'organizerUserId', 'city', 'startDate',
+                           'maxAttendees', 'seatsAvailable')
+SESSION_SUMMARY_PROPERTIES = ('name', 'speaker', 'duration', 'date',
+                              'startTime')
+
+# most websafe keys accepted by the multi-get endpoints
+MAX_LOOKUP_KEYS = 300
+
+UPCOMING_DEFAULT_DAYS = 30
+UPCOMING_MAX_DAYS = 90
+
 CONF_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey=messages.StringField(1),
@@ -103,11 +213,62 @@ SPEAKER_GET_REQUEST = endpoints.ResourceContainer(
     speaker=messages.StringField(1, required=True),
 )
 
+FACETS_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    field=messages.StringField(1),
+    value=messages.StringField(2),
+)
+
+UPCOMING_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    days=messages.IntegerField(1),
+)
+
 WISHLIST_POST_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeSessionKey=messages.StringField(1, required=True),
 )
 
+
+class ConflictException(endpoints.ServiceException):
+    """ConflictException -- exception mapped to HTTP 409 response"""
+    http_status = httplib.CONFLICT
+
+
+class RateLimitedException(endpoints.ServiceException):
+    """RateLimitedException -- exception mapped to HTTP 503 response; the
+    endpoints proxy passes 503 through but turns 429 into 404"""
+    http_status = httplib.SERVICE_UNAVAILABLE
+
+
+def rateLimited(method):
+    """Decorator rejecting calls of a mutating endpoint beyond the per user
+    and per conference rate limits, before any datastore work."""
+    @functools.wraps(method)
+    def wrapper(self, request):
+        idents = {}
+        user = endpoints.get_current_user()
+        if user:
+            idents['user'] = getUserId(user)
+        if getattr(request, 'websafeConferenceKey', None):
+            idents['conference'] = request.websafeConferenceKey
+        elif getattr(request, 'websafeSessionKey', None):
+            # the session's parent; bad keys are left to the endpoint
+            try:
+                idents['conference'] = ndb.Key(
+                    urlsafe=request.websafeSessionKey).parent().urlsafe()
+            except Exception:
+                pass
+        scope = admit(method.__name__, idents)
+        if scope:
+            raise RateLimitedException(
+                'Too many requests for this %s, try again later.' % scope)
+        return method(self, request)
+    return wrapper
+
+
+installRpcHooks()
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 @endpoints.api( name='conference',
@@ -117,11 +278,18 @@ WISHLIST_POST_REQUEST = endpoints.ResourceContainer(
 class ConferenceApi(remote.Service):
     """Conference API v0.1"""
 
+    def initialize_request_state(self, state):
+        """Start the trace of each API request, reusing the platform's
+        trace ID when the request carries one."""
+        super(ConferenceApi, self).initialize_request_state(state)
+        headers = getattr(state, 'headers', None) or {}
+        startTrace(traceIdFromHeader(headers.get(TRACE_HEADER)))
+
 # - - - Conference objects - - - - - - - - - - - - - - - - -
 
-    def _copyConferenceToForm(self, conf, displayName):
+    def _copyConferenceToForm(self, conf, displayName, form=ConferenceForm):
         """Copy relevant fields from Conference to ConferenceForm."""
-        cf = ConferenceForm()
+        cf = form()
         for field in cf.all_fields():
             if hasattr(conf, field.name):
                 # convert Date to date string; just copy others
@@ -186,10 +354,11 @@ class ConferenceApi(remote.Service):
         # create Conference & return (modified) ConferenceForm
         # send confirmation email to organizer
         Conference(**data).put()
-        taskqueue.add(params={'email': user.email(),
-                              'conferenceInfo': repr(request)},
-                      url='/tasks/send_confirmation_email'
-                      )
+        enqueueCalendarUpdate(c_key)
+        enqueueFacetUpdate(set(), facetValues(data))
+        addTask('/tasks/send_confirmation_email',
+                {'email': user.email(),
+                 'conferenceInfo': repr(request)})
 
         return request
 
@@ -204,7 +373,7 @@ class ConferenceApi(remote.Service):
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
 
         # update existing conference
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        conf = decodeWebsafeKey(request.websafeConferenceKey, Conference).get()
         # check that conference exists
         if not conf:
             raise endpoints.NotFoundException(
@@ -215,6 +384,11 @@ class ConferenceApi(remote.Service):
             raise endpoints.ForbiddenException(
                 'Only the owner can update the conference.')
 
+        seats = conf.seatsAvailable
+        maxAttendees = conf.maxAttendees
+        startDate, endDate = conf.startDate, conf.endDate
+        facets = facetValues(conf)
+
         # Not getting all the fields, so don't create a new object; just
         # copy relevant fields from ConferenceForm to Conference object
         for field in request.all_fields():
@@ -228,12 +402,41 @@ class ConferenceApi(remote.Service):
                         conf.month = data.month
                 # write to Conference object
                 setattr(conf, field.name, data)
+
+        # resizing the conference frees or takes away seats
+        if request.seatsAvailable is None and conf.maxAttendees != maxAttendees:
+            conf.seatsAvailable = max(
+                0, (seats or 0) + (conf.maxAttendees or 0) - (maxAttendees or 0))
         conf.put()
+        if conf.seatsAvailable > (seats or 0):
+            # hand the new seats to waitlisted users
+            enqueuePromotion(conf.key, transactional=True)
+        if (conf.startDate, conf.endDate) != (startDate, endDate):
+            enqueueCalendarUpdate(conf.key, startDate, endDate,
+                                  transactional=True)
+        if facetValues(conf) != facets:
+            enqueueFacetUpdate(facets, facetValues(conf), transactional=True)
+        ndb.get_context().call_on_commit(
+            lambda: bumpFeed(conferenceFeedId(conf.key)))
         prof = ndb.Key(Profile, user_id).get()
         return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
 
 # --Conference related endpoints --------------------------------------------
 
+    def _keysFromWebsafe(self, websafeKeys, model):
+        """Decode websafe keys, checking locally that they are keys of model."""
+        if len(websafeKeys) > MAX_LOOKUP_KEYS:
+            raise endpoints.BadRequestException(
+                'At most %d keys can be looked up at once.' % MAX_LOOKUP_KEYS)
+        return [decodeWebsafeKey(websafeKey, model) for websafeKey in websafeKeys]
+
+    def _getMultiOrdered(self, keys):
+        """Return entities for keys in the same order, None where missing,
+        fetching each distinct key once."""
+        distinct = list(set(keys))
+        found = dict(zip(distinct, ndb.get_multi(distinct)))
+        return [found[key] for key in keys]
+
     @endpoints.method(ConferenceForm, ConferenceForm, path='conference',
                       http_method='POST', name='createConference')
     def createConference(self, request):
@@ -247,17 +450,55 @@ class ConferenceApi(remote.Service):
         """Update conference w/provided fields & return w/updated info."""
         return self._updateConferenceObject(request)
 
+    @ndb.transactional()
+    def _deleteConferenceObject(self, request):
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+
+        conf = decodeWebsafeKey(request.websafeConferenceKey, Conference).get()
+        # check that conference exists
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conf found with key: %s' % request.websafeConferenceKey)
+
+        # check that user is owner
+        if user_id != conf.organizerUserId:
+            raise endpoints.ForbiddenException(
+                'Only the owner can delete the conference.')
+
+        # the conference is gone as of this commit; sessions, waitlist and
+        # profile references are cleaned up by chained tasks
+        conf.key.delete()
+        ctx = ndb.get_context()
+        ctx.call_on_commit(lambda: markConferenceDeleted(conf.key))
+        ctx.call_on_commit(lambda: bumpFeed(conferenceFeedId(conf.key)))
+        enqueueConferenceCleanup(conf.key, transactional=True)
+        enqueueCalendarUpdate(conf.key, conf.startDate, conf.endDate,
+                              transactional=True)
+        enqueueFacetUpdate(facetValues(conf), set(), transactional=True)
+        return BooleanMessage(data=True)
+
+    @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
+                      path='conference/{websafeConferenceKey}/delete',
+                      http_method='POST', name='deleteConference')
+    def deleteConference(self, request):
+        """Delete conference along with its sessions & registrations."""
+        return self._deleteConferenceObject(request)
+
     @endpoints.method(CONF_GET_REQUEST, ConferenceForm,
                       path='conference/{websafeConferenceKey}',
                       http_method='GET', name='getConference')
     def getConference(self, request):
         """Return requested conference (by websafeConferenceKey)."""
-        # get Conference object from request; bail if not found
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        # get Conference object & organiser Profile (its parent) in one
+        # batch; bail if not found
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        conf, prof = ndb.get_multi([conf_key, conf_key.parent()])
         if not conf:
             raise endpoints.NotFoundException(
                 'No conf found with key: %s' % request.websafeConferenceKey)
-        prof = conf.key.parent().get()
         # return ConferenceForm
         return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
 
@@ -279,24 +520,115 @@ class ConferenceApi(remote.Service):
             items=[self._copyConferenceToForm(conf, getattr(prof, 'displayName')) for conf in confs]
         )
 
-    def _getQuery(self, request):
-        """Return formatted query from the submitted filters."""
+    @endpoints.method(WebsafeKeysForm, ConferenceLookupForms,
+                      path='conferences/by_keys',
+                      http_method='POST', name='getConferencesByKeys')
+    def getConferencesByKeys(self, request):
+        """Return conferences for websafe keys, in request order."""
+        keys = self._keysFromWebsafe(request.websafeKeys, Conference)
+        conferences = self._getMultiOrdered(keys)
+
+        # one get_multi for the distinct organisers
+        organisers = list(set(conf.key.parent() for conf in conferences if conf))
+        names = dict((prof.key, prof.displayName)
+                     for prof in ndb.get_multi(organisers) if prof)
+
+        return ConferenceLookupForms(items=[
+            ConferenceLookupForm(
+                websafeKey=websafeKey,
+                conference=self._copyConferenceToForm(
+                    conf, names.get(conf.key.parent())) if conf else None)
+            for websafeKey, conf in zip(request.websafeKeys, conferences)])
+
+    def _getQuery(self, inequality_filter, filters):
+        """Return formatted query from the formatted filters, along with
+        the filters left to apply in memory. Date filters are left to memory
+        unless nothing else filters the query; then the first one runs on
+        its field's built-in index, ordered by that field only."""
         q = Conference.query()
-        inequality_filter, filters = self._formatFilters(request.filters)
+        date_filters = [f for f in filters if f["field"] in DATE_FIELDS]
+        if date_filters and len(date_filters) == len(filters):
+            inequality_filter = date_filters[0]["field"]
 
         # If exists, sort on inequality filter first
         if not inequality_filter:
             q = q.order(Conference.name)
+        elif inequality_filter in DATE_FIELDS:
+            # ties are put in name order by _queryConferences
+            q = q.order(ndb.GenericProperty(inequality_filter))
         else:
             q = q.order(ndb.GenericProperty(inequality_filter))
             q = q.order(Conference.name)
 
+        memory_filters = []
         for filtr in filters:
-            if filtr["field"] in ["month", "maxAttendees"]:
-                filtr["value"] = int(filtr["value"])
+            # datastore takes inequality filters on one field only
+            if filtr["operator"] != "=" and filtr["field"] != inequality_filter:
+                memory_filters.append(filtr)
+                continue
             formatted_query = ndb.query.FilterNode(filtr["field"], filtr["operator"], filtr["value"])
             q = q.filter(formatted_query)
-        return q
+        return q, memory_filters
+
+    def _matchesFilter(self, conf, filtr):
+        """Return True if a conference matches a formatted filter."""
+        value = getattr(conf, filtr["field"])
+        if filtr["operator"] == "=":
+            # as in the datastore, a repeated property matches if any of
+            # its values does
+            if isinstance(value, list):
+                return filtr["value"] in value
+            return value == filtr["value"]
+        return value is not None and \
+            MEMORY_OPERATORS[filtr["operator"]](value, filtr["value"])
+
+    def _applyMemoryFilters(self, conferences, filters):
+        """Return the conferences matching all filters."""
+        for filtr in filters:
+            conferences = [conf for conf in conferences
+                           if self._matchesFilter(conf, filtr)]
+        return conferences
+
+    def _dateWindow(self, filters):
+        """Return the first & last day a conference matching the date
+        filters runs on at the latest & earliest; None where unbounded."""
+        first = last = None
+        for filtr in filters:
+            if filtr["field"] not in DATE_FIELDS:
+                continue
+            # a start or end on/after a day means running on/after it, and
+            # likewise before
+            if filtr["operator"] in ('>', '>='):
+                first = max(first, filtr["value"]) if first else filtr["value"]
+            elif filtr["operator"] in ('<', '<='):
+                last = min(last, filtr["value"]) if last else filtr["value"]
+        return first, last
+
+    def _queryConferences(self, request):
+        """Return the conferences matching the submitted filters, ordered
+        by the datastore inequality field (else the first date field), then
+        name. Date windows bounded on both sides, up to
+        CALENDAR_QUERY_MAX_DAYS long, are read from the calendar index."""
+        inequality_filter, filters = self._formatFilters(request.filters)
+        first, last = self._dateWindow(filters)
+        if first and last and (last - first).days <= CALENDAR_QUERY_MAX_DAYS:
+            # the week buckets (and the bucket of long conferences) hold
+            # every conference running in the window; all filters are
+            # checked in memory
+            conferences = [conf for conf in
+                           ndb.get_multi(conferenceKeysBetween(first, last))
+                           if conf]
+            memory_filters = filters
+        else:
+            query, memory_filters = self._getQuery(inequality_filter, filters)
+            conferences = query.fetch()
+        conferences = self._applyMemoryFilters(conferences, memory_filters)
+
+        date_fields = [f["field"] for f in filters if f["field"] in DATE_FIELDS]
+        if date_fields:
+            field = inequality_filter or date_fields[0]
+            conferences.sort(key=lambda conf: (getattr(conf, field), conf.name))
+        return conferences
 
     def _formatFilters(self, filters):
         """Parse, check validity and format user supplied filters."""
@@ -312,15 +644,28 @@ class ConferenceApi(remote.Service):
             except KeyError:
                 raise endpoints.BadRequestException("Filter contains invalid field or operator.")
 
+            try:
+                if filtr["field"] in ["month", "maxAttendees"]:
+                    filtr["value"] = int(filtr["value"])
+                elif filtr["field"] in DATE_FIELDS:
+                    filtr["value"] = datetime.strptime(filtr["value"][:10], "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                raise endpoints.BadRequestException(
+                    "Filter contains invalid value for field %s." % filtr["field"])
+
             # Every operation except "=" is an inequality
             if filtr["operator"] != "=":
-                # check if inequality operation has been used in previous filters
-                # disallow the filter if inequality was performed on a different field before
-                # track the field on which the inequality operation is performed
-                if inequality_field and inequality_field != filtr["field"]:
-                    raise endpoints.BadRequestException("Inequality filter is allowed on only one field.")
-                else:
+                if filtr["field"] not in INEQUALITY_FIELDS + DATE_FIELDS:
+                    raise endpoints.BadRequestException(
+                        "Inequality filter is not allowed on field %s." % filtr["field"])
+                # the first field with an inequality filter is filtered
+                # (and sorted) on by the datastore; inequality filters on
+                # other fields are applied in memory
+                if not inequality_field and filtr["field"] in INEQUALITY_FIELDS:
                     inequality_field = filtr["field"]
+            elif filtr["field"] in DATE_FIELDS:
+                raise endpoints.BadRequestException(
+                    "Only range filters are allowed on field %s." % filtr["field"])
 
             formatted_filters.append(filtr)
         return (inequality_field, formatted_filters)
@@ -331,7 +676,7 @@ class ConferenceApi(remote.Service):
                       name='queryConferences')
     def queryConferences(self, request):
         """Query for conferences."""
-        conferences = self._getQuery(request)
+        conferences = self._queryConferences(request)
 
         # need to fetch organiser displayName from profiles
         # get all keys and use get_multi for speed
@@ -349,27 +694,191 @@ class ConferenceApi(remote.Service):
                                      conferences]
         )
 
+    def _projectedResults(self, query, future):
+        """Return the results of a projection fetch of query, or the query's
+        whole entities while the projection's index is missing or still
+        building (as right after a deploy adding it)."""
+        try:
+            return future.get_result()
+        except datastore_errors.NeedIndexError:
+            logging.warning('No index serving projection of %s yet; '
+                            'loading entities instead.', query)
+            return query.fetch()
+
+    def _conferenceSummaryForms(self, conferences, names=None):
+        """Return ConferenceSummaryForms for (projected) Conference entities;
+        organiser display names are fetched unless given by user ID."""
+        if names is None:
+            # one get_multi for the distinct organisers of the listing
+            organisers = set(conf.organizerUserId for conf in conferences)
+            profiles = ndb.get_multi([ndb.Key(Profile, org) for org in organisers])
+            names = dict((prof.key.id(), prof.displayName)
+                         for prof in profiles if prof)
+
+        return ConferenceSummaryForms(
+            items=[self._copyConferenceToForm(conf, names.get(conf.organizerUserId),
+                                              ConferenceSummaryForm)
+                   for conf in conferences]
+        )
+
+    @endpoints.method(ConferenceQueryForms, ConferenceSummaryForms,
+                      path='queryConferenceSummaries',
+                      http_method='POST',
+                      name='queryConferenceSummaries')
+    def queryConferenceSummaries(self, request):
+        """Query for conferences, returning listing fields only."""
+        if request.filters:
+            # filtered queries are served by merge joins over the per-field
+            # indexes (or the calendar index); a projection would need one
+            # composite index per filter combination, so load the entities
+            conferences = self._queryConferences(request)
+        else:
+            query = Conference.query().order(Conference.name)
+            conferences = self._projectedResults(
+                query, query.fetch_async(projection=CONF_SUMMARY_PROPERTIES))
+        return self._conferenceSummaryForms(conferences)
+
+    @endpoints.method(message_types.VoidMessage, ConferenceSummaryForms,
+                      path='getConferenceSummariesCreated',
+                      http_method='POST', name='getConferenceSummariesCreated')
+    def getConferenceSummariesCreated(self, request):
+        """Return conferences created by user, listing fields only."""
+        # make sure user is authed
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+        # create ancestor projection query for all key matches for this user
+        confs = Conference.query(ancestor=ndb.Key(Profile, user_id))
+        confs = self._projectedResults(confs, confs.fetch_async(
+            projection=CONF_SUMMARY_PROPERTIES))
+        prof = ndb.Key(Profile, user_id).get()
+        return ConferenceSummaryForms(
+            items=[self._copyConferenceToForm(conf, getattr(prof, 'displayName'),
+                                              ConferenceSummaryForm)
+                   for conf in confs]
+        )
+
+    @endpoints.method(FACETS_GET_REQUEST, FacetForms,
+                      path='conferences/facets',
+                      http_method='GET', name='getConferenceFacets')
+    def getConferenceFacets(self, request):
+        """Return conference counts per city, topic & month, optionally
+        among the conferences matching one filter (field & value)."""
+        scope = u''
+        if request.field:
+            field = FIELDS.get(request.field)
+            if field not in FACET_FIELDS or not request.value:
+                raise endpoints.BadRequestException(
+                    "Facets can be narrowed by CITY, TOPIC or MONTH with a value.")
+            scope = u'%s=%s' % (field, request.value)
+
+        # map field names back to the filter names clients use
+        names = dict((v, k) for k, v in FIELDS.items())
+        counts = getFacetCounts(scope)
+        return FacetForms(facets=[
+            FacetForm(field=names[field], values=[
+                FacetValueForm(value=value, count=count)
+                for value, count in sorted(counts[field].items(),
+                                           key=lambda vc: (-vc[1], vc[0]))])
+            for field in FACET_FIELDS if field in counts])
+
+    @endpoints.method(UPCOMING_GET_REQUEST, ConferenceSummaryForms,
+                      path='conferences/upcoming',
+                      http_method='GET', name='getUpcomingConferences')
+    def getUpcomingConferences(self, request):
+        """Return conferences running in the next days (default 30), by
+        start date; served from the calendar index."""
+        days = min(request.days or UPCOMING_DEFAULT_DAYS, UPCOMING_MAX_DAYS)
+        today = datetime.now().date()
+        last = today + timedelta(days=days)
+
+        # the week buckets hold every conference running in those weeks;
+        # keep those overlapping the requested days
+        conferences = [conf for conf in
+                       ndb.get_multi(conferenceKeysBetween(today, last))
+                       if conf and conf.startDate and conf.startDate <= last
+                       and (conf.endDate or conf.startDate) >= today]
+        conferences.sort(key=lambda conf: (conf.startDate, conf.name))
+        return self._conferenceSummaryForms(conferences)
+
+    @endpoints.method(CONF_GET_REQUEST, ConferenceSummaryForms,
+                      path='conferences/recommended',
+                      http_method='GET', name='getRecommendedConferences')
+    def getRecommendedConferences(self, request):
+        """Return conferences similar to websafeConferenceKey if given, else
+        recommended for the user (the most attended ones until the user has
+        recommendations); precomputed by the build_recommendations cron."""
+        if request.websafeConferenceKey:
+            rec_keys = [similarConferencesKey(decodeWebsafeKey(
+                request.websafeConferenceKey, Conference))]
+        else:
+            user = endpoints.get_current_user()
+            if not user:
+                raise endpoints.UnauthorizedException('Authorization required')
+            rec_keys = [userRecommendationsKey(getUserId(user)),
+                        popularConferencesKey()]
+        recs = [rec for rec in ndb.get_multi(rec_keys) if rec]
+        conf_keys = recs[0].conferenceKeys if recs else []
+
+        # the conferences and their organisers in one get_multi
+        organisers = list(set(key.parent() for key in conf_keys))
+        entities = ndb.get_multi(conf_keys + organisers)
+        names = dict((prof.key.id(), prof.displayName)
+                     for prof in entities[len(conf_keys):] if prof)
+        # skip conferences deleted since the lists were built
+        return self._conferenceSummaryForms(
+            [conf for conf in entities[:len(conf_keys)] if conf], names)
+
+    @endpoints.method(CONF_GET_REQUEST, PopularSessionForms,
+                      path='conference/{websafeConferenceKey}/sessions/popular',
+                      http_method='GET', name='getPopularSessions')
+    def getPopularSessions(self, request):
+        """Return a conference's most wishlisted sessions with their
+        wishlist counts, from the incrementally updated leaderboard."""
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        requireConference(conf_key)
+        entries = getLeaderboard(conf_key)
+        sessions = ndb.get_multi([key for key, _ in entries])
+        return PopularSessionForms(items=[
+            PopularSessionForm(session=self._copySessionToForm(session),
+                               interested=count)
+            for session, (_, count) in zip(sessions, entries) if session])
+
     @endpoints.method(CONF_GET_REQUEST, SessionForms,
                       path='conference/{websafeConferenceKey}/sessions',
                       http_method='GET', name='getConferenceSessions')
     def getConferenceSessions(self, request):
         """Given a conference, returns all sessions."""
 
-        # copy ConferenceForm/ProtoRPC Message into dict
-        data = {field.name: getattr(request, field.name) for field in request.all_fields()}
-        # fetch conference
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
-        # check that conference exists
-        if not conf:
-            raise endpoints.NotFoundException(
-                'No conference found with key: %s' % request.websafeConferenceKey)
-        # create ancestor query for all key matches for this conference
-        sessions = Session.query(ancestor=conf.key).fetch()
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        # create ancestor query for all key matches for this conference,
+        # running while we check that the conference exists
+        sessions = Session.query(ancestor=conf_key).fetch_async()
+        requireConference(conf_key)
+        sessions = sessions.get_result()
         # return set of SessionForm objects per Session
         return SessionForms(
             items=[self._copySessionToForm(session) for session in sessions]
         )
 
+    @endpoints.method(CONF_GET_REQUEST, SessionSummaryForms,
+                      path='conference/{websafeConferenceKey}/sessions/summary',
+                      http_method='GET', name='getConferenceSessionSummaries')
+    def getConferenceSessionSummaries(self, request):
+        """Given a conference, returns listing fields of all sessions."""
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        # ancestor projection query, skipping the highlights text, running
+        # while we check that the conference exists
+        query = Session.query(ancestor=conf_key)
+        sessions = query.fetch_async(projection=SESSION_SUMMARY_PROPERTIES)
+        requireConference(conf_key)
+        sessions = self._projectedResults(query, sessions)
+        return SessionSummaryForms(
+            items=[self._copySessionToForm(session, SessionSummaryForm)
+                   for session in sessions]
+        )
+
     @endpoints.method(SESSION_GET_REQUEST, SessionForms,
                       path='conference/{websafeConferenceKey}/sessions/by_type/{sessionType}',
                       http_method='GET', name='getConferenceSessionsByType')
@@ -380,14 +889,13 @@ class ConferenceApi(remote.Service):
         # copy ConferenceForm/ProtoRPC Message into dict
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
         sessionType = data['sessionType']
-        # fetch existing conference
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
-        # check that conference exists
-        if not conf:
-            raise endpoints.NotFoundException(
-                'No conference found with key: %s' % request.websafeConferenceKey)
-        # create ancestor query for all key matches for this conference
-        sessions = Session.query(ancestor=conf.key).filter(Session.sessionType == sessionType)
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        # create ancestor query for all key matches for this conference,
+        # running while we check that the conference exists
+        sessions = Session.query(ancestor=conf_key)\
+                          .filter(Session.sessionType == sessionType).fetch_async()
+        requireConference(conf_key)
+        sessions = sessions.get_result()
         # return set of SessionForm objects per session
         return SessionForms(
             items=[self._copySessionToForm(session) for session in sessions]
@@ -403,14 +911,13 @@ class ConferenceApi(remote.Service):
         # copy ConferenceForm/ProtoRPC Message into dict
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
         sessionSpeaker = data['speaker']
-        # fetch existing conference
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
-        # check that conference exists
-        if not conf:
-            raise endpoints.NotFoundException(
-                'No conference found with key: %s' % request.websafeConferenceKey)
-        # create ancestor query for all key matches for this conference
-        sessions = Session.query(ancestor=conf.key).filter(Session.speaker == sessionSpeaker)
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        # create ancestor query for all key matches for this conference,
+        # running while we check that the conference exists
+        sessions = Session.query(ancestor=conf_key)\
+                          .filter(Session.speaker == sessionSpeaker).fetch_async()
+        requireConference(conf_key)
+        sessions = sessions.get_result()
 
         # return set of SessionForm objects per session
         return SessionForms(
@@ -431,15 +938,9 @@ class ConferenceApi(remote.Service):
         if not request.name:
             raise endpoints.BadRequestException("Session'name' field required")
 
-        # fetch and check conference
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
-        # check that conference exists
-        if not conf:
-            raise endpoints.NotFoundException(
-                'Conference not found for key: %s' % request.websafeConferenceKey)
-
-        # check that user is owner
-        if user_id != conf.organizerUserId:
+        # check that conference exists and that user is owner
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        if user_id != requireConference(conf_key):
             raise endpoints.ForbiddenException(
                 'You need to be the owner to add sessions.')
 
@@ -455,7 +956,7 @@ class ConferenceApi(remote.Service):
             data['startTime'] = datetime.strptime(data['startTime'][:5], "%H:%M").time()
 
         # make session key from conf key
-        p_key = conf.key
+        p_key = conf_key
 
         # allocate new session id with conf
         s_id = Session.allocate_ids(size=1, parent=p_key)[0]
@@ -466,24 +967,22 @@ class ConferenceApi(remote.Service):
         del data['websafeKey']
 
         Session(**data).put()
+        clearSessionIndex(p_key)
+        bumpFeed(conferenceFeedId(p_key))
 
         # Add to the task queue a task for setting cache
         # Task will check if speaker is in more than one session
         # If yes, will cache results
-
-        taskqueue.add(
-            params={
-                'confKey': p_key,
-                'speaker': data['speaker']
-            },
-            url='/tasks/set_featured_speaker'
-        )
+        addTask('/tasks/set_featured_speaker', {
+            'confKey': p_key,
+            'speaker': data['speaker']
+        })
 
         return request
 
-    def _copySessionToForm(self, session):
+    def _copySessionToForm(self, session, form=SessionForm):
         """Copy relevant fields from Session to SessionForm."""
-        sf = SessionForm()
+        sf = form()
         for field in sf.all_fields():
             if hasattr(session, field.name):
                 # convert Date and Time to date string; just copy others
@@ -501,6 +1000,7 @@ class ConferenceApi(remote.Service):
     @endpoints.method(SessionForm, SessionForm,
                       path='sessions', 
                       http_method='POST', name='createSession')
+    @rateLimited
     def createSession(self, request):
         """create new session"""
         return self._createSessionObject(request)
@@ -521,25 +1021,32 @@ class ConferenceApi(remote.Service):
             items=[self._copySessionToForm(session) for session in sessions]
         )
 
+    @endpoints.method(WebsafeKeysForm, SessionLookupForms,
+                      path='sessions/by_keys',
+                      http_method='POST', name='getSessionsByKeys')
+    def getSessionsByKeys(self, request):
+        """Return sessions for websafe keys, in request order."""
+        keys = self._keysFromWebsafe(request.websafeKeys, Session)
+        sessions = self._getMultiOrdered(keys)
+        return SessionLookupForms(items=[
+            SessionLookupForm(
+                websafeKey=websafeKey,
+                session=self._copySessionToForm(session) if session else None)
+            for websafeKey, session in zip(request.websafeKeys, sessions)])
+
     @endpoints.method(CONF_GET_REQUEST, SessionForms,
                       http_method='GET', name='getConferenceSessionsToDate')
     def getConferenceSessionsToDate(self, request):
         """Returns a conference's sessions to date sorted by date & time."""
 
-        # copy ConferenceForm/ProtoRPC Message into dict
-        data = {field.name: getattr(request, field.name) for field in request.all_fields()}
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
 
-        # fetch existing conference
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
-
-        # check that conference exists
-        if not conf:
-            raise endpoints.NotFoundException(
-                'No conference found with key: %s' % request.websafeConferenceKey)
-
-        sessions = Session.query(ancestor=conf.key)\
+        # start the query while checking that the conference exists
+        sessions = Session.query(ancestor=conf_key)\
                           .filter(Session.date <= datetime.now())\
-                          .order(Session.date, Session.startTime)
+                          .order(Session.date, Session.startTime).fetch_async()
+        requireConference(conf_key)
+        sessions = sessions.get_result()
 
         # return set of SessionForm objects per Session
         return SessionForms(
@@ -559,6 +1066,7 @@ class ConferenceApi(remote.Service):
                     setattr(pf, field.name, getattr(TeeShirtSize, getattr(prof, field.name)))
                 else:
                     setattr(pf, field.name, getattr(prof, field.name))
+        pf.conferenceKeysToAttend = attendedWebsafeKeys(prof.key)
         pf.check_initialized()
         return pf
 
@@ -581,6 +1089,9 @@ class ConferenceApi(remote.Service):
                 teeShirtSize=str(TeeShirtSize.NOT_SPECIFIED),
             )
             profile.put()
+        elif hasLegacyLists(profile):
+            # first load since the lists moved into child entities
+            profile = migrateProfile(p_key)
 
         return profile      # return Profile
 
@@ -614,6 +1125,7 @@ class ConferenceApi(remote.Service):
 
     @endpoints.method(WISHLIST_POST_REQUEST, SessionForm,
                      http_method='POST', name='addSessionToWishlist')
+    @rateLimited
     def addSessionToWishlist(self, request):
         """Adds a session to a user's wishlist"""
         user = endpoints.get_current_user()
@@ -621,23 +1133,41 @@ class ConferenceApi(remote.Service):
             raise endpoints.UnauthorizedException('Authorization required')
 
         # fetch and check session
-        session = ndb.Key(urlsafe=request.websafeSessionKey).get()
+        session = decodeWebsafeKey(request.websafeSessionKey, Session).get()
         # check that session exists
         if not session:
             raise endpoints.NotFoundException(
                 'No session found with key: %s' % request.websafeSessionKey)
         # fetch profile
         prof = self._getProfileFromUser()
-        # check if session already added to wishlist
-        if session.key in prof.sessionWishlist:
+        # add to the wishlist unless already there
+        if not addWishlistItem(prof.key, session.key):
             raise endpoints.BadRequestException(
                 'Session already saved to wishlist: %s' % request.websafeSessionKey)
-        # append to user profile's wishlist
-        prof.sessionWishlist.append(session.key)
-        prof.put()
+        bumpFeed(wishlistFeedId(prof.key.id()))
+        changeInterest(session.key, 1)
 
         return self._copySessionToForm(session)
 
+    @endpoints.method(WISHLIST_POST_REQUEST, BooleanMessage,
+                      http_method='POST', name='removeSessionFromWishlist')
+    @rateLimited
+    def removeSessionFromWishlist(self, request):
+        """Removes a session from a user's wishlist"""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+
+        session_key = decodeWebsafeKey(request.websafeSessionKey, Session)
+        prof = self._getProfileFromUser()
+        if not removeWishlistItem(prof.key, session_key):
+            raise endpoints.NotFoundException(
+                'Session not in wishlist: %s' % request.websafeSessionKey)
+        bumpFeed(wishlistFeedId(prof.key.id()))
+        changeInterest(session_key, -1)
+
+        return BooleanMessage(data=True)
+
     @endpoints.method(message_types.VoidMessage, SessionForms,
                       http_method='GET', name='getSessionsInWishlist')
     def getSessionsInWishlist(self, request):
@@ -648,13 +1178,100 @@ class ConferenceApi(remote.Service):
 
         # fetch profile and wishlist
         prof = self._getProfileFromUser()
-        session_keys = prof.sessionWishlist
-        sessions = [session_key.get() for session_key in session_keys]
+        session_keys = wishlistSessionKeys(prof.key)
+        sessions = [session for session in ndb.get_multi(session_keys) if session]
         # return sessions set
         return SessionForms(
             items=[self._copySessionToForm(session) for session in sessions]
         )
 
+    @endpoints.method(message_types.VoidMessage, StringMessage,
+                      path='wishlist/feed',
+                      http_method='GET', name='getWishlistFeedUrl')
+    def getWishlistFeedUrl(self, request):
+        """Return the path of the user's private wishlist .ics feed, for
+        calendar apps to subscribe to."""
+        prof = self._getProfileFromUser()
+        return StringMessage(
+            data='/feeds/wishlist/%s.ics' % wishlistToken(prof))
+
+    @endpoints.method(message_types.VoidMessage, StringMessage,
+                      path='wishlist/feed/reset',
+                      http_method='POST', name='resetWishlistFeedUrl')
+    def resetWishlistFeedUrl(self, request):
+        """Replace the path of the user's private wishlist .ics feed, for
+        when it has leaked; the old path stops working."""
+        prof = self._getProfileFromUser()
+        return StringMessage(
+            data='/feeds/wishlist/%s.ics' % resetWishlistToken(prof.key))
+
+    @endpoints.method(message_types.VoidMessage, ScheduleForm,
+                      path='wishlist/schedule',
+                      http_method='GET', name='getWishlistSchedule')
+    def getWishlistSchedule(self, request):
+        """Returns a user's wishlist as a per day schedule with conflicts
+        and free slots"""
+        prof = self._getProfileFromUser()
+        sessions = [s for s in ndb.get_multi(wishlistSessionKeys(prof.key))
+                    if s]
+
+        intervals = []
+        unscheduled = []
+        for session in sessions:
+            interval = sessionInterval(session)
+            if interval:
+                intervals.append(interval + (session,))
+            else:
+                unscheduled.append(self._copySessionToForm(session))
+
+        days = []
+        for date, day in groupByDay(intervals):
+            conflicts = findConflicts(day)
+            items = []
+            for pos, (start, end, session) in enumerate(day):
+                items.append(ScheduledSessionForm(
+                    session=self._copySessionToForm(session),
+                    endTime=formatMinutes(end),
+                    conflictsWith=[day[other][2].key.urlsafe()
+                                   for other in sorted(conflicts.get(pos, []))]))
+            days.append(ScheduleDayForm(
+                date=str(date),
+                sessions=items,
+                freeSlots=[TimeSlotForm(startTime=formatMinutes(start),
+                                        endTime=formatMinutes(end))
+                           for start, end in freeGaps(day)]))
+        return ScheduleForm(days=days, unscheduled=unscheduled)
+
+    @endpoints.method(CONF_GET_REQUEST, SessionForms,
+                      path='conference/{websafeConferenceKey}/sessions/fitting',
+                      http_method='GET', name='getSessionsFittingWishlist')
+    def getSessionsFittingWishlist(self, request):
+        """Given a conference, returns the sessions that fit the free slots
+        of the user's wishlist"""
+        conf_key = decodeWebsafeKey(request.websafeConferenceKey, Conference)
+        requireConference(conf_key)
+        prof = self._getProfileFromUser()
+        wishlist = [s for s in ndb.get_multi(wishlistSessionKeys(prof.key))
+                    if s]
+
+        # busy intervals per day from the user's wishlist
+        busy = {}
+        for date, day in groupByDay(interval + (None,) for interval in
+                                    map(sessionInterval, wishlist) if interval):
+            busy[date.isoformat()] = mergeBusy(day)
+
+        wished = set(session.key.urlsafe() for session in wishlist)
+        fitting = []
+        for date, day in sorted(getSessionIndex(conf_key).items()):
+            for start, end, websafeKey in day:
+                if websafeKey not in wished and \
+                        fitsFree(busy.get(date, []), start, end):
+                    fitting.append(ndb.Key(urlsafe=websafeKey))
+        sessions = ndb.get_multi(fitting)
+        return SessionForms(
+            items=[self._copySessionToForm(session) for session in sessions if session]
+        )
+
     @endpoints.method(message_types.VoidMessage, SpeakerForm,
                       http_method='GET', name='getFeaturedSpeaker')
     def getFeaturedSpeaker(self, request):
@@ -703,17 +1320,22 @@ class ConferenceApi(remote.Service):
 
 # - - - Registration - - - - - - - - - - - - - - - - - - - -
 
-    @ndb.transactional(xg=True)
     def _conferenceRegistration(self, request, reg=True):
         """Register or unregister user for selected conference."""
-        retval = None
-        # get user Profile
+        # get user Profile, creating or migrating it before the transaction
         prof = self._getProfileFromUser()
+        return self._registerProfile(prof.key, request.websafeConferenceKey,
+                                     reg)
 
+    @ndb.transactional(xg=True)
+    def _registerProfile(self, p_key, wsck, reg):
+        """Register or unregister a profile for a conference."""
+        retval = None
         # check if conf exists given websafeConfKey
-        # get conference; check that it exists
-        wsck = request.websafeConferenceKey
-        conf = ndb.Key(urlsafe=wsck).get()
+        # get conference & the user's registration; check that it exists
+        conf_key = decodeWebsafeKey(wsck, Conference)
+        a_key = attendanceKey(p_key, conf_key)
+        conf, attendance = ndb.get_multi([conf_key, a_key])
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % wsck)
@@ -721,34 +1343,49 @@ class ConferenceApi(remote.Service):
         # register
         if reg:
             # check if user already registered otherwise add
-            if wsck in prof.conferenceKeysToAttend:
+            if attendance:
                 raise ConflictException(
                     "You have already registered for this conference")
 
-            # check if seats avail
-            if conf.seatsAvailable <= 0:
-                raise ConflictException(
-                    "There are no seats available.")
+            # no seats avail, or freed seats owed to users already waiting
+            # (promoted in FIFO order): join the waitlist instead
+            waiting = conf.seatsAvailable > 0 and WaitlistEntry.query(
+                ancestor=conf.key).get(keys_only=True)
+            if conf.seatsAvailable <= 0 or waiting:
+                w_key = waitlistKey(conf.key, p_key.id())
+                if w_key.get():
+                    raise ConflictException(
+                        "You are already on the waitlist for this conference")
+                WaitlistEntry(key=w_key).put()
+                if waiting:
+                    # make sure the free seats get handed out
+                    enqueuePromotion(conf.key, transactional=True)
+                return BooleanMessage(data=False)
 
             # register user, take away one seat
-            prof.conferenceKeysToAttend.append(wsck)
+            Attendance(key=a_key, conference=conf_key).put()
             conf.seatsAvailable -= 1
             retval = True
 
         # unregister
         else:
             # check if user already registered
-            if wsck in prof.conferenceKeysToAttend:
+            if attendance:
 
-                # unregister user, add back one seat
-                prof.conferenceKeysToAttend.remove(wsck)
+                # unregister user, add back one seat for the waitlist
+                a_key.delete()
                 conf.seatsAvailable += 1
+                enqueuePromotion(conf.key, transactional=True)
                 retval = True
             else:
+                # leave the waitlist if on it
+                w_key = waitlistKey(conf.key, p_key.id())
+                if w_key.get():
+                    w_key.delete()
+                    return BooleanMessage(data=True)
                 retval = False
 
         # write things back to the datastore & return
-        prof.put()
         conf.put()
         return BooleanMessage(data=retval)
 
@@ -758,8 +1395,9 @@ class ConferenceApi(remote.Service):
     def getConferencesToAttend(self, request):
         """Get list of conferences that user has registered for."""
         prof = self._getProfileFromUser()  # get user Profile
-        conf_keys = [ndb.Key(urlsafe=wsck) for wsck in prof.conferenceKeysToAttend]
-        conferences = ndb.get_multi(conf_keys)
+        conf_keys = attendedConferenceKeys(prof.key)
+        # skip conferences deleted but not yet scrubbed from the profile
+        conferences = [conf for conf in ndb.get_multi(conf_keys) if conf]
 
         # get organizers
         organisers = [ndb.Key(Profile, conf.organizerUserId) for conf in conferences]
@@ -778,8 +1416,10 @@ class ConferenceApi(remote.Service):
     @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
                       path='conference/{websafeConferenceKey}',
                       http_method='POST', name='registerForConference')
+    @rateLimited
     def registerForConference(self, request):
-        """Register user for selected conference."""
+        """Register user for selected conference; returns false if the
+        conference is full and the user has been waitlisted instead."""
         return self._conferenceRegistration(request)
 
     @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
@@ -796,26 +1436,7 @@ class ConferenceApi(remote.Service):
         """Create Announcement & assign to memcache; used by
         memcache cron job & putAnnouncement().
         """
-        confs = Conference.query(ndb.AND(
-            Conference.seatsAvailable <= 5,
-            Conference.seatsAvailable > 0)
-        ).fetch(projection=[Conference.name])
-
-        if confs:
-            # If there are almost sold out conferences,
-            # format announcement and set it in memcache
-            announcement = '%s %s' % (
-                'Last chance to attend! The following conferences '
-                'are nearly sold out:',
-                ', '.join(conf.name for conf in confs))
-            memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
-        else:
-            # If there are no sold out conferences,
-            # delete the memcache announcements entry
-            announcement = ""
-            memcache.delete(MEMCACHE_ANNOUNCEMENTS_KEY)
-
-        return announcement
+        return cacheAnnouncement()
 
     @endpoints.method(message_types.VoidMessage, StringMessage,
                       path='conference/announcement/get',
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""deletion.py
+
+Udacity conference server-side Python App Engine conference deletion;
+    deleteConference removes the Conference entity right away and hands off
+    to chained delete_conference tasks, which remove its descendants, then
+    the wishlist items and registrations of users referring to it, in
+    cursor-paged batches
+
+"""
+
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from feeds import bumpFeeds
+from feeds import wishlistFeedId
+from models import Attendance
+from models import Session
+from models import WishlistItem
+from popularity import forgetSessions
+from schedule import clearSessionIndex
+from tracing import addTask
+
+DELETE_BATCH_SIZE = 100
+
+# task stages, run in this order
+STAGE_DESCENDANTS = 'descendants'
+STAGE_WISHLISTS = 'wishlists'
+STAGE_ATTENDEES = 'attendees'
+
+
+def enqueueConferenceCleanup(conf_key, stage=STAGE_DESCENDANTS, cursor=None,
+                             transactional=False):
+    """Add a delete_conference task for a stage of the cleanup."""
+    params = {'websafeConferenceKey': conf_key.urlsafe(), 'stage': stage}
+    if cursor:
+        params['cursor'] = cursor.urlsafe()
+    addTask('/tasks/delete_conference', params, transactional=transactional)
+
+
+def deleteDescendantsBatch(conf_key, cursor=None):
+    """Delete one batch of the conference's descendants (sessions, waitlist
+    entries); returns the cursor of the next batch or None when done.
+    """
+    keys, next_cursor, more = ndb.Query(ancestor=conf_key).fetch_page(
+        DELETE_BATCH_SIZE, keys_only=True, start_cursor=cursor)
+    session_keys = [k for k in keys if k.kind() == Session._get_kind()]
+    forgetSessions(conf_key, session_keys)
+    ndb.delete_multi(keys)
+    if not more:
+        clearSessionIndex(conf_key)
+    return next_cursor if more else None
+
+
+def scrubWishlistsBatch(conf_key, cursor=None):
+    """Delete one batch of the WishlistItems of the conference's sessions;
+    returns the cursor of the next batch or None when done.
+    """
+    keys, next_cursor, more = WishlistItem.query(
+        WishlistItem.conference == conf_key).fetch_page(
+        DELETE_BATCH_SIZE, keys_only=True, start_cursor=cursor)
+    ndb.delete_multi(keys)
+    bumpFeeds(set(wishlistFeedId(key.parent().id()) for key in keys))
+    return next_cursor if more else None
+
+
+def scrubAttendeesBatch(conf_key, cursor=None):
+    """Delete one batch of the conference's Attendance entities; returns
+    the cursor of the next batch or None when done.
+    """
+    keys, next_cursor, more = Attendance.query(
+        Attendance.conference == conf_key).fetch_page(
+        DELETE_BATCH_SIZE, keys_only=True, start_cursor=cursor)
+    ndb.delete_multi(keys)
+    return next_cursor if more else None
+
+
+def runCleanupStage(conf_key, stage, websafe_cursor=None):
+    """Run one batch of a cleanup stage and enqueue whatever follows it."""
+    cursor = Cursor(urlsafe=websafe_cursor) if websafe_cursor else None
+    if stage == STAGE_DESCENDANTS:
+        cursor = deleteDescendantsBatch(conf_key, cursor)
+        if cursor:
+            enqueueConferenceCleanup(conf_key, STAGE_DESCENDANTS, cursor)
+        else:
+            # sessions are gone, so no wishlist items can be added any more
+            enqueueConferenceCleanup(conf_key, STAGE_WISHLISTS)
+    elif stage == STAGE_WISHLISTS:
+        cursor = scrubWishlistsBatch(conf_key, cursor)
+        if cursor:
+            enqueueConferenceCleanup(conf_key, STAGE_WISHLISTS, cursor)
+        else:
+            enqueueConferenceCleanup(conf_key, STAGE_ATTENDEES)
+    elif stage == STAGE_ATTENDEES:
+        cursor = scrubAttendeesBatch(conf_key, cursor)
+        if cursor:
+            enqueueConferenceCleanup(conf_key, STAGE_ATTENDEES, cursor)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+"""facets.py
+
+Udacity conference server-side Python App Engine browse facet counts;
+    per value conference counts for city, topic and month, kept in sharded
+    FacetCounterShard entities and cached in memcache per scope
+
+A scope is '' for counts over all conferences, or 'field=value' for counts
+over the conferences matching that one filter (e.g. topics per city).
+
+Each update_facets task records how many of its deltas it has applied in a
+FacetUpdate marker written in the same transaction as each shard, so a
+retried task skips the deltas applied before it failed. The facet_counts
+migration recounts the counters from the conferences themselves.
+
+"""
+
+from datetime import datetime
+from datetime import timedelta
+import json
+import random
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import Conference
+from models import FacetCounterShard
+from models import FacetUpdate
+from tracing import addTask
+
+FACET_FIELDS = ('city', 'topics', 'month')
+FACET_SHARDS = 5
+MEMCACHE_FACETS_KEY = "FACETS %s"
+# FacetUpdate markers are kept past any retry of their task
+FACET_UPDATE_DAYS = 7
+PURGE_BATCH_SIZE = 500
+
+
+def facetValues(conf):
+    """Return the (field, value) facet pairs of a Conference or dict."""
+    get = conf.get if isinstance(conf, dict) else lambda f: getattr(conf, f)
+    values = set()
+    for field in FACET_FIELDS:
+        value = get(field)
+        for v in (value if isinstance(value, list) else [value]):
+            # month 0 means no start date
+            if v not in (None, '', 0):
+                values.add((field, unicode(v)))
+    return values
+
+
+def _counters(values):
+    """Return the (scope, field, value) counters a conference counts in."""
+    counters = set(('', field, value) for field, value in values)
+    for scope_field, scope_value in values:
+        scope = u'%s=%s' % (scope_field, scope_value)
+        counters.update((scope, field, value) for field, value in values
+                        if field != scope_field)
+    return counters
+
+
+def facetDeltas(old_values, new_values):
+    """Return [(scope, field, value, delta)] turning old into new values."""
+    old, new = _counters(old_values), _counters(new_values)
+    return [c + (1,) for c in sorted(new - old)] + \
+        [c + (-1,) for c in sorted(old - new)]
+
+
+def enqueueFacetUpdate(old_values, new_values, transactional=False):
+    """Add an update_facets task moving a conference's counts from its old
+    to its new facet values."""
+    deltas = facetDeltas(old_values, new_values)
+    if not deltas:
+        return
+    addTask('/tasks/update_facets', {'deltas': json.dumps(deltas)},
+            transactional=transactional)
+
+
+def _shard(scope, field, value, shard):
+    """Return a new shard of a counter."""
+    return FacetCounterShard(id=u'%s|%s|%s|%d' % (scope, field, value, shard),
+                             scope=scope, field=field, value=value)
+
+
+def _forgetCounts(scopes):
+    memcache.delete_multi([(MEMCACHE_FACETS_KEY % s).encode('utf-8')
+                           for s in scopes])
+
+
+@ndb.transactional(xg=True)
+def _applyDelta(update_key, index, scope, field, value, delta):
+    """Add the index-th delta of an update to one random shard of a
+    counter, unless the update's marker shows it applied already."""
+    update = update_key.get() or FacetUpdate(key=update_key)
+    if update.applied > index:
+        return
+    new = _shard(scope, field, value, random.randint(0, FACET_SHARDS - 1))
+    shard = new.key.get() or new
+    shard.count += delta
+    update.applied = index + 1
+    ndb.put_multi([shard, update])
+
+
+def applyFacetDeltas(deltas, update_id):
+    """Apply [(scope, field, value, delta)] to the counters; update_id (the
+    task name) must be the same on every run of the update, each delta is
+    applied once."""
+    update_key = ndb.Key(FacetUpdate, update_id)
+    for index, (scope, field, value, delta) in enumerate(deltas):
+        _applyDelta(update_key, index, scope, field, value, delta)
+    _forgetCounts(set(delta[0] for delta in deltas))
+
+
+def purgeFacetUpdates():
+    """Delete the FacetUpdate markers older than FACET_UPDATE_DAYS; returns
+    the number deleted."""
+    cutoff = datetime.utcnow() - timedelta(days=FACET_UPDATE_DAYS)
+    keys = FacetUpdate.query(FacetUpdate.created < cutoff).fetch(
+        keys_only=True, batch_size=PURGE_BATCH_SIZE)
+    for i in range(0, len(keys), PURGE_BATCH_SIZE):
+        ndb.delete_multi(keys[i:i + PURGE_BATCH_SIZE])
+    return len(keys)
+
+
+def _facetFilter(field, value):
+    """Return the Conference filter matching a facet value."""
+    return ndb.FilterNode(field, '=', int(value) if field == 'month' else value)
+
+
+def recountFacets(values):
+    """Overwrite the counters a conference with the (field, value) facet
+    pairs counts in with the number of conferences matching each; for
+    backfills."""
+    counts = []
+    for scope, field, value in _counters(values):
+        query = Conference.query(_facetFilter(field, value))
+        if scope:
+            scope_field, scope_value = scope.split(u'=', 1)
+            query = query.filter(_facetFilter(scope_field, scope_value))
+        counts.append((scope, field, value, query.count_async()))
+    shards = []
+    for scope, field, value, count in counts:
+        counter = [_shard(scope, field, value, shard)
+                   for shard in range(FACET_SHARDS)]
+        counter[0].count = count.get_result()
+        shards.extend(counter)
+    ndb.put_multi(shards)
+    _forgetCounts(set(scope for scope, _, _, _ in counts))
+
+
+def getFacetCounts(scope=u''):
+    """Return {field: {value: count}} for a scope, from memcache if cached."""
+    cache_key = (MEMCACHE_FACETS_KEY % scope).encode('utf-8')
+    counts = memcache.get(cache_key)
+    if counts is None:
+        counts = {}
+        for shard in FacetCounterShard.query(FacetCounterShard.scope == scope):
+            values = counts.setdefault(shard.field, {})
+            values[shard.value] = values.get(shard.value, 0) + shard.count
+        for values in counts.values():
+            for value in [v for v, count in values.items() if count <= 0]:
+                del values[value]
+        memcache.set(cache_key, counts)
+    return counts
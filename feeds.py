@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+"""feeds.py
+
+Udacity conference server-side Python App Engine iCalendar (.ics) feeds of
+    a conference's sessions and of a user's wishlist, served by main.py;
+    bodies are cached in memcache under a per feed version that writers
+    bump, and the version doubles as the ETag, so an unchanged poll costs
+    one memcache get
+
+"""
+
+import base64
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+import logging
+import os
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import FeedToken
+from models import Profile
+from models import Session
+from profilelists import hasLegacyLists
+from profilelists import migrateProfile
+from profilelists import wishlistSessionKeys
+
+MEMCACHE_FEED_VERSION_KEY = "FEED VERSION %s"
+MEMCACHE_FEED_KEY = "FEED %s %s"
+MEMCACHE_FEED_TOKEN_KEY = "FEED TOKEN %s"
+
+PRODID = '-//Conference Central//Sessions//EN'
+# octets per content line before folding (RFC 5545 3.1)
+LINE_OCTETS = 75
+# part of every feed version; bump when the feed layout changes so
+# cached bodies & client ETags of the old layout are dropped
+FEED_FORMAT = 1
+# how long a token that doesn't exist is remembered as missing
+TOKEN_NOT_FOUND_TTL = 60
+
+
+def conferenceFeedId(conf_key):
+    return 'conference %s' % conf_key.urlsafe()
+
+
+def wishlistFeedId(user_id):
+    return 'wishlist %s' % user_id
+
+
+# - - - Versions - - - - - - - - - - - - - - - - - - - - - - - -
+
+def feedVersion(feed_id):
+    """Return the current version of a feed, as a string. A version lost
+    from memcache restarts from the current time, beyond any version
+    cached before."""
+    key = MEMCACHE_FEED_VERSION_KEY % feed_id
+    version = memcache.get(key)
+    if version is None:
+        now = datetime.utcnow() - datetime(1970, 1, 1)
+        memcache.add(key, int(now.total_seconds() * 1000))
+        version = memcache.get(key)
+    return '%s.%s' % (version, FEED_FORMAT)
+
+
+def bumpFeed(feed_id):
+    """Move a feed to a new version after its content changed."""
+    memcache.incr(MEMCACHE_FEED_VERSION_KEY % feed_id)
+
+
+def bumpFeeds(feed_ids):
+    """Move feeds to new versions, with one memcache call."""
+    if feed_ids:
+        memcache.offset_multi(dict((MEMCACHE_FEED_VERSION_KEY % feed_id, 1)
+                                   for feed_id in feed_ids))
+
+
+def cachedFeed(feed_id, version, build):
+    """Return the feed body for its version from memcache, building and
+    caching it with build() on a miss; None if build() finds no feed."""
+    cache_key = MEMCACHE_FEED_KEY % (feed_id, version)
+    body = memcache.get(cache_key)
+    if body is None:
+        body = build()
+        if body is not None and not memcache.set(cache_key, body):
+            logging.warning('Memcache error: feed %s not cached.', feed_id)
+    return body
+
+
+# - - - Wishlist tokens - - - - - - - - - - - - - - - - - - - - -
+
+def _newToken():
+    """Return a random, URL safe token."""
+    return base64.urlsafe_b64encode(os.urandom(24))
+
+
+@ndb.transactional(xg=True)
+def _setWishlistToken(prof_key, replace):
+    """Give a profile a new wishlist token, unless it has one and replace
+    is False; returns (token, replaced token)."""
+    prof = prof_key.get()
+    if prof.feedToken and not replace:
+        return prof.feedToken, None
+    old = prof.feedToken
+    prof.feedToken = _newToken()
+    ndb.put_multi([prof,
+                   FeedToken(id=prof.feedToken, userId=prof_key.id())])
+    if old:
+        ndb.Key(FeedToken, old).delete()
+    return prof.feedToken, old
+
+
+def wishlistToken(prof):
+    """Return the URL token of a user's wishlist feed, so calendar apps can
+    poll it without signing in: random, not derived from the user, and
+    created on first use."""
+    if prof.feedToken:
+        return prof.feedToken
+    return _setWishlistToken(prof.key, False)[0]
+
+
+def resetWishlistToken(prof_key):
+    """Give a user's wishlist feed a new token; the old feed URL stops
+    working."""
+    token, old = _setWishlistToken(prof_key, True)
+    if old:
+        # a tombstone, so a lookup racing the reset can't cache it again
+        memcache.set(MEMCACHE_FEED_TOKEN_KEY % old, '')
+    return token
+
+
+def userIdFromToken(token):
+    """Return the user ID of a wishlist feed token, None if it is not a
+    current token."""
+    cache_key = MEMCACHE_FEED_TOKEN_KEY % token
+    user_id = memcache.get(cache_key)
+    if user_id is None:
+        feed_token = ndb.Key(FeedToken, token).get()
+        # '' marks a token found missing
+        user_id = feed_token.userId if feed_token else ''
+        memcache.add(cache_key, user_id,
+                     time=0 if feed_token else TOKEN_NOT_FOUND_TTL)
+    return user_id or None
+
+
+# - - - iCalendar - - - - - - - - - - - - - - - - - - - - - - - -
+
+def _text(value):
+    """Escape a TEXT property value."""
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;') \
+        .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Yield a content line folded into lines of at most LINE_OCTETS
+    octets, continuation lines starting with a space."""
+    line = line.encode('utf-8')
+    limit = LINE_OCTETS
+    while len(line) > limit:
+        cut = limit
+        # don't split a UTF-8 sequence
+        while cut and (ord(line[cut:cut + 1]) & 0xC0) == 0x80:
+            cut -= 1
+        yield line[:cut]
+        line = ' ' + line[cut:]
+    yield line
+
+
+def _event(session, conf, stamp):
+    """Yield the content lines of a session's VEVENT; nothing for sessions
+    without a date."""
+    if not session.date:
+        return
+    yield 'BEGIN:VEVENT'
+    yield 'UID:%s@conference-central' % session.key.urlsafe()
+    yield 'DTSTAMP:%s' % stamp
+    if session.startTime is None:
+        yield 'DTSTART;VALUE=DATE:%s' % session.date.strftime('%Y%m%d')
+    else:
+        # no time zones are stored: floating local times
+        start = datetime.combine(session.date, session.startTime)
+        yield 'DTSTART:%s' % start.strftime('%Y%m%dT%H%M%S')
+        if session.duration:
+            end = start + timedelta(minutes=session.duration)
+            yield 'DTEND:%s' % end.strftime('%Y%m%dT%H%M%S')
+    yield 'SUMMARY:%s' % _text(session.name)
+    description = [session.highlights or '']
+    if session.speaker:
+        description.insert(0, 'Speaker: %s' % session.speaker)
+    description = '\n'.join(d for d in description if d)
+    if description:
+        yield 'DESCRIPTION:%s' % _text(description)
+    if session.sessionType:
+        yield 'CATEGORIES:%s' % ','.join(_text(t) for t in session.sessionType)
+    if conf and conf.city:
+        yield 'LOCATION:%s' % _text(conf.city)
+    yield 'END:VEVENT'
+
+
+def _calendar(name, sessions, conferences):
+    """Yield the lines of a VCALENDAR of sessions, by date & start time."""
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    yield 'BEGIN:VCALENDAR'
+    yield 'VERSION:2.0'
+    yield 'PRODID:%s' % PRODID
+    yield 'CALSCALE:GREGORIAN'
+    yield 'X-WR-CALNAME:%s' % _text(name)
+    sessions = sorted(sessions, key=lambda s: (s.date, s.startTime or time()))
+    for session in sessions:
+        for line in _event(session, conferences.get(session.key.parent()),
+                           stamp):
+            yield line
+    yield 'END:VCALENDAR'
+
+
+def _ics(lines):
+    """Return the folded, CRLF terminated feed body."""
+    return ''.join(folded + '\r\n' for line in lines
+                   for folded in _fold(line))
+
+
+def conferenceFeed(conf_key):
+    """Return the .ics feed of a conference's sessions, None if the
+    conference doesn't exist."""
+    sessions = Session.query(ancestor=conf_key).fetch_async()
+    conf = conf_key.get()
+    if not conf:
+        return None
+    return _ics(_calendar(conf.name, sessions.get_result(), {conf_key: conf}))
+
+
+def wishlistFeed(user_id):
+    """Return the .ics feed of a user's wishlist, None if the user has no
+    profile."""
+    prof = ndb.Key(Profile, user_id).get()
+    if not prof:
+        return None
+    if hasLegacyLists(prof):
+        prof = migrateProfile(prof.key)
+    sessions = [s for s in ndb.get_multi(wishlistSessionKeys(prof.key)) if s]
+    conf_keys = list(set(s.key.parent() for s in sessions))
+    conferences = dict((conf.key, conf) for conf in ndb.get_multi(conf_keys)
+                       if conf)
+    return _ics(_calendar('Conference Central wishlist', sessions,
+                          conferences))
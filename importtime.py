@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""importtime.py -- measure the cold import cost of the app's entry modules
+
+Imports each module in a fresh interpreter and reports the median wall
+time, the number of modules loaded and whether the endpoints stack came
+with it. main.py (cron, task, feed & warmup handlers) is compared with
+conference.py, the endpoints API that main.py imported before its handlers
+were split off, so the difference is what each task instance saves.
+
+    PYTHONPATH=<sdk>/platform/google_appengine python importtime.py [runs]
+
+"""
+
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# module -> what loading it stands for
+MODULES = [
+    ('main', 'task & cron handlers'),
+    ('conference', 'endpoints API (imported by main.py before)'),
+]
+RUNS = 7
+
+CHILD = r"""
+import sys
+import time
+try:
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+except ImportError:
+    pass
+sys.path.insert(0, %(here)r)
+before = len(sys.modules)
+start = time.time()
+import %(module)s
+elapsed = time.time() - start
+print('%%f %%d %%d' %% (elapsed * 1000, len(sys.modules) - before,
+                       'endpoints' in sys.modules))
+"""
+
+
+def measure(module, runs=RUNS):
+    """Return (median ms, modules loaded, endpoints loaded) of importing
+    module in runs fresh interpreters."""
+    times = []
+    for _ in range(runs):
+        child = subprocess.Popen(
+            [sys.executable, '-c', CHILD % {'here': HERE, 'module': module}],
+            cwd=HERE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = child.communicate()
+        if child.returncode:
+            sys.exit('importing %s failed (is the SDK on PYTHONPATH?): %s' %
+                     (module, err.strip().splitlines()[-1]))
+        ms, loaded, endpoints = out.split()[-3:]
+        times.append(float(ms))
+    times.sort()
+    return times[len(times) // 2], int(loaded), endpoints == '1'
+
+
+def main(runs=RUNS):
+    print('%-11s %10s %8s %10s' % ('module', 'median ms', 'modules',
+                                    'endpoints'))
+    for module, description in MODULES:
+        ms, loaded, endpoints = measure(module, runs)
+        print('%-11s %10.1f %8d %10s  %s' % (
+            module, ms, loaded, 'yes' if endpoints else 'no', description))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+"""indexgen.py -- generate the minimal index.yaml for the conference app
+
+Enumerates the query shapes conference.py and its helpers can produce and
+derives the composite indexes they need, leaning on the datastore's built-in
+single property indexes and merge joins wherever possible. Filter fields and
+projections are read statically from conference.py and models.py, so the API
+does not need to be importable.
+
+    python indexgen.py            print the generated index.yaml
+    python indexgen.py --write    overwrite index.yaml
+    python indexgen.py --bench [old_index.yaml]
+                                  index rows written per put, old (default
+                                  current) index.yaml vs generated
+
+"""
+
+import ast
+import itertools
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEADER = """indexes:
+
+# Generated by indexgen.py from the query shapes in conference.py and
+# its helper modules; regenerate instead of editing by hand.
+"""
+
+FOOTER = """
+# AUTOGENERATED
+
+# This index.yaml is automatically updated whenever the dev_appserver
+# detects that a new type of query is run.  If you want to manage the
+# index.yaml file manually, remove the above marker line (the line
+# saying "# AUTOGENERATED").  If you want to manage some indexes
+# manually, move them above the marker line.  The index.yaml file is
+# automatically uploaded to the admin console when you next deploy
+# your application using appcfg.py.
+"""
+
+# sample entities for --bench: property -> number of stored values
+SAMPLE_ENTITIES = {
+    'Conference': {'name': 1, 'description': 1, 'organizerUserId': 1,
+                   'topics': 3, 'city': 1, 'startDate': 1, 'month': 1,
+                   'endDate': 1, 'maxAttendees': 1, 'seatsAvailable': 1},
+    'Session': {'name': 1, 'highlights': 1, 'speaker': 1, 'duration': 1,
+                'sessionType': 2, 'date': 1, 'startTime': 1,
+                'organizerUserId': 1},
+}
+
+
+def _moduleConstants(filename, names):
+    """Return literal module level assignments for names in filename."""
+    tree = ast.parse(open(os.path.join(HERE, filename)).read())
+    found = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id in names:
+                    found[target.id] = ast.literal_eval(node.value)
+    return found
+
+
+def modelProperties(filename='models.py'):
+    """Return {kind: {property: (indexed, repeated)}} for ndb models."""
+    tree = ast.parse(open(os.path.join(HERE, filename)).read())
+    kinds = {}
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        props = {}
+        for stmt in node.body:
+            if not (isinstance(stmt, ast.Assign) and isinstance(stmt.value, ast.Call)):
+                continue
+            func = stmt.value.func
+            if not (isinstance(func, ast.Attribute) and func.attr.endswith('Property')):
+                continue
+            kw = dict((k.arg, ast.literal_eval(k.value)) for k in stmt.value.keywords
+                      if k.arg in ('indexed', 'repeated'))
+            props[stmt.targets[0].id] = (kw.get('indexed', True),
+                                         kw.get('repeated', False))
+        if props:
+            kinds[node.name] = props
+    return kinds
+
+
+def queryShapes():
+    """Return every query shape the app can run, as dicts of
+    kind, ancestor, eq (equality filter properties), order and projection.
+    """
+    consts = _moduleConstants('conference.py', (
+        'FIELDS', 'INEQUALITY_FIELDS', 'DATE_FIELDS', 'CONF_SUMMARY_PROPERTIES',
+        'SESSION_SUMMARY_PROPERTIES'))
+    # date fields only take range filters
+    fields = sorted(f for f in consts['FIELDS'].values()
+                    if f not in consts['DATE_FIELDS'])
+    shapes = []
+
+    def shape(kind, eq=(), order=(), ancestor=False, projection=()):
+        shapes.append({'kind': kind, 'ancestor': ancestor, 'eq': tuple(eq),
+                       'order': tuple(order), 'projection': tuple(projection)})
+
+    # ConferenceApi._getQuery: any set of equality filters, at most one
+    # inequality field (others are applied in memory), ordered by the
+    # inequality field then name; date filters are applied in memory, or
+    # run alone on their built-in index when nothing else filters
+    for n in range(len(fields) + 1):
+        for eq in itertools.combinations(fields, n):
+            shape('Conference', eq, ('name',))
+            for ineq in consts['INEQUALITY_FIELDS']:
+                if ineq not in eq:
+                    shape('Conference', eq, (ineq, 'name'))
+    for date in consts['DATE_FIELDS']:
+        shape('Conference', order=(date,))
+    # queryConferenceSummaries (unfiltered), getConferenceSummariesCreated
+    shape('Conference', order=('name',),
+          projection=consts['CONF_SUMMARY_PROPERTIES'])
+    shape('Conference', ancestor=True,
+          projection=consts['CONF_SUMMARY_PROPERTIES'])
+    # getConferencesCreated
+    shape('Conference', ancestor=True)
+    # caching.cacheAnnouncement
+    shape('Conference', order=('seatsAvailable',), projection=('name',))
+
+    # waitlist.promoteWaitlist
+    shape('WaitlistEntry', order=('created',), ancestor=True)
+
+    # recommendations.buildRecommendations
+    shape('Conference', projection=('topics',))
+    shape('Attendance')
+    shape('Recommendation', order=('built',))
+
+    # facets.getFacetCounts, purgeFacetUpdates
+    shape('FacetCounterShard', ('scope',))
+    shape('FacetUpdate', order=('created',))
+    # facets.recountFacets counts one or two equality filters: merge joins
+    # of built-in indexes, no shape needed
+
+    # deletion.scrubWishlistsBatch, scrubAttendeesBatch,
+    # migrations.countSessionInterest
+    shape('WishlistItem', ('conference',))
+    shape('WishlistItem', ('session',))
+    shape('Attendance', ('conference',))
+    # profilelists.attendedWebsafeKeys, wishlistSessionKeys
+    shape('Attendance', ancestor=True)
+    shape('WishlistItem', ancestor=True)
+
+    # getConferenceSessions, ...ByType, ...BySpeaker
+    shape('Session', ancestor=True)
+    shape('Session', ('sessionType',), ancestor=True)
+    shape('Session', ('speaker',), ancestor=True)
+    # getConferenceSessionSummaries
+    shape('Session', ancestor=True,
+          projection=consts['SESSION_SUMMARY_PROPERTIES'])
+    # getConferenceSessionsToDate
+    shape('Session', order=('date', 'startTime'), ancestor=True)
+    # getSessionsBySpeaker, getNonWorkshopDaySessions
+    shape('Session', ('speaker',))
+    shape('Session', order=('startTime',))
+    # caching.cacheFeaturedSpeaker
+    shape('Session', ('speaker',), projection=('name',))
+    return shapes
+
+
+def requiredIndexes(shape):
+    """Return the composite indexes (kind, ancestor, properties) a shape
+    needs; an empty list if built-in indexes serve it.
+    """
+    kind, ancestor = shape['kind'], shape['ancestor']
+    eq, order = list(shape['eq']), list(shape['order'])
+    projection = [p for p in shape['projection'] if p not in eq + order]
+
+    if not ancestor and len(set(eq + order + projection)) == 1:
+        # one property: its built-in index
+        return []
+    if projection:
+        # projections are served from a single index holding every value
+        return [(kind, ancestor, tuple(eq + order + sorted(projection)))]
+    if not order:
+        # equality (and ancestor) only: merge join of built-in indexes
+        return []
+    if not eq:
+        if len(order) == 1 and not ancestor:
+            return []
+        return [(kind, ancestor, tuple(order))]
+    # equality filters + sort: merge join of one (filter, sort...) index
+    # per equality property
+    return [(kind, ancestor, tuple([prop] + order)) for prop in eq]
+
+
+def generateIndexes():
+    """Return the sorted, de-duplicated composite indexes for all shapes."""
+    indexes = set()
+    for shape in queryShapes():
+        indexes.update(requiredIndexes(shape))
+    return sorted(indexes, key=lambda i: (i[0], i[1], len(i[2]), i[2]))
+
+
+def formatIndexes(indexes):
+    """Return indexes as index.yaml text."""
+    lines = [HEADER]
+    for kind, ancestor, props in indexes:
+        lines.append('- kind: %s' % kind)
+        if ancestor:
+            lines.append('  ancestor: yes')
+        lines.append('  properties:')
+        for prop in props:
+            lines.append('  - name: %s' % prop)
+        lines.append('')
+    return '\n'.join(lines) + FOOTER
+
+
+def parseIndexYaml(text):
+    """Return (kind, ancestor, properties) tuples from index.yaml text."""
+    indexes = []
+    current = None
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].rstrip()
+        stripped = line.strip()
+        if stripped.startswith('- kind:'):
+            current = [stripped.split(':', 1)[1].strip(), False, []]
+            indexes.append(current)
+        elif current and stripped.startswith('ancestor:'):
+            current[1] = stripped.split(':', 1)[1].strip() in ('yes', 'true')
+        elif current and stripped.startswith('- name:'):
+            current[2].append(stripped.split(':', 1)[1].strip())
+    return [(k, a, tuple(p)) for k, a, p in indexes]
+
+
+def indexRowsPerPut(kind, indexes, properties):
+    """Return index rows written by a put of the sample entity of kind:
+    two built-in rows (asc & desc) per indexed value, plus one row per value
+    combination of each composite index.
+    """
+    values = SAMPLE_ENTITIES[kind]
+    builtin = sum(2 * values[p] for p, (indexed, _) in properties[kind].items()
+                  if indexed and p in values)
+    composite = 0
+    for k, _, props in indexes:
+        if k == kind:
+            rows = 1
+            for prop in props:
+                rows *= values.get(prop, 1)
+            composite += rows
+    return builtin, composite
+
+
+def bench(old_index_yaml='index.yaml'):
+    """Print index rows per put for an old and the generated index.yaml."""
+    properties = modelProperties()
+    all_indexed = dict((k, dict((p, (True, r)) for p, (_, r) in props.items()))
+                       for k, props in properties.items())
+    current = parseIndexYaml(open(os.path.join(HERE, old_index_yaml)).read())
+    generated = generateIndexes()
+    print('%-11s %26s %26s' % ('', 'all indexed + index.yaml', 'models + generated'))
+    for kind in sorted(SAMPLE_ENTITIES):
+        before = indexRowsPerPut(kind, current, all_indexed)
+        after = indexRowsPerPut(kind, generated, properties)
+        print('%-11s %12d rows (%3d cmp) %12d rows (%3d cmp)' % (
+            kind, sum(before), len([i for i in current if i[0] == kind]),
+            sum(after), len([i for i in generated if i[0] == kind])))
+    for kind, props in sorted(properties.items()):
+        unused = sorted(p for p, (indexed, _) in props.items() if indexed and
+                        not any(p in s['eq'] + s['order'] + s['projection']
+                                for s in queryShapes() if s['kind'] == kind))
+        if unused:
+            print('%s: indexed but never queried: %s' % (kind, ', '.join(unused)))
+
+
+if __name__ == '__main__':
+    if '--bench' in sys.argv:
+        bench(*sys.argv[sys.argv.index('--bench') + 1:])
+    elif '--write' in sys.argv:
+        open(os.path.join(HERE, 'index.yaml'), 'w').write(
+            formatIndexes(generateIndexes()))
+    else:
+        sys.stdout.write(formatIndexes(generateIndexes()))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+"""keyresolver.py
+
+Udacity conference server-side Python App Engine websafe key resolution;
+    decodes websafe keys and checks their kind & ancestry without an RPC,
+    and answers conference existence / owner checks from a compact
+    memcache record instead of loading the Conference entity
+
+"""
+
+import endpoints
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+MEMCACHE_CONF_RECORD_KEY = "CONF RECORD %s"
+# how long a conference that doesn't exist is remembered as missing
+NOT_FOUND_TTL = 60
+
+# kind of the parent each kind's keys must have
+PARENT_KINDS = {
+    'Conference': 'Profile',
+    'Session': 'Conference',
+}
+
+
+def decodeWebsafeKey(websafeKey, model):
+    """Return the key for a websafe key of model; raises BadRequest for
+    malformed keys and keys of another kind or ancestry."""
+    kind = model._get_kind()
+    try:
+        key = ndb.Key(urlsafe=websafeKey)
+    except Exception:
+        key = None
+    parent = key.parent() if key else None
+    if key is None or key.kind() != kind or key.id() is None or \
+            (parent.kind() if parent else None) != PARENT_KINDS.get(kind):
+        raise endpoints.BadRequestException(
+            'Invalid %s key: %s' % (kind, websafeKey))
+    return key
+
+
+def getConferenceOrganizer(conf_key):
+    """Return organizerUserId of a conference, None if it doesn't exist."""
+    cache_key = MEMCACHE_CONF_RECORD_KEY % conf_key.urlsafe()
+    record = memcache.get(cache_key)
+    if record is None:
+        conf = conf_key.get()
+        # '' marks a conference found missing
+        record = conf.organizerUserId if conf else ''
+        # add, so a record read before a delete can't replace its tombstone
+        memcache.add(cache_key, record, time=0 if conf else NOT_FOUND_TTL)
+    return record or None
+
+
+def requireConference(conf_key):
+    """Return organizerUserId of a conference; raises NotFound if it
+    doesn't exist."""
+    organizerUserId = getConferenceOrganizer(conf_key)
+    if organizerUserId is None:
+        raise endpoints.NotFoundException(
+            'No conference found with key: %s' % conf_key.urlsafe())
+    return organizerUserId
+
+
+def markConferenceDeleted(conf_key):
+    """Record a deleted conference as missing; call once the delete has
+    committed, so a reader can't cache the conference again before it."""
+    memcache.set(MEMCACHE_CONF_RECORD_KEY % conf_key.urlsafe(), '')
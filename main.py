@@ -13,27 +13,92 @@ created by wesc on 2014 may 24
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 import webapp2
+import json
 import logging
+import time
+from datetime import datetime
 from google.appengine.api import app_identity
-from google.appengine.api import mail
-from conference import ConferenceApi
 from google.appengine.api import memcache
 from google.appengine.ext import ndb
-from models import Session
 
-from conference import MEMCACHE_FEAT_SPKR_KEY
+# cron & task handlers only need the lightweight cache helpers; the
+# endpoints service stack in conference.py is not imported here
+from caching import MEMCACHE_ANNOUNCEMENTS_KEY
+from caching import cacheAnnouncement
+from caching import cacheFeaturedSpeaker
+from calendarindex import updateCalendar
+from deletion import runCleanupStage
+from facets import applyFacetDeltas
+from facets import purgeFacetUpdates
+from feeds import cachedFeed
+from feeds import conferenceFeed
+from feeds import conferenceFeedId
+from feeds import feedVersion
+from feeds import userIdFromToken
+from feeds import wishlistFeed
+from feeds import wishlistFeedId
+from migrations import MIGRATIONS
+from migrations import migrationProgress
+from migrations import runMigrationBatch
+from migrations import startMigration
+from popularity import updateLeaderboard
+from ratelimit import rateLimitStats
+from recommendations import buildRecommendations
+from tracing import ENQUEUED_PARAM
+from tracing import TRACE_HEADER
+from tracing import TRACE_PARAM
+from tracing import installRpcHooks
+from tracing import logQueueDelay
+from tracing import startTrace
+from tracing import timedSpan
+from tracing import traceIdFromHeader
+from waitlist import enqueuePromotion
+from waitlist import promoteWaitlist
 
+installRpcHooks()
 
-class SetAnnouncementHandler(webapp2.RequestHandler):
+
+class TracedHandler(webapp2.RequestHandler):
+    """Handler continuing the trace of whatever enqueued its task (a new
+    trace for crons & admin requests), logging the task's queue delay and
+    the time spent handling it."""
+    def dispatch(self):
+        startTrace(self.request.get(TRACE_PARAM) or traceIdFromHeader(
+            self.request.headers.get(TRACE_HEADER)))
+        if self.request.get(ENQUEUED_PARAM):
+            logQueueDelay(self.request.path,
+                          self.request.get(ENQUEUED_PARAM),
+                          self.request.headers.get('X-AppEngine-TaskETA'),
+                          self.request.headers.get('X-AppEngine-TaskRetryCount'))
+        with timedSpan('handler', path=self.request.path):
+            return super(TracedHandler, self).dispatch()
+
+
+class SetAnnouncementHandler(TracedHandler):
     def get(self):
         """Set Announcement in Memcache."""
-        ConferenceApi._cacheAnnouncement()
+        cacheAnnouncement()
+        self.response.set_status(204)
+
+
+class BuildRecommendationsHandler(TracedHandler):
+    def get(self):
+        """Recompute conference recommendations."""
+        buildRecommendations()
+        self.response.set_status(204)
+
+
+class PurgeFacetUpdatesHandler(TracedHandler):
+    def get(self):
+        """Delete the progress markers of old update_facets tasks."""
+        purgeFacetUpdates()
         self.response.set_status(204)
 
 
-class SendConfirmationEmailHandler(webapp2.RequestHandler):
+class SendConfirmationEmailHandler(TracedHandler):
     def post(self):
         """Send email confirming Conference creation."""
+        from google.appengine.api import mail  # loaded lazily
         mail.send_mail(
             'noreply@%s.appspotmail.com' % (
                 app_identity.get_application_id()),     # from
@@ -45,20 +110,168 @@ class SendConfirmationEmailHandler(webapp2.RequestHandler):
         )
 
 
-class SetFeaturedSpeakerHandler(webapp2.RequestHandler):
+class SetFeaturedSpeakerHandler(TracedHandler):
     def post(self):
         """Set Featured Speaker in Memcache."""
-        sessions = Session.query(Session.speaker == self.request.get('speaker'))
-        if len(list(sessions)) > 1:
-            cache_data = {}
-            cache_data['speaker'] = self.request.get('speaker')
-            cache_data['sessionNames'] = [session.name for session in sessions]
-            if not memcache.set(MEMCACHE_FEAT_SPKR_KEY, cache_data):
-                logging.error('Memcache error: set op fail.')
+        cacheFeaturedSpeaker(self.request.get('speaker'))
+
+
+class PromoteWaitlistHandler(TracedHandler):
+    def post(self):
+        """Promote waitlisted users into free conference seats."""
+        conf_key = ndb.Key(urlsafe=self.request.get('websafeConferenceKey'))
+        if promoteWaitlist(conf_key):
+            # more users waiting and seats left; chain the next batch
+            enqueuePromotion(conf_key)
+
+
+class DeleteConferenceHandler(TracedHandler):
+    def post(self):
+        """Clean up after a deleted conference, one batch per task."""
+        runCleanupStage(
+            ndb.Key(urlsafe=self.request.get('websafeConferenceKey')),
+            self.request.get('stage'),
+            self.request.get('cursor'))
+
+
+class UpdateCalendarHandler(TracedHandler):
+    def post(self):
+        """Re-index a created, updated or deleted conference in the calendar."""
+        dates = [datetime.strptime(self.request.get(param), '%Y-%m-%d').date()
+                 if self.request.get(param) else None
+                 for param in ('oldStartDate', 'oldEndDate')]
+        updateCalendar(
+            ndb.Key(urlsafe=self.request.get('websafeConferenceKey')), *dates)
+
+
+class UpdateFacetsHandler(TracedHandler):
+    def post(self):
+        """Apply conference facet count changes, once even if retried."""
+        applyFacetDeltas(json.loads(self.request.get('deltas')),
+                         self.request.headers['X-AppEngine-TaskName'])
+
+
+class UpdateLeaderboardHandler(TracedHandler):
+    def post(self):
+        """Re-rank the sessions of a conference in its popularity
+        leaderboard."""
+        websafeKey = self.request.get('websafeConferenceKey')
+        if websafeKey:
+            conf_key = ndb.Key(urlsafe=websafeKey)
+        else:
+            # queued per session, before the re-ranks were batched
+            conf_key = ndb.Key(
+                urlsafe=self.request.get('websafeSessionKey')).parent()
+        updateLeaderboard(conf_key)
+
+
+class RunMigrationHandler(TracedHandler):
+    def post(self):
+        """Run one batch of a migration."""
+        runMigrationBatch(self.request.get('name'),
+                          int(self.request.get('batch')))
+
+
+class MigrationHandler(TracedHandler):
+    def get(self, name=None):
+        """Report progress of one or all migrations as JSON."""
+        if name and name not in MIGRATIONS:
+            self.abort(404)
+        self.response.content_type = 'application/json'
+        self.response.write(json.dumps({
+            'registered': sorted(MIGRATIONS),
+            'progress': migrationProgress(name),
+        }, default=str))
+
+    def post(self, name):
+        """Start a migration; restart=1 starts it over if already started."""
+        if name not in MIGRATIONS:
+            self.abort(404)
+        startMigration(name, restart=bool(self.request.get('restart')))
+        self.get(name)
+
+
+class RateLimitsHandler(TracedHandler):
+    def get(self):
+        """Report rate limit thresholds & rejection counts as JSON."""
+        self.response.content_type = 'application/json'
+        self.response.write(json.dumps(rateLimitStats()))
+
+
+class FeedHandler(TracedHandler):
+    def serveFeed(self, feed_id, build, cache_control):
+        """Serve an .ics feed; a poll sending the current version as ETag
+        is answered 304 Not Modified after a single memcache get."""
+        version = feedVersion(feed_id)
+        self.response.headers['Cache-Control'] = cache_control
+        self.response.etag = version
+        if version in self.request.if_none_match:
+            self.response.set_status(304)
+            return
+        body = cachedFeed(feed_id, version, build)
+        if body is None:
+            self.abort(404)
+        self.response.content_type = 'text/calendar'
+        self.response.charset = 'utf-8'
+        self.response.write(body)
+
+
+class ConferenceFeedHandler(FeedHandler):
+    def get(self, websafeConferenceKey):
+        """Serve the .ics feed of a conference's sessions."""
+        try:
+            conf_key = ndb.Key(urlsafe=websafeConferenceKey)
+        except Exception:
+            conf_key = None
+        if conf_key is None or conf_key.kind() != 'Conference':
+            self.abort(404)
+        self.serveFeed(conferenceFeedId(conf_key),
+                       lambda: conferenceFeed(conf_key),
+                       'public, max-age=300')
+
+
+class WishlistFeedHandler(FeedHandler):
+    def get(self, token):
+        """Serve the .ics feed of the wishlist of the user in the token."""
+        user_id = userIdFromToken(token)
+        if not user_id:
+            self.abort(404)
+        self.serveFeed(wishlistFeedId(user_id),
+                       lambda: wishlistFeed(user_id),
+                       'private, max-age=300')
+
+
+class WarmupHandler(TracedHandler):
+    def get(self):
+        """Prime module imports & hot memcache entries on a new instance."""
+        # the API (conference.api) runs in the same instance; load its
+        # service stack now rather than on the first user request
+        start = time.time()
+        import conference
+        logging.info('warmup: conference imported in %.1f ms',
+                     (time.time() - start) * 1000)
+
+        if memcache.get(MEMCACHE_ANNOUNCEMENTS_KEY) is None:
+            cacheAnnouncement()
+        self.response.set_status(200)
 
 
 app = webapp2.WSGIApplication([
     ('/crons/set_announcement', SetAnnouncementHandler),
+    ('/crons/build_recommendations', BuildRecommendationsHandler),
+    ('/crons/purge_facet_updates', PurgeFacetUpdatesHandler),
     ('/tasks/send_confirmation_email', SendConfirmationEmailHandler),
     ('/tasks/set_featured_speaker', SetFeaturedSpeakerHandler),
+    ('/tasks/promote_waitlist', PromoteWaitlistHandler),
+    ('/tasks/delete_conference', DeleteConferenceHandler),
+    ('/tasks/update_calendar', UpdateCalendarHandler),
+    ('/tasks/update_facets', UpdateFacetsHandler),
+    ('/tasks/update_leaderboard', UpdateLeaderboardHandler),
+    ('/tasks/run_migration', RunMigrationHandler),
+    ('/migrations', MigrationHandler),
+    (r'/migrations/(\w+)', MigrationHandler),
+    ('/ratelimits', RateLimitsHandler),
+    (r'/feeds/conference/([\w-]+)\.ics', ConferenceFeedHandler),
+    (r'/feeds/wishlist/([\w-]{32})\.ics', WishlistFeedHandler),
+    ('/_ah/warmup', WarmupHandler),
 ], debug=True)
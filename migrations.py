@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""migrations.py
+
+Udacity conference server-side Python App Engine resumable backfills;
+    a migration is a per-entity transform registered for a model, run by
+    chained run_migration tasks over the kind in cursor-paged batches with
+    its progress checkpointed in a MigrationState entity
+
+Transforms take an entity, change it in place and return True if it needs
+to be written. A batch can be re-run after a failure, so transforms must be
+idempotent (compute a value from others, don't increment).
+
+"""
+
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from calendarindex import updateCalendar
+from facets import facetValues
+from facets import recountFacets
+from models import Conference
+from models import MigrationState
+from models import Profile
+from models import Session
+from models import WishlistItem
+from popularity import setInterest
+from profilelists import hasLegacyLists
+from profilelists import moveLists
+from tracing import addTask
+
+MIGRATION_BATCH_SIZE = 100
+# delay between batches so backfills don't starve user requests
+MIGRATION_THROTTLE_SECONDS = 1
+
+MIGRATIONS = {}
+
+
+def migration(name, model):
+    """Register the decorated function as the transform of a migration."""
+    def register(transform):
+        MIGRATIONS[name] = (model, transform)
+        return transform
+    return register
+
+
+# - - - Registered migrations - - - - - - - - - - - - - - - - -
+
+@migration('conference_month', Conference)
+def setConferenceMonth(conf):
+    """Derive Conference.month from startDate."""
+    month = conf.startDate.month if conf.startDate else 0
+    if conf.month == month:
+        return False
+    conf.month = month
+    return True
+
+
+@migration('calendar_index', Conference)
+def indexConferenceWeeks(conf):
+    """Add a conference to the calendar week buckets; nothing to write."""
+    updateCalendar(conf.key)
+    return False
+
+
+@migration('facet_counts', Conference)
+def recountConferenceFacets(conf):
+    """Recount the facet counters a conference counts in from the
+    conferences matching them; nothing to write. Overwrites the counters,
+    so run it while conferences are not changing."""
+    recountFacets(facetValues(conf))
+    return False
+
+
+@migration('session_interest', Session)
+def countSessionInterest(session):
+    """Recount the wishlists holding a session into its interest counter
+    & leaderboard; nothing to write. Overwrites the counter, so run it
+    while wishlists are not changing."""
+    setInterest(session.key, WishlistItem.query(
+        WishlistItem.session == session.key).count())
+    return False
+
+
+@migration('profile_lists', Profile)
+def moveProfileLists(prof):
+    """Move the legacy conferenceKeysToAttend & sessionWishlist lists into
+    Attendance & WishlistItem children."""
+    if not hasLegacyLists(prof):
+        return False
+    ndb.put_multi(moveLists(prof))
+    return True
+
+
+@migration('wishlist_conferences', WishlistItem)
+def setWishlistConference(item):
+    """Set the conference of WishlistItems written before it was stored,
+    so conference deletion finds them."""
+    if item.conference:
+        return False
+    item.conference = item.session.parent()
+    return True
+
+
+def _rewrite(entity):
+    """Write the entity back as is, applying current property settings
+    (e.g. indexed=False) to entities stored before they changed."""
+    return True
+
+for _model in (Conference, Session, Profile):
+    migration('rewrite_%s' % _model._get_kind().lower(), _model)(_rewrite)
+
+
+# - - - Runner - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def _enqueueBatch(name, batch, countdown=0):
+    """Add the run_migration task for a batch; only called in transactions,
+    so the task exists if and only if the checkpoint was written."""
+    addTask('/tasks/run_migration', {'name': name, 'batch': batch},
+            countdown=countdown, transactional=True)
+
+
+@ndb.transactional()
+def startMigration(name, restart=False):
+    """Start a registered migration; a migration already started is left
+    alone unless restart is set. Returns its MigrationState."""
+    if name not in MIGRATIONS:
+        raise KeyError('Unknown migration: %s' % name)
+    state = MigrationState.get_by_id(name)
+    if state and not restart:
+        return state
+    state = MigrationState(id=name, kind=MIGRATIONS[name][0]._get_kind())
+    state.put()
+    _enqueueBatch(name, state.batch)
+    return state
+
+
+@ndb.transactional()
+def _checkpoint(name, batch, cursor, processed, updated, done):
+    """Record a finished batch & enqueue the next one; False if the batch
+    was checkpointed already (duplicate task)."""
+    state = MigrationState.get_by_id(name)
+    if not state or state.batch != batch:
+        return False
+    state.batch += 1
+    state.cursor = cursor.urlsafe() if cursor else None
+    state.processed += processed
+    state.updated += updated
+    state.done = done
+    state.put()
+    if not done:
+        _enqueueBatch(name, state.batch, MIGRATION_THROTTLE_SECONDS)
+    return True
+
+
+def runMigrationBatch(name, batch):
+    """Transform and write one batch of a migration's entities."""
+    state = MigrationState.get_by_id(name)
+    # stale or duplicate task: the batch has been checkpointed already
+    if not state or state.done or state.batch != batch:
+        return
+    model, transform = MIGRATIONS[name]
+    cursor = Cursor(urlsafe=state.cursor) if state.cursor else None
+    entities, next_cursor, more = model.query().fetch_page(
+        MIGRATION_BATCH_SIZE, start_cursor=cursor)
+    changed = [entity for entity in entities if transform(entity)]
+    ndb.put_multi(changed)
+    _checkpoint(name, batch, next_cursor, len(entities), len(changed),
+                not more)
+
+
+def migrationProgress(name=None):
+    """Return progress dicts of one or all started migrations."""
+    if name:
+        states = [MigrationState.get_by_id(name)]
+    else:
+        states = MigrationState.query().fetch()
+    return [state.to_dict(exclude=['cursor']) for state in states if state]
@@ -12,8 +12,6 @@ created/forked from conferences.py by wesc on 2014 may 24
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
-import httplib
-import endpoints
 from protorpc import messages
 from google.appengine.ext import ndb
 
@@ -21,7 +19,7 @@ from google.appengine.ext import ndb
 class Conference(ndb.Model):
     """Conference -- Conference object"""
     name = ndb.StringProperty(required=True)
-    description = ndb.StringProperty()
+    description = ndb.StringProperty(indexed=False)
     organizerUserId = ndb.StringProperty()
     topics = ndb.StringProperty(repeated=True)
     city = ndb.StringProperty()
@@ -48,6 +46,18 @@ class ConferenceForm(messages.Message):
     organizerDisplayName = messages.StringField(12)
 
 
+class ConferenceSummaryForm(messages.Message):
+    """ConferenceSummaryForm -- Conference outbound listing form message"""
+    name = messages.StringField(1)
+    organizerUserId = messages.StringField(2)
+    city = messages.StringField(3)
+    startDate = messages.StringField(4)  # DateTimeField()
+    maxAttendees = messages.IntegerField(5)
+    seatsAvailable = messages.IntegerField(6)
+    websafeKey = messages.StringField(7)
+    organizerDisplayName = messages.StringField(8)
+
+
 class TeeShirtSize(messages.Enum):
     """TeeShirtSize -- t-shirt size enumeration value"""
     NOT_SPECIFIED = 1
@@ -72,13 +82,13 @@ class Session(ndb.Model):
     _use_memcache = True
 
     name = ndb.StringProperty(required=True)
-    highlights = ndb.StringProperty()
+    highlights = ndb.StringProperty(indexed=False)
     speaker = ndb.StringProperty(required=True)
     duration = ndb.IntegerProperty()  # minutes
     sessionType = ndb.StringProperty(repeated=True)
     date = ndb.DateProperty()
     startTime = ndb.TimeProperty()  # in 24 hour notation so it can be ordered
-    organizerUserId = ndb.StringProperty()
+    organizerUserId = ndb.StringProperty(indexed=False)
 
 
 class SessionForm(messages.Message):
@@ -94,13 +104,109 @@ class SessionForm(messages.Message):
     websafeKey = messages.StringField(9)
 
 
+class SessionSummaryForm(messages.Message):
+    """SessionSummaryForm -- Session outbound listing form message"""
+    name = messages.StringField(1)
+    speaker = messages.StringField(2)
+    duration = messages.IntegerField(3)
+    date = messages.StringField(4)
+    startTime = messages.StringField(5)
+    websafeKey = messages.StringField(6)
+
+
 class Profile(ndb.Model):
     """Profile -- User profile object"""
-    displayName = ndb.StringProperty()
-    mainEmail = ndb.StringProperty()
-    teeShirtSize = ndb.StringProperty(default='NOT_SPECIFIED')
-    conferenceKeysToAttend = ndb.StringProperty(repeated=True)
-    sessionWishlist = ndb.KeyProperty(Session, repeated=True)
+    displayName = ndb.StringProperty(indexed=False)
+    mainEmail = ndb.StringProperty(indexed=False)
+    teeShirtSize = ndb.StringProperty(default='NOT_SPECIFIED', indexed=False)
+    # legacy lists, moved into Attendance & WishlistItem children when the
+    # profile is first loaded (profilelists.migrateProfile)
+    conferenceKeysToAttend = ndb.StringProperty(repeated=True, indexed=False)
+    sessionWishlist = ndb.KeyProperty(Session, repeated=True, indexed=False)
+    # current token of the private wishlist feed URL (feeds.wishlistToken)
+    feedToken = ndb.StringProperty(indexed=False)
+
+
+class Attendance(ndb.Model):
+    """Attendance -- conference a user registered for; child of the
+    Profile, keyed by websafe conference key"""
+    conference = ndb.KeyProperty(Conference)
+
+
+class WishlistItem(ndb.Model):
+    """WishlistItem -- session in a user's wishlist; child of the Profile,
+    keyed by websafe session key"""
+    session = ndb.KeyProperty(Session)
+    conference = ndb.KeyProperty(Conference)
+
+
+class WaitlistEntry(ndb.Model):
+    """WaitlistEntry -- user waiting for a seat; child of the Conference,
+    keyed by user ID"""
+    created = ndb.DateTimeProperty(auto_now_add=True)
+
+
+class CalendarWeek(ndb.Model):
+    """CalendarWeek -- conferences running in a week, keyed by the
+    week's Monday (YYYY-MM-DD); 'long' holds the conferences running too
+    many weeks to be kept per week"""
+    conferenceKeys = ndb.KeyProperty(Conference, repeated=True, indexed=False)
+
+
+class FacetCounterShard(ndb.Model):
+    """FacetCounterShard -- one shard of a facet value's conference count"""
+    scope = ndb.StringProperty()
+    field = ndb.StringProperty(indexed=False)
+    value = ndb.StringProperty(indexed=False)
+    count = ndb.IntegerProperty(default=0, indexed=False)
+
+
+class FacetUpdate(ndb.Model):
+    """FacetUpdate -- progress of an update_facets task, keyed by task name:
+    the number of its deltas applied"""
+    applied = ndb.IntegerProperty(default=0, indexed=False)
+    created = ndb.DateTimeProperty(auto_now_add=True)
+
+
+class SessionInterestShard(ndb.Model):
+    """SessionInterestShard -- one shard of the number of wishlists holding
+    a session, keyed by websafe session key and shard number"""
+    count = ndb.IntegerProperty(default=0, indexed=False)
+
+
+class SessionLeaderboard(ndb.Model):
+    """SessionLeaderboard -- a conference's most wishlisted sessions, best
+    first, keyed by websafe conference key"""
+    sessionKeys = ndb.KeyProperty(Session, repeated=True, indexed=False)
+    counts = ndb.IntegerProperty(repeated=True, indexed=False)
+    # when the counts were read
+    counted = ndb.DateTimeProperty(indexed=False)
+
+
+class FeedToken(ndb.Model):
+    """FeedToken -- the user a private .ics feed URL belongs to, keyed by
+    the URL's token"""
+    userId = ndb.StringProperty(indexed=False)
+
+
+class Recommendation(ndb.Model):
+    """Recommendation -- precomputed conference recommendations, best first;
+    child of a Conference (similar conferences) or Profile (for the user)"""
+    conferenceKeys = ndb.KeyProperty(Conference, repeated=True, indexed=False)
+    scores = ndb.FloatProperty(repeated=True, indexed=False)
+    built = ndb.DateTimeProperty()
+
+
+class MigrationState(ndb.Model):
+    """MigrationState -- progress checkpoint of a migration, keyed by name"""
+    kind = ndb.StringProperty(indexed=False)
+    batch = ndb.IntegerProperty(default=0, indexed=False)
+    cursor = ndb.StringProperty(indexed=False)
+    processed = ndb.IntegerProperty(default=0, indexed=False)
+    updated = ndb.IntegerProperty(default=0, indexed=False)
+    done = ndb.BooleanProperty(default=False, indexed=False)
+    started = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+    modified = ndb.DateTimeProperty(auto_now=True, indexed=False)
 
 
 class ProfileMiniForm(messages.Message):
@@ -122,6 +228,11 @@ class ConferenceForms(messages.Message):
     items = messages.MessageField(ConferenceForm, 1, repeated=True)
 
 
+class ConferenceSummaryForms(messages.Message):
+    """ConferenceSummaryForms -- multiple ConferenceSummaryForm outbound form message"""
+    items = messages.MessageField(ConferenceSummaryForm, 1, repeated=True)
+
+
 class ConferenceQueryForm(messages.Message):
     """ConferenceQueryForm -- Conference query inbound form message"""
     field = messages.StringField(1)
@@ -139,6 +250,94 @@ class SessionForms(messages.Message):
     items = messages.MessageField(SessionForm, 1, repeated=True)
 
 
+class SessionSummaryForms(messages.Message):
+    """SessionSummaryForms -- multiple SessionSummaryForm outbound form message"""
+    items = messages.MessageField(SessionSummaryForm, 1, repeated=True)
+
+
+class ScheduledSessionForm(messages.Message):
+    """ScheduledSessionForm -- Session within a schedule outbound form message"""
+    session = messages.MessageField(SessionForm, 1)
+    endTime = messages.StringField(2)
+    conflictsWith = messages.StringField(3, repeated=True)  # websafe keys
+
+
+class TimeSlotForm(messages.Message):
+    """TimeSlotForm -- free time slot outbound form message"""
+    startTime = messages.StringField(1)
+    endTime = messages.StringField(2)
+
+
+class ScheduleDayForm(messages.Message):
+    """ScheduleDayForm -- one day of a schedule outbound form message"""
+    date = messages.StringField(1)
+    sessions = messages.MessageField(ScheduledSessionForm, 2, repeated=True)
+    freeSlots = messages.MessageField(TimeSlotForm, 3, repeated=True)
+
+
+class ScheduleForm(messages.Message):
+    """ScheduleForm -- personal schedule outbound form message"""
+    days = messages.MessageField(ScheduleDayForm, 1, repeated=True)
+    unscheduled = messages.MessageField(SessionForm, 2, repeated=True)
+
+
+class FacetValueForm(messages.Message):
+    """FacetValueForm -- facet value & conference count outbound form message"""
+    value = messages.StringField(1)
+    count = messages.IntegerField(2)
+
+
+class FacetForm(messages.Message):
+    """FacetForm -- counts of one filter field outbound form message"""
+    field = messages.StringField(1)
+    values = messages.MessageField(FacetValueForm, 2, repeated=True)
+
+
+class FacetForms(messages.Message):
+    """FacetForms -- multiple FacetForm outbound form message"""
+    facets = messages.MessageField(FacetForm, 1, repeated=True)
+
+
+class WebsafeKeysForm(messages.Message):
+    """WebsafeKeysForm -- multiple websafe keys inbound form message"""
+    websafeKeys = messages.StringField(1, repeated=True)
+
+
+class ConferenceLookupForm(messages.Message):
+    """ConferenceLookupForm -- Conference by key outbound form message;
+    conference is unset if not found"""
+    websafeKey = messages.StringField(1)
+    conference = messages.MessageField(ConferenceForm, 2)
+
+
+class ConferenceLookupForms(messages.Message):
+    """ConferenceLookupForms -- multiple ConferenceLookupForm outbound form message"""
+    items = messages.MessageField(ConferenceLookupForm, 1, repeated=True)
+
+
+class SessionLookupForm(messages.Message):
+    """SessionLookupForm -- Session by key outbound form message;
+    session is unset if not found"""
+    websafeKey = messages.StringField(1)
+    session = messages.MessageField(SessionForm, 2)
+
+
+class SessionLookupForms(messages.Message):
+    """SessionLookupForms -- multiple SessionLookupForm outbound form message"""
+    items = messages.MessageField(SessionLookupForm, 1, repeated=True)
+
+
+class PopularSessionForm(messages.Message):
+    """PopularSessionForm -- Session with its wishlist count"""
+    session = messages.MessageField(SessionForm, 1)
+    interested = messages.IntegerField(2)
+
+
+class PopularSessionForms(messages.Message):
+    """PopularSessionForms -- multiple PopularSessionForm outbound form message"""
+    items = messages.MessageField(PopularSessionForm, 1, repeated=True)
+
+
 class SpeakerForm(messages.Message):
     """SpeakerForm -- Speaker outbound form message"""
     speaker = messages.StringField(1)
@@ -151,11 +350,6 @@ class BooleanMessage(messages.Message):
     data = messages.BooleanField(1)
 
 
-class ConflictException(endpoints.ServiceException):
-    """ConflictException -- exception mapped to HTTP 409 response"""
-    http_status = httplib.CONFLICT
-
-
 class StringMessage(messages.Message):
     """StringMessage-- outbound (single) string message"""
     data = messages.StringField(1, required=True)
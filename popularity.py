@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""popularity.py
+
+Udacity conference server-side Python App Engine session popularity;
+    the number of wishlists holding each session, kept in sharded
+    SessionInterestShard counters, and a per conference leaderboard of the
+    most wishlisted sessions, cached in memcache
+
+Count changes don't touch the leaderboard: they share one named
+update_leaderboard task per conference and LEADERBOARD_DELAY slot, which
+re-ranks all of the conference's sessions from their counters at once, so
+a busy conference's leaderboard is written once per slot.
+
+"""
+
+from datetime import datetime
+import random
+import time
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import Session
+from models import SessionInterestShard
+from models import SessionLeaderboard
+from tracing import addTask
+
+INTEREST_SHARDS = 10
+# sessions getPopularSessions returns
+LEADERBOARD_SIZE = 10
+# seconds count changes are collected before their conference is re-ranked
+LEADERBOARD_DELAY = 10
+MEMCACHE_LEADERBOARD_KEY = "POPULAR SESSIONS %s"
+
+
+def _shardKeys(session_key):
+    """Return the keys of all interest shards of a session."""
+    websafe = session_key.urlsafe()
+    return [ndb.Key(SessionInterestShard, '%s|%d' % (websafe, shard))
+            for shard in range(INTEREST_SHARDS)]
+
+
+def _leaderboardKey(conf_key):
+    return ndb.Key(SessionLeaderboard, conf_key.urlsafe())
+
+
+@ndb.transactional()
+def _incrementShard(shard_key, delta):
+    shard = shard_key.get() or SessionInterestShard(key=shard_key)
+    shard.count += delta
+    shard.put()
+
+
+def sessionInterest(session_key):
+    """Return the number of wishlists holding a session."""
+    return sum(shard.count for shard in ndb.get_multi(_shardKeys(session_key))
+               if shard)
+
+
+def enqueueLeaderboardUpdate(conf_key):
+    """Add the update_leaderboard task re-ranking a conference at the end
+    of the current LEADERBOARD_DELAY slot, unless the slot has one."""
+    from google.appengine.api import taskqueue  # loaded lazily
+    websafe = conf_key.urlsafe()
+    slot = int(time.time()) // LEADERBOARD_DELAY
+    try:
+        addTask('/tasks/update_leaderboard', {'websafeConferenceKey': websafe},
+                name='leaderboard-%s-%d' % (websafe, slot),
+                countdown=LEADERBOARD_DELAY)
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+
+def changeInterest(session_key, delta):
+    """Add delta to the count of wishlists holding a session (one random
+    shard) and have its conference re-ranked."""
+    _incrementShard(random.choice(_shardKeys(session_key)), delta)
+    enqueueLeaderboardUpdate(session_key.parent())
+
+
+def setInterest(session_key, count):
+    """Overwrite the count of wishlists holding a session and have its
+    conference re-ranked; for backfills."""
+    shards = [SessionInterestShard(key=key, count=0)
+              for key in _shardKeys(session_key)]
+    shards[0].count = count
+    ndb.put_multi(shards)
+    enqueueLeaderboardUpdate(session_key.parent())
+
+
+def rankSessions(counts):
+    """Return [(session key, count)] of the LEADERBOARD_SIZE sessions with
+    the highest positive counts in {session key: count}, best first."""
+    ranked = sorted([(key, count) for key, count in counts.items()
+                     if count > 0],
+                    key=lambda e: (-e[1], e[0].urlsafe()))
+    return ranked[:LEADERBOARD_SIZE]
+
+
+@ndb.transactional()
+def _putLeaderboard(conf_key, ranked, counted):
+    """Store a conference's leaderboard counted at a time, unless one
+    counted later is stored already."""
+    board_key = _leaderboardKey(conf_key)
+    board = board_key.get()
+    if board and board.counted and board.counted > counted:
+        return
+    if not ranked:
+        if board:
+            board_key.delete()
+        return
+    board = board or SessionLeaderboard(key=board_key)
+    board.sessionKeys = [key for key, _ in ranked]
+    board.counts = [count for _, count in ranked]
+    board.counted = counted
+    board.put()
+
+
+def updateLeaderboard(conf_key):
+    """Re-rank all sessions of a conference at their current counts;
+    idempotent, so the task can safely be retried."""
+    counted = datetime.utcnow()
+    session_keys = Session.query(ancestor=conf_key).fetch(keys_only=True)
+    shards = ndb.get_multi([key for session_key in session_keys
+                            for key in _shardKeys(session_key)])
+    counts = {}
+    for i, session_key in enumerate(session_keys):
+        counts[session_key] = sum(
+            shard.count for shard in
+            shards[i * INTEREST_SHARDS:(i + 1) * INTEREST_SHARDS] if shard)
+    _putLeaderboard(conf_key, rankSessions(counts), counted)
+    memcache.delete(MEMCACHE_LEADERBOARD_KEY % conf_key.urlsafe())
+
+
+def getLeaderboard(conf_key):
+    """Return [(session key, count)] of a conference's most wishlisted
+    sessions, best first; from memcache if cached."""
+    cache_key = MEMCACHE_LEADERBOARD_KEY % conf_key.urlsafe()
+    entries = memcache.get(cache_key)
+    if entries is None:
+        board = _leaderboardKey(conf_key).get()
+        entries = zip(board.sessionKeys, board.counts)[:LEADERBOARD_SIZE] \
+            if board else []
+        memcache.set(cache_key, entries)
+    return entries
+
+
+def forgetSessions(conf_key, session_keys):
+    """Delete the interest counters of deleted sessions and the
+    leaderboard of their conference."""
+    keys = [_leaderboardKey(conf_key)]
+    for session_key in session_keys:
+        keys.extend(_shardKeys(session_key))
+    ndb.delete_multi(keys)
+    memcache.delete(MEMCACHE_LEADERBOARD_KEY % conf_key.urlsafe())
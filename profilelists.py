@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""profilelists.py
+
+Udacity conference server-side Python App Engine per user conference
+    registrations and session wishlists, kept as Attendance & WishlistItem
+    children of the Profile (one entity per item, keyed by the websafe key
+    of the conference or session) so Profile reads & writes stay constant
+    size; membership is a key get, listing a keys-only ancestor query
+
+Profiles written before keep the items in the legacy conferenceKeysToAttend
+and sessionWishlist lists until migrateProfile (run when a profile is first
+loaded) or the profile_lists migration moves them.
+
+"""
+
+from google.appengine.ext import ndb
+
+from models import Attendance
+from models import WishlistItem
+
+
+def attendanceKey(prof_key, conf_key):
+    """Return the Attendance key of a user for a conference."""
+    return ndb.Key(Attendance, conf_key.urlsafe(), parent=prof_key)
+
+
+def wishlistItemKey(prof_key, session_key):
+    """Return the WishlistItem key of a session in a user's wishlist."""
+    return ndb.Key(WishlistItem, session_key.urlsafe(), parent=prof_key)
+
+
+def attendedWebsafeKeys(prof_key):
+    """Return the websafe keys of the conferences a user registered for."""
+    return [key.id() for key in
+            Attendance.query(ancestor=prof_key).fetch(keys_only=True)]
+
+
+def attendedConferenceKeys(prof_key):
+    """Return the keys of the conferences a user registered for."""
+    return [ndb.Key(urlsafe=wsck) for wsck in attendedWebsafeKeys(prof_key)]
+
+
+def wishlistSessionKeys(prof_key):
+    """Return the keys of the sessions in a user's wishlist."""
+    return [ndb.Key(urlsafe=key.id()) for key in
+            WishlistItem.query(ancestor=prof_key).fetch(keys_only=True)]
+
+
+@ndb.transactional()
+def addWishlistItem(prof_key, session_key):
+    """Add a session to a user's wishlist; returns False if it was
+    already there."""
+    item_key = wishlistItemKey(prof_key, session_key)
+    if item_key.get():
+        return False
+    WishlistItem(key=item_key, session=session_key,
+                 conference=session_key.parent()).put()
+    return True
+
+
+@ndb.transactional()
+def removeWishlistItem(prof_key, session_key):
+    """Remove a session from a user's wishlist; returns False if it was
+    not there."""
+    item_key = wishlistItemKey(prof_key, session_key)
+    if not item_key.get():
+        return False
+    item_key.delete()
+    return True
+
+
+# - - - Migration - - - - - - - - - - - - - - - - - - - - - - - -
+
+def hasLegacyLists(prof):
+    """Return True if a Profile still holds items in its legacy lists."""
+    return bool(prof.conferenceKeysToAttend or prof.sessionWishlist)
+
+
+def moveLists(prof):
+    """Empty the legacy lists of a Profile in place, returning the child
+    entities replacing them; writing them again is harmless."""
+    children = [Attendance(key=attendanceKey(prof.key, conf_key),
+                           conference=conf_key)
+                for conf_key in (ndb.Key(urlsafe=wsck)
+                                 for wsck in prof.conferenceKeysToAttend)]
+    children += [WishlistItem(key=wishlistItemKey(prof.key, session_key),
+                              session=session_key,
+                              conference=session_key.parent())
+                 for session_key in prof.sessionWishlist]
+    prof.conferenceKeysToAttend = []
+    prof.sessionWishlist = []
+    return children
+
+
+@ndb.transactional()
+def migrateProfile(prof_key):
+    """Move the legacy lists of a profile into child entities; returns the
+    Profile. Call outside of other transactions, which would not see the
+    children written here."""
+    prof = prof_key.get()
+    if prof and hasLegacyLists(prof):
+        ndb.put_multi(moveLists(prof) + [prof])
+    return prof
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""ratelimit.py
+
+Udacity conference server-side Python App Engine admission control;
+    sliding window limits per user and per conference for the mutating
+    endpoints, counted in memcache with atomic incr
+
+Calls are counted per fixed window of a limit's period. A call is admitted
+if the calls of its window, plus those of the previous window weighted by
+the share of it still within the last period, stay within capacity; so
+no more than about capacity calls pass in any period, including across a
+window boundary. A rejected call takes its count back, and a call one
+scope rejects gives back the counts it took in the others.
+
+"""
+
+import time
+
+from google.appengine.api import memcache
+
+# scope -> (capacity, period in seconds)
+RATE_LIMITS = {
+    'user': (30, 60),
+    'conference': (50, 1),
+}
+
+# endpoint -> scopes it is limited by
+RATE_LIMITED = {
+    'registerForConference': ('user', 'conference'),
+    'createSession': ('user', 'conference'),
+    'addSessionToWishlist': ('user', 'conference'),
+    'removeSessionFromWishlist': ('user', 'conference'),
+}
+
+MEMCACHE_RATE_WINDOW_KEY = "RATE %s %s %d"
+MEMCACHE_RATE_REJECTED_KEY = "RATE REJECTED %s %s"
+
+
+def _windowKey(scope, ident, now):
+    return MEMCACHE_RATE_WINDOW_KEY % (scope, ident,
+                                       int(now // RATE_LIMITS[scope][1]))
+
+
+def takeToken(scope, ident, now):
+    """Count a call of ident in scope at time now; returns False, counting
+    nothing, if the call is over the limit. Admits the call if memcache is
+    unavailable."""
+    capacity, period = RATE_LIMITS[scope]
+    key = _windowKey(scope, ident, now)
+    used = memcache.incr(key)
+    if used is None:
+        # first call of the window; another one may race us to it
+        if memcache.add(key, 1, time=2 * period):
+            used = 1
+        else:
+            used = memcache.incr(key)
+        if used is None:
+            return True
+    previous = memcache.get(_windowKey(scope, ident, now - period)) or 0
+    # the previous window's calls, taken as spread evenly over it
+    remaining = 1 - (now % period) / float(period)
+    if used + previous * remaining > capacity:
+        memcache.decr(key)
+        return False
+    return True
+
+
+def giveToken(scope, ident, now):
+    """Take back the count of a call of ident in scope taken at now."""
+    memcache.decr(_windowKey(scope, ident, now))
+
+
+def admit(endpoint, idents):
+    """Return the scope whose limit a call of endpoint is over, or None if
+    the call is admitted; idents maps scope -> ident."""
+    now = time.time()
+    taken = []
+    for scope in RATE_LIMITED[endpoint]:
+        ident = idents.get(scope)
+        if not ident:
+            continue
+        if not takeToken(scope, ident, now):
+            # the call isn't made, so it doesn't count against the others
+            for taken_scope, taken_ident in taken:
+                giveToken(taken_scope, taken_ident, now)
+            memcache.incr(MEMCACHE_RATE_REJECTED_KEY % (endpoint, scope),
+                          initial_value=0)
+            return scope
+        taken.append((scope, ident))
+    return None
+
+
+def rateLimitStats():
+    """Return thresholds and rejection counts per endpoint and scope."""
+    counter_keys = dict(((endpoint, scope),
+                         MEMCACHE_RATE_REJECTED_KEY % (endpoint, scope))
+                        for endpoint, scopes in RATE_LIMITED.items()
+                        for scope in scopes)
+    counts = memcache.get_multi(counter_keys.values())
+    return {
+        'limits': dict((scope, {'capacity': capacity, 'period': period})
+                       for scope, (capacity, period) in RATE_LIMITS.items()),
+        'rejected': dict((endpoint, dict((scope, counts.get(counter_keys[(endpoint, scope)], 0))
+                                         for scope in scopes))
+                         for endpoint, scopes in RATE_LIMITED.items()),
+    }
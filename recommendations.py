@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+"""recommendations.py
+
+Udacity conference server-side Python App Engine conference recommendations;
+    a batch job (build_recommendations cron) scores conference similarity
+    from topic and co-attendance vectors with NumPy and stores the top
+    conferences as a Recommendation child of each conference ("similar")
+    and of each attending user's profile ("for you"), so the API serves
+    them with a key get and a get_multi
+
+"""
+
+from datetime import datetime
+import logging
+
+from google.appengine.ext import ndb
+
+from models import Attendance
+from models import Conference
+from models import Profile
+from models import Recommendation
+
+RECOMMENDATION_COUNT = 10
+TOPIC_WEIGHT = 0.4
+ATTENDANCE_WEIGHT = 0.6
+# similarity matrix rows scored at a time, bounding memory to
+# SIMILARITY_BLOCK_ROWS x conferences floats
+SIMILARITY_BLOCK_ROWS = 200
+QUERY_BATCH_SIZE = 1000
+PUT_BATCH_SIZE = 500
+
+RECOMMENDATION_ID = 'recommended'
+POPULAR_ID = 'popular'
+
+
+def similarConferencesKey(conf_key):
+    """Return the key of the conferences similar to a conference."""
+    return ndb.Key(Recommendation, RECOMMENDATION_ID, parent=conf_key)
+
+
+def userRecommendationsKey(user_id):
+    """Return the key of the conferences recommended for a user."""
+    return ndb.Key(Profile, user_id, Recommendation, RECOMMENDATION_ID)
+
+
+def popularConferencesKey():
+    """Return the key of the most attended conferences, recommended to
+    users without recommendations of their own."""
+    return ndb.Key(Recommendation, POPULAR_ID)
+
+
+def _loadVectors():
+    """Return conference keys, (conference, topic) index pairs and
+    (user id, conference) pairs, read with keys only & projection queries.
+    """
+    conf_keys = Conference.query().fetch(keys_only=True,
+                                         batch_size=QUERY_BATCH_SIZE)
+    conf_index = dict((key, i) for i, key in enumerate(conf_keys))
+
+    topic_index = {}
+    topic_pairs = []
+    # a projection on a repeated property returns one result per value
+    for conf in Conference.query(projection=[Conference.topics]).iter(
+            batch_size=QUERY_BATCH_SIZE):
+        i = conf_index.get(conf.key)
+        # skip conferences created since the keys were read
+        if i is None:
+            continue
+        topic = topic_index.setdefault(conf.topics[0], len(topic_index))
+        topic_pairs.append((i, topic))
+
+    attendance = []
+    # Attendance children are keyed by the conference's websafe key
+    for key in Attendance.query().iter(keys_only=True,
+                                       batch_size=QUERY_BATCH_SIZE):
+        conf = conf_index.get(ndb.Key(urlsafe=key.id()))
+        # skip conferences deleted but not yet scrubbed
+        if conf is not None:
+            attendance.append((key.parent().id(), conf))
+    return conf_keys, topic_pairs, attendance
+
+
+def _coAttendance(np, users, confs, n):
+    """Return (i, j, cosine) arrays of co-attendance similarity: users
+    attending both conferences, over the geometric mean of their attendees.
+    """
+    order = np.lexsort((confs, users))
+    users, confs = users[order], confs[order]
+    firsts, seconds = [], []
+    # sorted by user, conferences of one user are at most a group apart;
+    # pair each row with the row d further while they share the user
+    for d in range(1, len(users)):
+        same = users[:-d] == users[d:]
+        if not same.any():
+            break
+        firsts.append(confs[:-d][same])
+        seconds.append(confs[d:][same])
+    if not firsts:
+        return np.zeros(0, int), np.zeros(0, int), np.zeros(0)
+
+    i = np.concatenate(firsts + seconds)
+    j = np.concatenate(seconds + firsts)
+    pairs, inverse = np.unique(i.astype(np.int64) * n + j, return_inverse=True)
+    counts = np.bincount(inverse)
+    i, j = pairs // n, pairs % n
+    attendees = np.bincount(confs, minlength=n).astype(float)
+    return i, j, counts / np.sqrt(attendees[i] * attendees[j])
+
+
+def similarConferences(np, topic_pairs, users, confs, n,
+                       k=RECOMMENDATION_COUNT):
+    """Return (neighbours, scores), n x k arrays of the k conferences most
+    similar to each conference, best first; neighbours are -1 past the
+    conferences with a positive score.
+    """
+    # unit length topic rows, so their dot products are cosines
+    topics = np.zeros((n, max([t for _, t in topic_pairs] + [0]) + 1))
+    if topic_pairs:
+        rows, cols = zip(*topic_pairs)
+        topics[np.array(rows), np.array(cols)] = 1
+    norms = np.sqrt(topics.sum(1))
+    norms[norms == 0] = 1
+    topics /= norms[:, np.newaxis]
+
+    co_i, co_j, co_sim = _coAttendance(np, users, confs, n)
+
+    k = min(k, n)
+    neighbours = -np.ones((n, k), int)
+    scores = np.zeros((n, k))
+    for lo in range(0, n, SIMILARITY_BLOCK_ROWS):
+        hi = min(lo + SIMILARITY_BLOCK_ROWS, n)
+        rows = np.arange(hi - lo)
+        sim = TOPIC_WEIGHT * np.dot(topics[lo:hi], topics.T)
+        # co-attendance pairs are sorted by i
+        start, end = np.searchsorted(co_i, [lo, hi])
+        sim[co_i[start:end] - lo, co_j[start:end]] += \
+            ATTENDANCE_WEIGHT * co_sim[start:end]
+        sim[rows, rows + lo] = 0  # not similar to itself
+        top = np.argsort(-sim, axis=1)[:, :k]
+        top_scores = sim[rows[:, np.newaxis], top]
+        neighbours[lo:hi] = np.where(top_scores > 0, top, -1)
+        scores[lo:hi] = np.maximum(top_scores, 0)
+    return neighbours, scores
+
+
+def recommendForUsers(np, users, confs, neighbours, scores,
+                      k=RECOMMENDATION_COUNT):
+    """Return (user, conference, score) arrays of the k best conferences
+    for each user, sorted by user and best first: the conferences similar
+    to those a user attends, scores summed, leaving out the attended ones.
+    """
+    n = len(neighbours)
+    candidates = neighbours[confs].ravel()
+    weights = scores[confs].ravel()
+    owners = np.repeat(users, neighbours.shape[1])
+    codes = owners.astype(np.int64) * n + candidates
+    keep = (candidates >= 0) & \
+        ~np.in1d(codes, users.astype(np.int64) * n + confs)
+    if not keep.any():
+        return np.zeros(0, int), np.zeros(0, int), np.zeros(0)
+
+    pairs, inverse = np.unique(codes[keep], return_inverse=True)
+    totals = np.bincount(inverse, weights=weights[keep])
+    owners, candidates = pairs // n, pairs % n
+    order = np.lexsort((-totals, owners))
+    owners, candidates, totals = owners[order], candidates[order], totals[order]
+    # position of each candidate in its user's list
+    rank = np.arange(len(owners)) - np.searchsorted(owners, owners)
+    top = rank < k
+    return owners[top], candidates[top], totals[top]
+
+
+def _recommendation(key, conf_keys, scores, built):
+    return Recommendation(key=key, conferenceKeys=list(conf_keys),
+                          scores=[round(float(s), 4) for s in scores],
+                          built=built)
+
+
+def buildRecommendations():
+    """Recompute and store all conference recommendations, deleting the
+    lists of conferences & users that no longer get any; returns the
+    number of lists written.
+    """
+    import numpy as np  # loaded lazily, only batch jobs need it
+    built = datetime.utcnow()
+    conf_keys, topic_pairs, attendance = _loadVectors()
+    n = len(conf_keys)
+    user_ids = sorted(set(user_id for user_id, _ in attendance))
+    user_index = dict((user_id, u) for u, user_id in enumerate(user_ids))
+    users = np.array([user_index[user_id] for user_id, _ in attendance], int)
+    confs = np.array([conf for _, conf in attendance], int)
+
+    lists = []
+    if n:
+        neighbours, scores = similarConferences(np, topic_pairs, users,
+                                                confs, n)
+        for i in range(n):
+            count = (neighbours[i] >= 0).sum()
+            if count:
+                lists.append(_recommendation(
+                    similarConferencesKey(conf_keys[i]),
+                    [conf_keys[j] for j in neighbours[i][:count]],
+                    scores[i][:count], built))
+
+        owners, candidates, totals = recommendForUsers(
+            np, users, confs, neighbours, scores)
+        starts = np.searchsorted(owners, np.arange(len(user_ids) + 1))
+        for u, user_id in enumerate(user_ids):
+            start, end = starts[u], starts[u + 1]
+            if end > start:
+                lists.append(_recommendation(
+                    userRecommendationsKey(user_id),
+                    [conf_keys[j] for j in candidates[start:end]],
+                    totals[start:end], built))
+
+    if len(confs):
+        attendees = np.bincount(confs, minlength=n)
+        popular = np.argsort(-attendees, kind='mergesort')
+        popular = popular[attendees[popular] > 0][:RECOMMENDATION_COUNT]
+        lists.append(_recommendation(
+            popularConferencesKey(), [conf_keys[j] for j in popular],
+            attendees[popular], built))
+
+    for i in range(0, len(lists), PUT_BATCH_SIZE):
+        ndb.put_multi(lists[i:i + PUT_BATCH_SIZE])
+    stale = Recommendation.query(Recommendation.built < built).fetch(
+        keys_only=True, batch_size=QUERY_BATCH_SIZE)
+    ndb.delete_multi(stale)
+    logging.info('recommendations: %d lists for %d conferences & %d users, '
+                 '%d stale deleted', len(lists), n, len(user_ids), len(stale))
+    return len(lists)
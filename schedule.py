@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""schedule.py
+
+Udacity conference server-side Python App Engine session scheduling helpers;
+    interval indexes over Session date/startTime/duration, conflict and free
+    slot detection
+
+"""
+
+import bisect
+import heapq
+
+from google.appengine.api import memcache
+
+from models import Session
+
+MEMCACHE_SESSION_INDEX_KEY = "SESSION INDEX %s"
+
+
+def sessionInterval(session):
+    """Return (date, start, end) of a Session in minutes since midnight,
+    or None if the session has no date or start time.
+    """
+    if not session.date or session.startTime is None:
+        return None
+    start = session.startTime.hour * 60 + session.startTime.minute
+    return session.date, start, start + (session.duration or 0)
+
+
+def formatMinutes(minutes):
+    """Return minutes since midnight as a time string, like str(time)."""
+    return '%02d:%02d:00' % divmod(minutes, 60)
+
+
+def _span(start, end):
+    """Return end of the interval as used for overlaps; sessions without a
+    duration still occupy their start minute.
+    """
+    return max(end, start + 1)
+
+
+def groupByDay(intervals):
+    """Return [(date, [(start, end, item), ...]), ...] sorted by date and
+    start time, from (date, start, end, item) tuples.
+    """
+    days = {}
+    for date, start, end, item in intervals:
+        days.setdefault(date, []).append((start, end, item))
+    return [(date, sorted(days[date], key=lambda i: (i[0], i[1])))
+            for date in sorted(days)]
+
+
+def findConflicts(day):
+    """Return {position: [positions it overlaps]} for a sorted day."""
+    conflicts = {}
+    active = []  # heap of (end, position) of intervals still running
+    for pos, (start, end, _) in enumerate(day):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, other in active:
+            conflicts.setdefault(pos, []).append(other)
+            conflicts.setdefault(other, []).append(pos)
+        heapq.heappush(active, (_span(start, end), pos))
+    return conflicts
+
+
+def mergeBusy(day):
+    """Return the sorted, non-overlapping busy intervals of a sorted day."""
+    busy = []
+    for start, end, _ in day:
+        end = _span(start, end)
+        if busy and start < busy[-1][1]:
+            busy[-1] = (busy[-1][0], max(busy[-1][1], end))
+        else:
+            busy.append((start, end))
+    return busy
+
+
+def freeGaps(day):
+    """Return (start, end) gaps between the sessions of a sorted day."""
+    gaps = []
+    busy_end = None
+    for start, end, _ in day:
+        if busy_end is not None and start > busy_end:
+            gaps.append((busy_end, start))
+        busy_end = end if busy_end is None else max(busy_end, end)
+    return gaps
+
+
+def fitsFree(busy, start, end):
+    """Return True if [start, end) overlaps none of the merged busy intervals."""
+    # only the last busy interval starting before end can overlap
+    pos = bisect.bisect_left(busy, (_span(start, end),)) - 1
+    return pos < 0 or busy[pos][1] <= start
+
+
+def getSessionIndex(conf_key):
+    """Return {date isoformat: [(start, end, websafeKey), ...]} for the
+    scheduled sessions of a conference, sorted per day; cached in memcache
+    until a session is added to the conference.
+    """
+    cache_key = MEMCACHE_SESSION_INDEX_KEY % conf_key.urlsafe()
+    index = memcache.get(cache_key)
+    if index is None:
+        intervals = []
+        for session in Session.query(ancestor=conf_key):
+            interval = sessionInterval(session)
+            if interval:
+                intervals.append(interval + (session.key.urlsafe(),))
+        index = dict((date.isoformat(), day)
+                     for date, day in groupByDay(intervals))
+        memcache.set(cache_key, index)
+    return index
+
+
+def clearSessionIndex(conf_key):
+    """Drop the cached session index of a conference."""
+    memcache.delete(MEMCACHE_SESSION_INDEX_KEY % conf_key.urlsafe())
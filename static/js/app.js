@@ -130,3 +130,144 @@ app.factory('oauth2Provider', function ($modal) {
 
     return oauth2Provider;
 });
+
+
+/**
+ * @ngdoc service
+ * @name conferenceData
+ *
+ * @description
+ * Shared access to the conference API for all the controllers.
+ * Wraps gapi.client.conference so that read responses are cached for a short time,
+ * identical requests already in flight are merged into a single API call,
+ * and cached reads are invalidated after the mutations that change them.
+ * Every method returns an object with an execute(callback) function like gapi.client does.
+ *
+ */
+app.factory('conferenceData', function () {
+    /**
+     * Cache lifetime in milliseconds of the read methods' responses.
+     */
+    var TTLS = {
+        getProfile: 60 * 1000,
+        getConference: 30 * 1000,
+        queryConferenceSummaries: 30 * 1000,
+        getConferenceSummariesCreated: 30 * 1000,
+        getConferencesToAttend: 30 * 1000,
+        // counts change after a conference is created, once its update_facets task has run
+        getConferenceFacets: 60 * 1000,
+        getAnnouncement: 5 * 60 * 1000
+    };
+
+    /**
+     * Read methods whose cached responses are dropped after a mutation succeeds.
+     */
+    var INVALIDATES = {
+        saveProfile: ['getProfile'],
+        createConference: ['queryConferenceSummaries', 'getConferenceSummariesCreated'],
+        registerForConference: ['getProfile', 'getConference', 'getConferencesToAttend',
+            'queryConferenceSummaries', 'getConferenceSummariesCreated'],
+        unregisterFromConference: ['getProfile', 'getConference', 'getConferencesToAttend',
+            'queryConferenceSummaries', 'getConferenceSummariesCreated']
+    };
+
+    var conferenceData = {
+        /**
+         * Counts of API calls made and of the calls saved by the cache and by merging.
+         */
+        stats: {
+            apiCalls: 0,
+            cacheHits: 0,
+            coalesced: 0
+        }
+    };
+
+    // requestKey -> {resp: ..., expires: ...}
+    var cache = {};
+    // requestKey -> [callback, ...] waiting for the response
+    var inFlight = {};
+
+    /**
+     * Hands a copy of the response to the callback outside the current call stack,
+     * as callbacks call $scope.$apply and may not run within a digest.
+     */
+    var respond = function (callback, resp) {
+        var copy = angular.copy(resp);
+        window.setTimeout(function () {
+            callback(copy);
+        }, 0);
+    };
+
+    /**
+     * Drops the cached responses of the given methods.
+     *
+     * @param {Array} methods the method names; all methods if omitted.
+     */
+    conferenceData.invalidate = function (methods) {
+        angular.forEach(cache, function (entry, requestKey) {
+            if (!methods || methods.indexOf(requestKey.split(' ')[0]) >= 0) {
+                delete cache[requestKey];
+            }
+        });
+    };
+
+    /**
+     * Returns a request object for the API method with the params.
+     *
+     * @param {String} method the conference API method name.
+     * @param {Object} params the request params.
+     * @returns {{execute: Function}}
+     */
+    conferenceData.request = function (method, params) {
+        var requestKey = method + ' ' + JSON.stringify(params || {});
+        return {
+            execute: function (callback) {
+                var ttl = TTLS[method];
+                var entry = cache[requestKey];
+                if (ttl && entry && entry.expires > Date.now()) {
+                    conferenceData.stats.cacheHits++;
+                    respond(callback, entry.resp);
+                    return;
+                }
+                if (ttl && inFlight[requestKey]) {
+                    conferenceData.stats.coalesced++;
+                    inFlight[requestKey].push(callback);
+                    return;
+                }
+                var callbacks = [callback];
+                if (ttl) {
+                    inFlight[requestKey] = callbacks;
+                }
+                conferenceData.stats.apiCalls++;
+                gapi.client.conference[method](params).execute(function (resp) {
+                    if (ttl) {
+                        delete inFlight[requestKey];
+                    }
+                    if (!resp.error) {
+                        if (ttl) {
+                            cache[requestKey] = {resp: resp, expires: Date.now() + ttl};
+                        }
+                        if (INVALIDATES[method]) {
+                            conferenceData.invalidate(INVALIDATES[method]);
+                        }
+                    }
+                    angular.forEach(callbacks, function (cb) {
+                        respond(cb, resp);
+                    });
+                });
+            }
+        };
+    };
+
+    // conferenceData.getProfile(params) etc. for the methods the controllers use.
+    angular.forEach(['getProfile', 'saveProfile', 'getConference', 'createConference',
+        'queryConferenceSummaries', 'getConferenceSummariesCreated', 'getConferencesToAttend',
+        'getConferenceFacets', 'registerForConference',
+        'unregisterFromConference', 'getAnnouncement'], function (method) {
+        conferenceData[method] = function (params) {
+            return conferenceData.request(method, params);
+        };
+    });
+
+    return conferenceData;
+});
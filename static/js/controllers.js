@@ -25,7 +25,7 @@ conferenceApp.controllers = angular.module('conferenceControllers', ['ui.bootstr
  * A controller used for the My Profile page.
  */
 conferenceApp.controllers.controller('MyProfileCtrl',
-    function ($scope, $log, oauth2Provider, HTTP_ERRORS) {
+    function ($scope, $log, oauth2Provider, conferenceData, HTTP_ERRORS) {
         $scope.submitted = false;
         $scope.loading = false;
 
@@ -63,7 +63,7 @@ conferenceApp.controllers.controller('MyProfileCtrl',
             var retrieveProfileCallback = function () {
                 $scope.profile = {};
                 $scope.loading = true;
-                gapi.client.conference.getProfile().
+                conferenceData.getProfile().
                     execute(function (resp) {
                         $scope.$apply(function () {
                             $scope.loading = false;
@@ -94,7 +94,7 @@ conferenceApp.controllers.controller('MyProfileCtrl',
         $scope.saveProfile = function () {
             $scope.submitted = true;
             $scope.loading = true;
-            gapi.client.conference.saveProfile($scope.profile).
+            conferenceData.saveProfile($scope.profile).
                 execute(function (resp) {
                     $scope.$apply(function () {
                         $scope.loading = false;
@@ -135,7 +135,7 @@ conferenceApp.controllers.controller('MyProfileCtrl',
  * A controller used for the Create conferences page.
  */
 conferenceApp.controllers.controller('CreateConferenceCtrl',
-    function ($scope, $log, oauth2Provider, HTTP_ERRORS) {
+    function ($scope, $log, oauth2Provider, conferenceData, HTTP_ERRORS) {
 
         /**
          * The conference object being edited in the page.
@@ -214,7 +214,7 @@ conferenceApp.controllers.controller('CreateConferenceCtrl',
             }
 
             $scope.loading = true;
-            gapi.client.conference.createConference($scope.conference).
+            conferenceData.createConference($scope.conference).
                 execute(function (resp) {
                     $scope.$apply(function () {
                         $scope.loading = false;
@@ -249,7 +249,7 @@ conferenceApp.controllers.controller('CreateConferenceCtrl',
  * @description
  * A controller used for the Show conferences page.
  */
-conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $log, oauth2Provider, HTTP_ERRORS) {
+conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $log, oauth2Provider, conferenceData, HTTP_ERRORS) {
 
     /**
      * Holds the status if the query is being executed.
@@ -270,7 +270,9 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
         {enumValue: 'CITY', displayName: 'City'},
         {enumValue: 'TOPIC', displayName: 'Topic'},
         {enumValue: 'MONTH', displayName: 'Start month'},
-        {enumValue: 'MAX_ATTENDEES', displayName: 'Max Attendees'}
+        {enumValue: 'MAX_ATTENDEES', displayName: 'Max Attendees'},
+        {enumValue: 'START_DATE', displayName: 'Start date (YYYY-MM-DD)'},
+        {enumValue: 'END_DATE', displayName: 'End date (YYYY-MM-DD)'}
     ]
 
     /**
@@ -293,6 +295,19 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.conferences = [];
 
+    /**
+     * Holds the conference counts per value of the City, Topic and Start month filters,
+     * as returned by conference.getConferenceFacets.
+     * @type {Array}
+     */
+    $scope.facets = [];
+
+    /**
+     * The fields the facet counts can be narrowed by.
+     * @type {Array}
+     */
+    var FACET_FIELDS = ['CITY', 'TOPIC', 'MONTH'];
+
     /**
      * Holds the state if offcanvas is enabled.
      *
@@ -397,6 +412,35 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
         $scope.filters = [];
     };
 
+    /**
+     * Returns the entry of filtereableFields for the enum value.
+     *
+     * @param enumValue
+     * @returns {*}
+     */
+    $scope.filtereableField = function (enumValue) {
+        for (var i = 0; i < $scope.filtereableFields.length; i++) {
+            if ($scope.filtereableFields[i].enumValue == enumValue) {
+                return $scope.filtereableFields[i];
+            }
+        }
+    };
+
+    /**
+     * Adds an equality filter on a facet value and queries the conferences.
+     *
+     * @param field the enum value of the field.
+     * @param value
+     */
+    $scope.addFacetFilter = function (field, value) {
+        $scope.filters.push({
+            field: $scope.filtereableField(field),
+            operator: $scope.operators[0],
+            value: value
+        });
+        $scope.queryConferences();
+    };
+
     /**
      * Removes the filter specified by the index from $scope.filters.
      *
@@ -424,7 +468,35 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     };
 
     /**
-     * Invokes the conference.queryConferences API.
+     * Invokes the conference.getConferenceFacets API, narrowed by the first equality filter
+     * on a facet field if there is one.
+     *
+     * @param filters the filters sent to conference.queryConferenceSummaries.
+     */
+    $scope.getConferenceFacets = function (filters) {
+        var params = {};
+        for (var i = 0; i < filters.length; i++) {
+            if (filters[i].operator == 'EQ' && FACET_FIELDS.indexOf(filters[i].field) >= 0) {
+                params = {field: filters[i].field, value: filters[i].value};
+                break;
+            }
+        }
+        conferenceData.getConferenceFacets(params).
+            execute(function (resp) {
+                $scope.$apply(function () {
+                    if (resp.error) {
+                        // The counts are an extra; the query results are shown without them.
+                        $log.error('Failed to get the conference counts : ' + (resp.error.message || ''));
+                        $scope.facets = [];
+                    } else {
+                        $scope.facets = resp.facets || [];
+                    }
+                });
+            });
+    };
+
+    /**
+     * Invokes the conference.queryConferenceSummaries API.
      */
     $scope.queryConferencesAll = function () {
         var sendFilters = {
@@ -441,7 +513,8 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
             }
         }
         $scope.loading = true;
-        gapi.client.conference.queryConferences(sendFilters).
+        $scope.getConferenceFacets(sendFilters.filters);
+        conferenceData.queryConferenceSummaries(sendFilters).
             execute(function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
@@ -469,11 +542,11 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     }
 
     /**
-     * Invokes the conference.getConferencesCreated method.
+     * Invokes the conference.getConferenceSummariesCreated method.
      */
     $scope.getConferencesCreated = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesCreated().
+        conferenceData.getConferenceSummariesCreated().
             execute(function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
@@ -511,7 +584,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.getConferencesAttend = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesToAttend().
+        conferenceData.getConferencesToAttend().
             execute(function (resp) {
                 $scope.$apply(function () {
                     if (resp.error) {
@@ -547,7 +620,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
  * @description
  * A controller used for the conference detail page.
  */
-conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $log, $routeParams, HTTP_ERRORS) {
+conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $log, $routeParams, conferenceData, HTTP_ERRORS) {
     $scope.conference = {};
 
     $scope.isUserAttending = false;
@@ -559,7 +632,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
      */
     $scope.init = function () {
         $scope.loading = true;
-        gapi.client.conference.getConference({
+        conferenceData.getConference({
             websafeConferenceKey: $routeParams.websafeConferenceKey
         }).execute(function (resp) {
             $scope.$apply(function () {
@@ -581,7 +654,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
 
         $scope.loading = true;
         // If the user is attending the conference, updates the status message and available function.
-        gapi.client.conference.getProfile().execute(function (resp) {
+        conferenceData.getProfile().execute(function (resp) {
             $scope.$apply(function () {
                 $scope.loading = false;
                 if (resp.error) {
@@ -607,7 +680,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
      */
     $scope.registerForConference = function () {
         $scope.loading = true;
-        gapi.client.conference.registerForConference({
+        conferenceData.registerForConference({
             websafeConferenceKey: $routeParams.websafeConferenceKey
         }).execute(function (resp) {
             $scope.$apply(function () {
@@ -624,15 +697,16 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
                         return;
                     }
                 } else {
-                    if (resp.result) {
+                    if (resp.result && resp.result.data) {
                         // Register succeeded.
                         $scope.messages = 'Registered for the conference';
                         $scope.alertStatus = 'success';
                         $scope.isUserAttending = true;
                         $scope.conference.seatsAvailable = $scope.conference.seatsAvailable - 1;
                     } else {
-                        $scope.messages = 'Failed to register for the conference';
-                        $scope.alertStatus = 'warning';
+                        // The conference is full; the user has been waitlisted.
+                        $scope.messages = 'The conference is full, you have been added to the waitlist';
+                        $scope.alertStatus = 'info';
                     }
                 }
             });
@@ -644,7 +718,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
      */
     $scope.unregisterFromConference = function () {
         $scope.loading = true;
-        gapi.client.conference.unregisterFromConference({
+        conferenceData.unregisterFromConference({
             websafeConferenceKey: $routeParams.websafeConferenceKey
         }).execute(function (resp) {
             $scope.$apply(function () {
@@ -691,7 +765,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
  * such as user authentications.
  *
  */
-conferenceApp.controllers.controller('RootCtrl', function ($scope, $location, oauth2Provider) {
+conferenceApp.controllers.controller('RootCtrl', function ($scope, $location, oauth2Provider, conferenceData) {
 
     /**
      * Returns if the viewLocation is the currently viewed page.
@@ -755,6 +829,8 @@ conferenceApp.controllers.controller('RootCtrl', function ($scope, $location, oa
      */
     $scope.signOut = function () {
         oauth2Provider.signOut();
+        // Cached responses belong to the signed out user.
+        conferenceData.invalidate();
         $scope.alertStatus = 'success';
         $scope.rootMessages = 'Logged out';
     };
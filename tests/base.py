@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""base.py
+
+Udacity conference server-side Python App Engine test helpers; a test case
+    running each test against fresh datastore, memcache & task queue
+    testbed stubs
+
+Run the tests from the repository root with the App Engine SDK importable:
+
+    PYTHONPATH=<sdk>/platform/google_appengine python -m unittest discover tests
+
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+try:
+    import dev_appserver
+    dev_appserver.fix_sys_path()  # endpoints, protorpc, webob...
+except ImportError:
+    pass
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+
+class TestbedTestCase(unittest.TestCase):
+    """Test case with datastore (strongly consistent), memcache & task
+    queue stubs."""
+
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+            probability=1)
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+        self.testbed.init_taskqueue_stub(root_path=ROOT)
+        self.taskqueue = self.testbed.get_stub(testbed.TASKQUEUE_SERVICE_NAME)
+        ndb.get_context().clear_cache()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def popTasks(self, url):
+        """Return the params of the queued tasks for url and empty the
+        queue."""
+        tasks = self.taskqueue.get_filtered_tasks(url=url)
+        self.taskqueue.FlushQueue('default')
+        return [task.extract_params() for task in tasks]
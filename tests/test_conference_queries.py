@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""test_conference_queries.py -- tests of queryConferences filtering"""
+
+from datetime import date
+
+from base import TestbedTestCase
+
+import endpoints
+from google.appengine.ext import ndb
+
+from calendarindex import LONG_BUCKET
+from calendarindex import calendarBuckets
+from calendarindex import updateCalendar
+from conference import ConferenceApi
+from models import Conference
+from models import ConferenceQueryForm
+from models import ConferenceQueryForms
+from models import Profile
+
+
+def conference(name, city, topics, maxAttendees, startDate=None,
+               endDate=None):
+    return Conference(parent=ndb.Key(Profile, 'organizer'), name=name,
+                      organizerUserId='organizer', city=city, topics=topics,
+                      maxAttendees=maxAttendees, startDate=startDate,
+                      endDate=endDate,
+                      month=startDate.month if startDate else 0)
+
+
+class ConferenceQueryTest(TestbedTestCase):
+
+    def setUp(self):
+        super(ConferenceQueryTest, self).setUp()
+        self.api = ConferenceApi()
+        keys = ndb.put_multi([
+            conference('a', 'London', ['AI'], 10,
+                       date(2015, 3, 2), date(2015, 3, 4)),
+            conference('b', 'Paris', ['AI', 'Web'], 100,
+                       date(2015, 3, 10), date(2015, 3, 12)),
+            conference('c', 'London', ['Web'], 50,
+                       date(2015, 6, 1), date(2015, 6, 2)),
+            conference('d', 'London', ['AI'], 20),
+        ])
+        for key in keys:
+            updateCalendar(key)
+
+    def query(self, *filters):
+        request = ConferenceQueryForms(filters=[
+            ConferenceQueryForm(field=field, operator=operator, value=value)
+            for field, operator, value in filters])
+        return [conf.name for conf in self.api._queryConferences(request)]
+
+    def testWindowFromCalendar(self):
+        self.assertEqual(['a', 'b'], self.query(
+            ('START_DATE', 'GTEQ', '2015-03-01'),
+            ('START_DATE', 'LTEQ', '2015-03-31')))
+
+    def testWindowWithEqualityFilters(self):
+        self.assertEqual(['a'], self.query(
+            ('CITY', 'EQ', 'London'),
+            ('END_DATE', 'GTEQ', '2015-03-01'),
+            ('START_DATE', 'LT', '2015-04-01')))
+        # a repeated property matches on any of its values
+        self.assertEqual(['b'], self.query(
+            ('TOPIC', 'EQ', 'Web'),
+            ('START_DATE', 'GTEQ', '2015-03-01'),
+            ('START_DATE', 'LTEQ', '2015-03-31')))
+
+    def testWindowWithInequalityOrdersByIt(self):
+        self.assertEqual(['a', 'c'], self.query(
+            ('MAX_ATTENDEES', 'LT', '60'),
+            ('START_DATE', 'GTEQ', '2015-01-01'),
+            ('START_DATE', 'LTEQ', '2015-12-31')))
+        self.assertEqual(['c', 'b'], self.query(
+            ('MAX_ATTENDEES', 'GT', '20'),
+            ('START_DATE', 'GTEQ', '2015-01-01'),
+            ('START_DATE', 'LTEQ', '2015-12-31')))
+
+    def testOpenRangeAlone(self):
+        self.assertEqual(['b', 'c'], self.query(
+            ('START_DATE', 'GTEQ', '2015-03-05')))
+
+    def testOpenRangeWithEqualityFilter(self):
+        self.assertEqual(['a', 'c'], self.query(
+            ('CITY', 'EQ', 'London'),
+            ('END_DATE', 'GTEQ', '2015-03-03')))
+
+    def testLongWindowIsQueried(self):
+        self.assertEqual(['a', 'b', 'c'], self.query(
+            ('START_DATE', 'GTEQ', '2014-01-01'),
+            ('START_DATE', 'LTEQ', '2016-06-30')))
+
+    def testNoDateFilters(self):
+        self.assertEqual(['a', 'c', 'd'], self.query(('CITY', 'EQ', 'London')))
+        self.assertEqual(['d', 'c', 'b'], self.query(
+            ('MAX_ATTENDEES', 'GTEQ', '20')))
+
+    def testDateEqualityRejected(self):
+        self.assertRaises(endpoints.BadRequestException, self.query,
+                          ('START_DATE', 'EQ', '2015-03-02'))
+
+    def testLongConferenceInWindow(self):
+        # 20 weeks, started before the window
+        key = conference('e', 'Paris', ['Web'], 80,
+                         date(2015, 2, 2), date(2015, 6, 20)).put()
+        updateCalendar(key)
+        window = [('END_DATE', 'GTEQ', '2015-05-01'),
+                  ('START_DATE', 'LTEQ', '2015-05-31')]
+        self.assertEqual(['e'], self.query(*window))
+        # the same as the datastore query over an open range
+        self.assertEqual(['c', 'e'], self.query(window[0]))
+        self.assertEqual(['e'], self.query(('CITY', 'EQ', 'Paris'),
+                                           *window))
+
+    def testCalendarBuckets(self):
+        self.assertEqual(['2015-03-02', '2015-03-09'], calendarBuckets(
+            date(2015, 3, 4), date(2015, 3, 10)))
+        self.assertEqual([LONG_BUCKET], calendarBuckets(
+            date(2015, 1, 1), date(2015, 6, 1)))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""test_deletion.py -- tests of the chained conference cleanup tasks"""
+
+from base import TestbedTestCase
+
+from google.appengine.ext import ndb
+
+import deletion
+from feeds import feedVersion
+from feeds import wishlistFeedId
+from models import Attendance
+from models import Conference
+from models import Profile
+from models import Session
+from models import WishlistItem
+from profilelists import addWishlistItem
+from profilelists import attendanceKey
+
+TASK_URL = '/tasks/delete_conference'
+USERS = ('ann', 'bob', 'cat')
+
+
+class DeletionTest(TestbedTestCase):
+
+    def setUp(self):
+        super(DeletionTest, self).setUp()
+        self.batchSize = deletion.DELETE_BATCH_SIZE
+        deletion.DELETE_BATCH_SIZE = 2
+        organizer = ndb.Key(Profile, 'organizer')
+        self.conf_key, self.other_key = ndb.put_multi([
+            Conference(parent=organizer, name='PyCon'),
+            Conference(parent=organizer, name='JSConf')])
+        self.session_keys = ndb.put_multi(
+            [Session(parent=self.conf_key, name='s%d' % i, speaker='x')
+             for i in range(3)])
+        self.other_session = Session(parent=self.other_key, name='o',
+                                     speaker='x').put()
+        for user_id in USERS:
+            p_key = ndb.Key(Profile, user_id)
+            for session_key in self.session_keys + [self.other_session]:
+                addWishlistItem(p_key, session_key)
+            Attendance(key=attendanceKey(p_key, self.conf_key),
+                       conference=self.conf_key).put()
+            Attendance(key=attendanceKey(p_key, self.other_key),
+                       conference=self.other_key).put()
+
+    def tearDown(self):
+        deletion.DELETE_BATCH_SIZE = self.batchSize
+        super(DeletionTest, self).tearDown()
+
+    def runCleanup(self):
+        """Run the cleanup tasks until none is left; returns the stages
+        run, in order."""
+        stages = []
+        deletion.enqueueConferenceCleanup(self.conf_key)
+        while True:
+            tasks = self.popTasks(TASK_URL)
+            if not tasks:
+                return stages
+            for params in tasks:
+                stages.append(params['stage'])
+                deletion.runCleanupStage(
+                    ndb.Key(urlsafe=params['websafeConferenceKey']),
+                    params['stage'], params.get('cursor'))
+
+    def testCleanupPagesThroughStages(self):
+        self.conf_key.delete()
+        stages = self.runCleanup()
+        # 3 sessions; 9 wishlist items; 3 registrations, 2 per batch
+        self.assertEqual([deletion.STAGE_DESCENDANTS] * 2 +
+                         [deletion.STAGE_WISHLISTS] * 5 +
+                         [deletion.STAGE_ATTENDEES] * 2, stages)
+
+        self.assertEqual([None] * 3, ndb.get_multi(self.session_keys))
+        self.assertEqual([self.other_session] * 3,
+                         [item.session for item in WishlistItem.query()])
+        self.assertEqual([self.other_key] * 3,
+                         [a.conference for a in Attendance.query()])
+        self.assertIsNotNone(self.other_session.get())
+
+    def testWishlistFeedsBumped(self):
+        versions = dict((user_id, feedVersion(wishlistFeedId(user_id)))
+                        for user_id in USERS)
+        self.conf_key.delete()
+        self.runCleanup()
+        for user_id in USERS:
+            self.assertNotEqual(versions[user_id],
+                                feedVersion(wishlistFeedId(user_id)))
+
+    def testWishlistStageIsBounded(self):
+        # one batch deletes one page, handing back the cursor of the next
+        self.assertIsNotNone(deletion.scrubWishlistsBatch(self.conf_key))
+        self.assertEqual(7, WishlistItem.query(
+            WishlistItem.conference == self.conf_key).count())
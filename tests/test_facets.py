@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""test_facets.py -- tests of the sharded facet counters"""
+
+from base import TestbedTestCase
+
+from google.appengine.ext import ndb
+
+from facets import _shard
+from facets import applyFacetDeltas
+from facets import facetDeltas
+from facets import facetValues
+from facets import getFacetCounts
+from facets import recountFacets
+from models import Conference
+from models import FacetUpdate
+
+
+def conference(city, topics, month):
+    return Conference(name='c', city=city, topics=topics, month=month)
+
+
+class FacetsTest(TestbedTestCase):
+
+    def testRetriedUpdateCountsOnce(self):
+        deltas = facetDeltas(set(), facetValues(
+            conference('London', ['AI'], 3)))
+        applyFacetDeltas(deltas, 'task-1')
+        applyFacetDeltas(deltas, 'task-1')
+        self.assertEqual({'city': {'London': 1}, 'topics': {'AI': 1},
+                          'month': {'3': 1}}, getFacetCounts())
+
+        applyFacetDeltas(deltas, 'task-2')
+        self.assertEqual({'London': 2}, getFacetCounts()['city'])
+
+    def testUpdateResumesAfterAppliedDeltas(self):
+        deltas = [(u'', u'city', u'London', 1), (u'', u'city', u'Paris', 1),
+                  (u'', u'topics', u'AI', 1)]
+        # a run that failed after applying two deltas
+        FacetUpdate(id='task-1', applied=2).put()
+        applyFacetDeltas(deltas, 'task-1')
+        self.assertEqual({'topics': {'AI': 1}}, getFacetCounts())
+        self.assertEqual(3, FacetUpdate.get_by_id('task-1').applied)
+
+    def testRecountSetsAbsoluteCounts(self):
+        confs = [conference('London', ['AI', 'Web'], 3),
+                 conference('London', ['AI'], 4),
+                 conference('Paris', ['Web'], 3)]
+        ndb.put_multi(confs)
+        # a counter left negative by a double-applied delete
+        bad = _shard(u'', u'city', u'London', 3)
+        bad.count = -2
+        bad.put()
+        # counts cached before the recount are dropped by it
+        self.assertEqual({'city': {}}, getFacetCounts())
+
+        for conf in confs:
+            recountFacets(facetValues(conf))
+        self.assertEqual({'city': {'London': 2, 'Paris': 1},
+                          'topics': {'AI': 2, 'Web': 2},
+                          'month': {'3': 2, '4': 1}}, getFacetCounts())
+        self.assertEqual({'topics': {'AI': 2, 'Web': 1},
+                          'month': {'3': 1, '4': 1}},
+                         getFacetCounts(u'city=London'))
+        self.assertEqual({'city': {'London': 1, 'Paris': 1},
+                          'topics': {'AI': 1, 'Web': 2}},
+                         getFacetCounts(u'month=3'))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""test_feeds.py -- tests of the wishlist feed tokens and .ics output"""
+
+import base64
+from datetime import date
+from datetime import time
+
+from base import TestbedTestCase
+
+from feeds import _fold
+from feeds import _text
+from feeds import conferenceFeed
+from feeds import resetWishlistToken
+from feeds import userIdFromToken
+from feeds import wishlistToken
+from models import Conference
+from models import Profile
+from models import Session
+
+USER_ID = 'ann@example.com'
+
+
+def unfold(body):
+    """Return the content lines of a feed body, unfolded."""
+    return body.replace('\r\n ', '').split('\r\n')
+
+
+class WishlistTokenTest(TestbedTestCase):
+
+    def setUp(self):
+        super(WishlistTokenTest, self).setUp()
+        self.p_key = Profile(id=USER_ID, displayName='ann').put()
+
+    def token(self):
+        return wishlistToken(self.p_key.get())
+
+    def testTokenIsOpaqueAndStable(self):
+        token = self.token()
+        self.assertEqual(32, len(token))
+        self.assertEqual(token, self.token())
+        self.assertNotIn('ann', token)
+        self.assertNotIn(base64.urlsafe_b64encode(USER_ID).rstrip('='),
+                         token)
+        other = Profile(id='bob@example.com').put()
+        self.assertNotEqual(token, wishlistToken(other.get()))
+
+    def testTokenVerifies(self):
+        token = self.token()
+        self.assertEqual(USER_ID, userIdFromToken(token))
+        # from memcache the second time
+        self.assertEqual(USER_ID, userIdFromToken(token))
+
+    def testTamperedTokensRejected(self):
+        token = self.token()
+        flipped = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+        self.assertIsNone(userIdFromToken(flipped))
+        self.assertIsNone(userIdFromToken(token[:-1]))
+        self.assertIsNone(userIdFromToken(token + 'A'))
+        self.assertIsNone(userIdFromToken(
+            base64.urlsafe_b64encode(USER_ID).rstrip('=')))
+
+    def testResetRevokesOldToken(self):
+        old = self.token()
+        self.assertEqual(USER_ID, userIdFromToken(old))
+        new = resetWishlistToken(self.p_key)
+        self.assertNotEqual(old, new)
+        self.assertIsNone(userIdFromToken(old))
+        self.assertEqual(USER_ID, userIdFromToken(new))
+        self.assertEqual(new, self.token())
+
+
+class IcsTest(TestbedTestCase):
+
+    def testTextEscaping(self):
+        self.assertEqual('a\\,b\\;c\\\\d\\ne\\nf',
+                         _text('a,b;c\\d\ne\r\nf'))
+        self.assertEqual('', _text(None))
+
+    def testFoldAscii(self):
+        line = 'DESCRIPTION:' + 'x' * 150
+        folded = list(_fold(line))
+        self.assertEqual([75, 75, 14], [len(f) for f in folded])
+        self.assertTrue(all(f.startswith(' ') for f in folded[1:]))
+        self.assertEqual(line, ''.join(f[1:] if i else f
+                                       for i, f in enumerate(folded)))
+        self.assertEqual(['SUMMARY:short'], list(_fold('SUMMARY:short')))
+
+    def testFoldKeepsUtf8Sequences(self):
+        line = u'SUMMARY:' + u'\xe9' * 40
+        folded = list(_fold(line))
+        self.assertEqual(74, len(folded[0]))
+        for f in folded:
+            self.assertTrue(len(f) <= 75)
+            f.decode('utf-8')
+        self.assertEqual(line.encode('utf-8'), ''.join(
+            f[1:] if i else f for i, f in enumerate(folded)))
+
+    def testConferenceFeed(self):
+        conf_key = Conference(name='PyCon; 2015', city='Montreal').put()
+        Session(parent=conf_key, name='Intro, part 1', speaker='Guido',
+                highlights='x' * 100, date=date(2015, 4, 10),
+                startTime=time(9, 30), duration=45,
+                sessionType=['talk']).put()
+        Session(parent=conf_key, name='Unscheduled').put()
+
+        body = conferenceFeed(conf_key)
+        self.assertTrue(body.endswith('\r\n'))
+        self.assertTrue(all(len(line) <= 75
+                            for line in body.split('\r\n')))
+        lines = unfold(body)
+        self.assertIn('X-WR-CALNAME:PyCon\\; 2015', lines)
+        self.assertIn('SUMMARY:Intro\\, part 1', lines)
+        self.assertIn('DTSTART:20150410T093000', lines)
+        self.assertIn('DTEND:20150410T101500', lines)
+        self.assertIn('DESCRIPTION:Speaker: Guido\\n' + 'x' * 100, lines)
+        self.assertIn('LOCATION:Montreal', lines)
+        self.assertEqual(1, lines.count('BEGIN:VEVENT'))
+
+    def testMissingConference(self):
+        conf_key = Conference(name='gone').put()
+        conf_key.delete()
+        self.assertIsNone(conferenceFeed(conf_key))
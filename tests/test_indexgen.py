@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+"""test_indexgen.py -- tests of the index.yaml generator"""
+
+import os
+import unittest
+
+import indexgen
+
+
+def shape(kind, eq=(), order=(), ancestor=False, projection=()):
+    return {'kind': kind, 'ancestor': ancestor, 'eq': eq, 'order': order,
+            'projection': projection}
+
+
+class IndexGenTest(unittest.TestCase):
+
+    def testBuiltinIndexesNeedNothing(self):
+        for s in (shape('Session', ('speaker',)),
+                  shape('Session', order=('startTime',)),
+                  shape('Session', ('speaker', 'sessionType')),
+                  shape('Session', ancestor=True),
+                  shape('Session', ('speaker',), ancestor=True),
+                  shape('Conference', projection=('topics',))):
+            self.assertEqual([], indexgen.requiredIndexes(s))
+
+    def testSortedEqualityUsesMergeJoin(self):
+        self.assertEqual(
+            [('Conference', False, ('city', 'month', 'name')),
+             ('Conference', False, ('topics', 'month', 'name'))],
+            indexgen.requiredIndexes(
+                shape('Conference', ('city', 'topics'), ('month', 'name'))))
+        self.assertEqual(
+            [('Session', True, ('date', 'startTime'))],
+            indexgen.requiredIndexes(
+                shape('Session', order=('date', 'startTime'), ancestor=True)))
+
+    def testProjectionNeedsOneIndex(self):
+        self.assertEqual(
+            [('Session', False, ('speaker', 'name'))],
+            indexgen.requiredIndexes(
+                shape('Session', ('speaker',), projection=('name',))))
+        self.assertEqual(
+            [('Conference', True, ('city', 'name'))],
+            indexgen.requiredIndexes(
+                shape('Conference', ancestor=True,
+                      projection=('name', 'city'))))
+
+    def testFormatParsesBack(self):
+        indexes = [('Conference', False, ('city', 'name')),
+                   ('Session', True, ('date', 'startTime'))]
+        self.assertEqual(indexes, indexgen.parseIndexYaml(
+            indexgen.formatIndexes(indexes)))
+
+    def testIndexYamlUpToDate(self):
+        with open(os.path.join(indexgen.HERE, 'index.yaml')) as f:
+            self.assertEqual(indexgen.formatIndexes(indexgen.generateIndexes()),
+                             f.read())
+
+    def testQueriedPropertiesAreIndexed(self):
+        properties = indexgen.modelProperties()
+        for s in indexgen.queryShapes():
+            for prop in s['eq'] + s['order'] + s['projection']:
+                self.assertTrue(properties[s['kind']][prop][0],
+                                '%s.%s is queried but unindexed' %
+                                (s['kind'], prop))
+
+    def testRowsPerPut(self):
+        properties = {'Session': {'speaker': (True, False),
+                                  'sessionType': (True, True),
+                                  'highlights': (False, False)}}
+        self.assertEqual((6, 2), indexgen.indexRowsPerPut(
+            'Session', [('Session', False, ('speaker', 'sessionType')),
+                        ('Conference', False, ('city', 'name'))],
+            properties))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+"""test_keyresolver.py -- tests of the cached conference records"""
+
+from base import TestbedTestCase
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from keyresolver import MEMCACHE_CONF_RECORD_KEY
+from keyresolver import getConferenceOrganizer
+from keyresolver import markConferenceDeleted
+from models import Conference
+from models import Profile
+
+
+class KeyResolverTest(TestbedTestCase):
+
+    def setUp(self):
+        super(KeyResolverTest, self).setUp()
+        self.conf_key = Conference(parent=ndb.Key(Profile, 'organizer'),
+                                   name='PyCon',
+                                   organizerUserId='organizer').put()
+
+    def testRecordCached(self):
+        self.assertEqual('organizer', getConferenceOrganizer(self.conf_key))
+        self.conf_key.delete()
+        self.assertEqual('organizer', getConferenceOrganizer(self.conf_key))
+
+    def testTombstoneWinsOverStaleRead(self):
+        self.conf_key.delete()
+        markConferenceDeleted(self.conf_key)
+        # a reader that loaded the conference before the delete caches it
+        # after the tombstone
+        self.assertFalse(memcache.add(
+            MEMCACHE_CONF_RECORD_KEY % self.conf_key.urlsafe(), 'organizer'))
+        self.assertIsNone(getConferenceOrganizer(self.conf_key))
+
+    def testTombstoneWrittenOnCommit(self):
+        getConferenceOrganizer(self.conf_key)
+
+        @ndb.transactional()
+        def delete():
+            self.conf_key.delete()
+            ndb.get_context().call_on_commit(
+                lambda: markConferenceDeleted(self.conf_key))
+            # still cached until the delete commits
+            self.assertEqual('organizer',
+                             getConferenceOrganizer(self.conf_key))
+        delete()
+        self.assertIsNone(getConferenceOrganizer(self.conf_key))
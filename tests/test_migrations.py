@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+"""test_migrations.py -- tests of the resumable migration runner"""
+
+from datetime import date
+
+from base import TestbedTestCase
+
+from google.appengine.ext import ndb
+
+import migrations
+from models import Conference
+from models import MigrationState
+
+NAME = 'conference_month'
+TASK_URL = '/tasks/run_migration'
+
+
+class MigrationsTest(TestbedTestCase):
+
+    def setUp(self):
+        super(MigrationsTest, self).setUp()
+        self.batchSize = migrations.MIGRATION_BATCH_SIZE
+        migrations.MIGRATION_BATCH_SIZE = 2
+        # 5 conferences, 3 of them missing their month
+        self.keys = ndb.put_multi(
+            [Conference(name='c%d' % i, startDate=date(2015, i + 1, 1),
+                        month=(i + 1 if i < 2 else None))
+             for i in range(5)])
+
+    def tearDown(self):
+        migrations.MIGRATION_BATCH_SIZE = self.batchSize
+        super(MigrationsTest, self).tearDown()
+
+    def runTasks(self):
+        """Run queued migration batches until no task is left; returns the
+        number of batches run."""
+        runs = 0
+        while True:
+            tasks = self.popTasks(TASK_URL)
+            if not tasks:
+                return runs
+            for params in tasks:
+                migrations.runMigrationBatch(params['name'],
+                                             int(params['batch']))
+                runs += 1
+
+    def testStartEnqueuesFirstBatch(self):
+        state = migrations.startMigration(NAME)
+        self.assertEqual(0, state.batch)
+        self.assertFalse(state.done)
+        self.assertEqual(Conference._get_kind(), state.kind)
+        tasks = self.popTasks(TASK_URL)
+        self.assertEqual(1, len(tasks))
+        self.assertEqual(NAME, tasks[0]['name'])
+        self.assertEqual('0', tasks[0]['batch'])
+
+    def testStartUnknownMigration(self):
+        self.assertRaises(KeyError, migrations.startMigration, 'no_such')
+        self.assertEqual([], self.popTasks(TASK_URL))
+
+    def testStartTwiceLeavesMigrationAlone(self):
+        migrations.startMigration(NAME)
+        self.popTasks(TASK_URL)
+        migrations.runMigrationBatch(NAME, 0)
+
+        state = migrations.startMigration(NAME)
+        self.assertEqual(1, state.batch)
+        self.assertEqual(2, state.processed)
+        # only the chained batch 1 is queued, no new batch 0
+        self.assertEqual(['1'], [t['batch'] for t in self.popTasks(TASK_URL)])
+
+    def testRestartStartsOver(self):
+        migrations.startMigration(NAME)
+        self.runTasks()
+        self.assertTrue(MigrationState.get_by_id(NAME).done)
+
+        state = migrations.startMigration(NAME, restart=True)
+        self.assertEqual(0, state.batch)
+        self.assertEqual(0, state.processed)
+        self.assertFalse(state.done)
+        self.assertEqual(3, self.runTasks())
+        state = MigrationState.get_by_id(NAME)
+        self.assertTrue(state.done)
+        self.assertEqual(5, state.processed)
+        # the first run wrote every month already
+        self.assertEqual(0, state.updated)
+
+    def testBatchesChainUntilDone(self):
+        migrations.startMigration(NAME)
+        self.assertEqual(3, self.runTasks())
+
+        state = MigrationState.get_by_id(NAME)
+        self.assertTrue(state.done)
+        self.assertEqual(3, state.batch)
+        self.assertEqual(5, state.processed)
+        self.assertEqual(3, state.updated)
+        self.assertEqual([1, 2, 3, 4, 5],
+                         [conf.month for conf in ndb.get_multi(self.keys)])
+
+    def testDuplicateBatchIsDropped(self):
+        migrations.startMigration(NAME)
+        self.popTasks(TASK_URL)
+        migrations.runMigrationBatch(NAME, 0)
+        self.popTasks(TASK_URL)
+
+        # the task of batch 0 delivered again
+        migrations.runMigrationBatch(NAME, 0)
+        state = MigrationState.get_by_id(NAME)
+        self.assertEqual(1, state.batch)
+        self.assertEqual(2, state.processed)
+        self.assertEqual([], self.popTasks(TASK_URL))
+
+    def testStaleBatchIsDropped(self):
+        migrations.startMigration(NAME)
+        self.popTasks(TASK_URL)
+        # a batch from before a restart, and one not reached yet
+        migrations.runMigrationBatch(NAME, 7)
+        migrations.runMigrationBatch(NAME, 1)
+        state = MigrationState.get_by_id(NAME)
+        self.assertEqual(0, state.batch)
+        self.assertEqual(0, state.processed)
+        self.assertEqual([], self.popTasks(TASK_URL))
+        self.assertEqual([None, None, None],
+                         [conf.month for conf in ndb.get_multi(self.keys[2:])])
+
+    def testBatchAfterDoneIsDropped(self):
+        migrations.startMigration(NAME)
+        self.runTasks()
+        migrations.runMigrationBatch(NAME, 3)
+        state = MigrationState.get_by_id(NAME)
+        self.assertEqual(3, state.batch)
+        self.assertEqual(5, state.processed)
+
+    def testCheckpointOnlyOncePerBatch(self):
+        migrations.startMigration(NAME)
+        self.popTasks(TASK_URL)
+        self.assertTrue(migrations._checkpoint(NAME, 0, None, 2, 1, False))
+        self.assertFalse(migrations._checkpoint(NAME, 0, None, 2, 1, False))
+        state = MigrationState.get_by_id(NAME)
+        self.assertEqual(1, state.batch)
+        self.assertEqual(2, state.processed)
+        self.assertEqual(1, state.updated)
+        self.assertEqual(1, len(self.popTasks(TASK_URL)))
+
+    def testCheckpointOfLastBatchEnqueuesNothing(self):
+        migrations.startMigration(NAME)
+        self.popTasks(TASK_URL)
+        self.assertTrue(migrations._checkpoint(NAME, 0, None, 5, 3, True))
+        self.assertTrue(MigrationState.get_by_id(NAME).done)
+        self.assertEqual([], self.popTasks(TASK_URL))
+
+    def testProgress(self):
+        self.assertEqual([], migrations.migrationProgress())
+        self.assertEqual([], migrations.migrationProgress(NAME))
+
+        migrations.startMigration(NAME)
+        migrations.startMigration('calendar_index')
+        self.popTasks(TASK_URL)
+        migrations.runMigrationBatch(NAME, 0)
+
+        progress = migrations.migrationProgress(NAME)
+        self.assertEqual(1, len(progress))
+        self.assertEqual(1, progress[0]['batch'])
+        self.assertEqual(2, progress[0]['processed'])
+        self.assertFalse(progress[0]['done'])
+        self.assertNotIn('cursor', progress[0])
+        self.assertEqual(2, len(migrations.migrationProgress()))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""test_popularity.py -- tests of session interest counts and the
+per conference leaderboard"""
+
+from datetime import datetime
+from datetime import timedelta
+
+from base import TestbedTestCase
+
+from google.appengine.ext import ndb
+
+import popularity
+from models import Conference
+from models import Session
+from models import SessionLeaderboard
+
+TASK_URL = '/tasks/update_leaderboard'
+
+
+class Clock(object):
+    """Stand-in for the time module."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class PopularityTest(TestbedTestCase):
+
+    def setUp(self):
+        super(PopularityTest, self).setUp()
+        popularity.time = self.clock = Clock(1000.0)
+        self.conf_key = Conference(name='PyCon').put()
+        self.session_keys = ndb.put_multi(
+            [Session(parent=self.conf_key, name='s%02d' % i, speaker='x')
+             for i in range(popularity.LEADERBOARD_SIZE + 2)])
+
+    def tearDown(self):
+        popularity.time = __import__('time')
+        super(PopularityTest, self).tearDown()
+
+    def runTasks(self):
+        tasks = self.popTasks(TASK_URL)
+        for params in tasks:
+            popularity.updateLeaderboard(
+                ndb.Key(urlsafe=params['websafeConferenceKey']))
+        return len(tasks)
+
+    def testRankSessions(self):
+        a, b, c, d = self.session_keys[:4]
+        ranked = popularity.rankSessions({a: 2, b: 5, c: 0, d: -1})
+        self.assertEqual([(b, 5), (a, 2)], ranked)
+        # ties in key order
+        ranked = popularity.rankSessions({b: 3, a: 3})
+        self.assertEqual(sorted([a, b], key=lambda k: k.urlsafe()),
+                         [key for key, _ in ranked])
+
+    def testRankSessionsTrimmed(self):
+        counts = dict((key, i + 1) for i, key in enumerate(self.session_keys))
+        ranked = popularity.rankSessions(counts)
+        size = popularity.LEADERBOARD_SIZE
+        self.assertEqual(size, len(ranked))
+        self.assertEqual(self.session_keys[::-1][:size],
+                         [key for key, _ in ranked])
+
+    def testChangesInSlotShareOneTask(self):
+        for key in self.session_keys[:3]:
+            popularity.changeInterest(key, 1)
+        popularity.changeInterest(self.session_keys[0], 1)
+        self.assertEqual(1, self.runTasks())
+        self.assertEqual([(self.session_keys[0], 2),
+                          (self.session_keys[1], 1),
+                          (self.session_keys[2], 1)],
+                         popularity.getLeaderboard(self.conf_key))
+
+        self.clock.now += popularity.LEADERBOARD_DELAY
+        popularity.changeInterest(self.session_keys[2], 2)
+        popularity.changeInterest(self.session_keys[0], -2)
+        self.assertEqual(1, self.runTasks())
+        self.assertEqual([(self.session_keys[2], 3),
+                          (self.session_keys[1], 1)],
+                         popularity.getLeaderboard(self.conf_key))
+
+    def testSessionOutsideTopIsPromoted(self):
+        for i, key in enumerate(self.session_keys):
+            popularity.setInterest(key, i + 1)
+        self.assertEqual(1, self.runTasks())
+        top = [key for key, _ in popularity.getLeaderboard(self.conf_key)]
+        self.assertNotIn(self.session_keys[0], top)
+
+        # the least wishlisted session overtakes every other one
+        self.clock.now += popularity.LEADERBOARD_DELAY
+        popularity.changeInterest(self.session_keys[0], 100)
+        self.runTasks()
+        self.assertEqual((self.session_keys[0], 101),
+                         popularity.getLeaderboard(self.conf_key)[0])
+
+    def testEmptyLeaderboardDeleted(self):
+        popularity.changeInterest(self.session_keys[0], 1)
+        self.runTasks()
+        self.clock.now += popularity.LEADERBOARD_DELAY
+        popularity.changeInterest(self.session_keys[0], -1)
+        self.runTasks()
+        self.assertIsNone(popularity._leaderboardKey(self.conf_key).get())
+        self.assertEqual([], popularity.getLeaderboard(self.conf_key))
+
+    def testOlderCountDoesNotOverwrite(self):
+        now = datetime.utcnow()
+        key = self.session_keys[0]
+        popularity._putLeaderboard(self.conf_key, [(key, 5)], now)
+        popularity._putLeaderboard(self.conf_key, [(key, 1)],
+                                   now - timedelta(seconds=1))
+        board = SessionLeaderboard.get_by_id(self.conf_key.urlsafe())
+        self.assertEqual([5], board.counts)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""test_profilelists.py -- tests of the per user registration & wishlist
+children and their migration from the legacy Profile lists"""
+
+from base import TestbedTestCase
+
+from google.appengine.ext import ndb
+
+import migrations
+from models import Attendance
+from models import Conference
+from models import Profile
+from models import Session
+from models import WishlistItem
+from profilelists import addWishlistItem
+from profilelists import attendedConferenceKeys
+from profilelists import migrateProfile
+from profilelists import removeWishlistItem
+from profilelists import wishlistSessionKeys
+
+TASK_URL = '/tasks/run_migration'
+
+
+class ProfileListsTest(TestbedTestCase):
+
+    def setUp(self):
+        super(ProfileListsTest, self).setUp()
+        organizer = ndb.Key(Profile, 'organizer')
+        self.conf_keys = ndb.put_multi([Conference(parent=organizer, name=n)
+                                        for n in ('PyCon', 'JSConf')])
+        self.session_keys = ndb.put_multi(
+            [Session(parent=self.conf_keys[0], name='s%d' % i, speaker='x')
+             for i in range(2)])
+
+    def legacyProfile(self, user_id):
+        return Profile(id=user_id, displayName=user_id,
+                       conferenceKeysToAttend=[k.urlsafe()
+                                               for k in self.conf_keys],
+                       sessionWishlist=self.session_keys).put()
+
+    def assertMoved(self, p_key):
+        prof = p_key.get()
+        self.assertEqual([], prof.conferenceKeysToAttend)
+        self.assertEqual([], prof.sessionWishlist)
+        self.assertEqual(sorted(self.conf_keys),
+                         sorted(attendedConferenceKeys(p_key)))
+        self.assertEqual(sorted(self.session_keys),
+                         sorted(wishlistSessionKeys(p_key)))
+        self.assertEqual([self.conf_keys[0]] * 2, [
+            item.conference for item in WishlistItem.query(ancestor=p_key)])
+
+    def testAddRemoveWishlistItem(self):
+        p_key = ndb.Key(Profile, 'ann')
+        self.assertTrue(addWishlistItem(p_key, self.session_keys[0]))
+        self.assertFalse(addWishlistItem(p_key, self.session_keys[0]))
+        self.assertEqual([self.session_keys[0]], wishlistSessionKeys(p_key))
+        self.assertTrue(removeWishlistItem(p_key, self.session_keys[0]))
+        self.assertFalse(removeWishlistItem(p_key, self.session_keys[0]))
+        self.assertEqual([], wishlistSessionKeys(p_key))
+
+    def testMigrateProfile(self):
+        p_key = self.legacyProfile('ann')
+        self.assertEqual('ann', migrateProfile(p_key).displayName)
+        self.assertMoved(p_key)
+        # moving again writes nothing new
+        migrateProfile(p_key)
+        self.assertEqual(2, Attendance.query(ancestor=p_key).count())
+
+    def testMigrateMissingProfile(self):
+        self.assertIsNone(migrateProfile(ndb.Key(Profile, 'nobody')))
+
+    def testProfileListsMigration(self):
+        p_keys = [self.legacyProfile(u) for u in ('ann', 'bob')]
+        Profile(id='cat', displayName='cat').put()
+        migrations.startMigration('profile_lists')
+        while True:
+            tasks = self.popTasks(TASK_URL)
+            if not tasks:
+                break
+            for params in tasks:
+                migrations.runMigrationBatch(params['name'],
+                                             int(params['batch']))
+        state = migrations.migrationProgress('profile_lists')[0]
+        self.assertTrue(state['done'])
+        self.assertEqual(3, state['processed'])
+        self.assertEqual(2, state['updated'])
+        for p_key in p_keys:
+            self.assertMoved(p_key)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""test_ratelimit.py -- tests of the sliding window rate limits"""
+
+from base import TestbedTestCase
+
+from google.appengine.api import memcache
+
+import ratelimit
+
+# window 33 of 30s runs from 990 to 1020
+NOW = 1000.0
+
+
+class Clock(object):
+    """Stand-in for the time module."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class RateLimitTest(TestbedTestCase):
+
+    def setUp(self):
+        super(RateLimitTest, self).setUp()
+        self.limits = ratelimit.RATE_LIMITS
+        ratelimit.RATE_LIMITS = {'user': (3, 30), 'conference': (1, 30)}
+
+    def tearDown(self):
+        ratelimit.RATE_LIMITS = self.limits
+        ratelimit.time = __import__('time')
+        super(RateLimitTest, self).tearDown()
+
+    def take(self, n, now, ident='ann'):
+        return [ratelimit.takeToken('user', ident, now) for _ in range(n)]
+
+    def count(self, scope, ident, now):
+        return memcache.get(ratelimit._windowKey(scope, ident, now))
+
+    def testLimitRejects(self):
+        self.assertEqual([True, True, True, False], self.take(4, NOW))
+        # other idents are counted apart
+        self.assertEqual([True], self.take(1, NOW, 'bob'))
+
+    def testNoBurstAcrossWindows(self):
+        self.assertEqual([True] * 3, self.take(3, 1019.0))
+        # a fixed window would let 3 more through right after 1020
+        self.assertEqual([False], self.take(1, 1020.0))
+        # half the previous window is still within the last period
+        self.assertEqual([True, False], self.take(2, 1035.0))
+        self.assertEqual([True] * 3, self.take(3, 1080.0))
+
+    def testRejectedCallsAreNotCounted(self):
+        self.take(6, NOW)
+        self.assertEqual(3, self.count('user', 'ann', NOW))
+        self.assertEqual([True, False], self.take(2, 1035.0))
+
+    def testConferenceRejectionGivesBackUserCount(self):
+        ratelimit.time = Clock(NOW)
+        idents = {'user': 'ann', 'conference': 'pycon'}
+        self.assertIsNone(ratelimit.admit('registerForConference', idents))
+        self.assertEqual('conference',
+                         ratelimit.admit('registerForConference', idents))
+        self.assertEqual(1, self.count('user', 'ann', NOW))
+        self.assertEqual(1, self.count('conference', 'pycon', NOW))
+        self.assertEqual(1, ratelimit.rateLimitStats()['rejected']
+                         ['registerForConference']['conference'])
+
+    def testUserRejection(self):
+        ratelimit.time = Clock(NOW)
+        self.take(3, NOW)
+        self.assertEqual('user', ratelimit.admit(
+            'registerForConference', {'user': 'ann', 'conference': 'pycon'}))
+        # the conference check isn't reached
+        self.assertIsNone(self.count('conference', 'pycon', NOW))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""test_recommendations.py -- tests of the recommendation batch job"""
+
+import unittest
+
+from base import TestbedTestCase
+
+from google.appengine.ext import ndb
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from models import Attendance
+from models import Conference
+from models import Profile
+from profilelists import attendanceKey
+import recommendations
+from recommendations import buildRecommendations
+from recommendations import recommendForUsers
+from recommendations import similarConferences
+from recommendations import similarConferencesKey
+from recommendations import userRecommendationsKey
+
+# conferences 0 & 1 share a topic; user 0 attends 0 & 2, user 1 attends 2
+TOPIC_PAIRS = [(0, 0), (1, 0), (2, 1)]
+USERS = [0, 0, 1]
+CONFS = [0, 2, 2]
+# topic cosine 1 x 0.4; co-attendance 1 / sqrt(1 x 2) x 0.6
+TOPIC_SCORE = 0.4
+ATTENDANCE_SCORE = 0.6 / 2 ** 0.5
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class RecommendationsTest(TestbedTestCase):
+
+    def similar(self, k=2):
+        return similarConferences(np, TOPIC_PAIRS, np.array(USERS),
+                                  np.array(CONFS), 3, k)
+
+    def testSimilarConferences(self):
+        neighbours, scores = self.similar()
+        self.assertEqual([[2, 1], [0, -1], [0, -1]], neighbours.tolist())
+        expected = [[ATTENDANCE_SCORE, TOPIC_SCORE], [TOPIC_SCORE, 0],
+                    [ATTENDANCE_SCORE, 0]]
+        for row, expected_row in zip(scores.tolist(), expected):
+            for score, expected_score in zip(row, expected_row):
+                self.assertAlmostEqual(expected_score, score)
+
+    def testSimilarConferencesBlocked(self):
+        rows = recommendations.SIMILARITY_BLOCK_ROWS
+        recommendations.SIMILARITY_BLOCK_ROWS = 2
+        try:
+            blocked = self.similar()
+        finally:
+            recommendations.SIMILARITY_BLOCK_ROWS = rows
+        whole = self.similar()
+        self.assertEqual(whole[0].tolist(), blocked[0].tolist())
+        self.assertTrue(np.allclose(whole[1], blocked[1]))
+
+    def testRecommendForUsersLeavesOutAttended(self):
+        neighbours, scores = self.similar()
+        owners, candidates, totals = recommendForUsers(
+            np, np.array(USERS), np.array(CONFS), neighbours, scores)
+        self.assertEqual([0, 1], owners.tolist())
+        self.assertEqual([1, 0], candidates.tolist())
+        self.assertAlmostEqual(TOPIC_SCORE, totals[0])
+        self.assertAlmostEqual(ATTENDANCE_SCORE, totals[1])
+
+    def testRecommendForUsersSumsAndCaps(self):
+        # conference 2 is similar to both conferences user 0 attends
+        neighbours = np.array([[2, 1], [2, 0], [0, 1]])
+        scores = np.array([[0.5, 0.1], [0.3, 0.2], [0.4, 0.1]])
+        owners, candidates, totals = recommendForUsers(
+            np, np.array([0, 0]), np.array([0, 1]), neighbours, scores, k=1)
+        self.assertEqual([0], owners.tolist())
+        self.assertEqual([2], candidates.tolist())
+        self.assertAlmostEqual(0.8, totals[0])
+
+    def testBuildRecommendations(self):
+        organizer = ndb.Key(Profile, 'organizer')
+        conf_keys = ndb.put_multi([
+            Conference(parent=organizer, name='a', topics=['AI']),
+            Conference(parent=organizer, name='b', topics=['AI']),
+            Conference(parent=organizer, name='c', topics=['Web'])])
+        for user_id, conf in zip(('ann', 'ann', 'bob'), CONFS):
+            p_key = ndb.Key(Profile, user_id)
+            Attendance(key=attendanceKey(p_key, conf_keys[conf]),
+                       conference=conf_keys[conf]).put()
+
+        # 3 similar lists, 2 user lists and the popular list
+        self.assertEqual(6, buildRecommendations())
+        self.assertEqual([conf_keys[2], conf_keys[1]],
+                         similarConferencesKey(conf_keys[0]).get()
+                         .conferenceKeys)
+        self.assertEqual([conf_keys[1]],
+                         userRecommendationsKey('ann').get().conferenceKeys)
+        self.assertEqual([conf_keys[0]],
+                         userRecommendationsKey('bob').get().conferenceKeys)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""test_schedule.py -- tests of the session interval helpers"""
+
+from datetime import date
+from datetime import time
+
+from base import TestbedTestCase
+
+from models import Conference
+from models import Session
+from schedule import clearSessionIndex
+from schedule import findConflicts
+from schedule import fitsFree
+from schedule import formatMinutes
+from schedule import freeGaps
+from schedule import getSessionIndex
+from schedule import groupByDay
+from schedule import mergeBusy
+from schedule import sessionInterval
+
+DAY1, DAY2 = date(2015, 3, 2), date(2015, 3, 3)
+# 9:00-10:00, 9:30-10:30, 10:30 with no duration, 11:00-12:00
+DAY = [(540, 600, 'a'), (570, 630, 'b'), (630, 630, 'c'), (660, 720, 'd')]
+
+
+class ScheduleTest(TestbedTestCase):
+
+    def testSessionInterval(self):
+        self.assertEqual((DAY1, 570, 615), sessionInterval(
+            Session(date=DAY1, startTime=time(9, 30), duration=45)))
+        self.assertEqual((DAY1, 0, 0), sessionInterval(
+            Session(date=DAY1, startTime=time(0, 0))))
+        self.assertIsNone(sessionInterval(Session(startTime=time(9, 30))))
+        self.assertIsNone(sessionInterval(Session(date=DAY1)))
+        self.assertEqual('09:05:00', formatMinutes(545))
+
+    def testGroupByDay(self):
+        self.assertEqual(
+            [(DAY1, [(540, 600, 'x'), (600, 660, 'y')]),
+             (DAY2, [(500, 560, 'z')])],
+            groupByDay([(DAY2, 500, 560, 'z'), (DAY1, 600, 660, 'y'),
+                        (DAY1, 540, 600, 'x')]))
+
+    def testFindConflicts(self):
+        # c starts as b ends, and a session ending as another starts is
+        # no conflict
+        self.assertEqual({0: [1], 1: [0]}, findConflicts(DAY))
+        # a session without duration conflicts with one running over it
+        self.assertEqual({0: [1], 1: [0]},
+                         findConflicts([(540, 600, 'a'), (570, 570, 'b')]))
+
+    def testMergeBusy(self):
+        # touching intervals are left apart; c occupies its start minute
+        self.assertEqual([(540, 630), (630, 631), (660, 720)], mergeBusy(DAY))
+
+    def testFreeGaps(self):
+        self.assertEqual([(630, 660)], freeGaps(DAY))
+        self.assertEqual([], freeGaps([]))
+
+    def testFitsFree(self):
+        busy = mergeBusy(DAY)
+        self.assertTrue(fitsFree(busy, 480, 540))
+        self.assertFalse(fitsFree(busy, 480, 541))
+        self.assertTrue(fitsFree(busy, 631, 660))
+        self.assertFalse(fitsFree(busy, 630, 660))
+        self.assertFalse(fitsFree(busy, 650, 800))
+        self.assertTrue(fitsFree(busy, 720, 800))
+        self.assertTrue(fitsFree([], 0, 10))
+
+    def testSessionIndexCachedUntilCleared(self):
+        conf_key = Conference(name='PyCon').put()
+        first = Session(parent=conf_key, name='s1', date=DAY1,
+                        startTime=time(9, 0), duration=60).put()
+        Session(parent=conf_key, name='unscheduled').put()
+        index = getSessionIndex(conf_key)
+        self.assertEqual({DAY1.isoformat(): [(540, 600, first.urlsafe())]},
+                         index)
+
+        second = Session(parent=conf_key, name='s2', date=DAY1,
+                         startTime=time(8, 0), duration=30).put()
+        self.assertEqual(index, getSessionIndex(conf_key))
+        clearSessionIndex(conf_key)
+        self.assertEqual({DAY1.isoformat(): [(480, 510, second.urlsafe()),
+                                             (540, 600, first.urlsafe())]},
+                         getSessionIndex(conf_key))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""test_waitlist.py -- tests of conference registration & the waitlist"""
+
+from base import TestbedTestCase
+
+from google.appengine.ext import ndb
+
+from conference import ConferenceApi
+from conference import ConflictException
+from models import Conference
+from models import Profile
+from models import WaitlistEntry
+from profilelists import attendanceKey
+from waitlist import promoteWaitlist
+from waitlist import waitlistKey
+
+PROMOTE_URL = '/tasks/promote_waitlist'
+
+
+class WaitlistTest(TestbedTestCase):
+
+    def setUp(self):
+        super(WaitlistTest, self).setUp()
+        self.api = ConferenceApi()
+        organizer = ndb.Key(Profile, 'organizer')
+        self.conf_key = Conference(
+            parent=organizer, name='PyCon', organizerUserId='organizer',
+            maxAttendees=1, seatsAvailable=1).put()
+        self.wsck = self.conf_key.urlsafe()
+        for user_id in ('ann', 'bob', 'cat'):
+            Profile(id=user_id, displayName=user_id).put()
+
+    def register(self, user_id, reg=True):
+        return self.api._registerProfile(ndb.Key(Profile, user_id),
+                                         self.wsck, reg).data
+
+    def attending(self, user_id):
+        return bool(attendanceKey(ndb.Key(Profile, user_id),
+                                  self.conf_key).get())
+
+    def waiting(self):
+        return [key.id() for key in WaitlistEntry.query(
+            ancestor=self.conf_key).order(WaitlistEntry.created).fetch(
+            keys_only=True)]
+
+    def testFullConferenceWaitlists(self):
+        self.assertTrue(self.register('ann'))
+        self.assertFalse(self.register('bob'))
+        self.assertTrue(self.attending('ann'))
+        self.assertFalse(self.attending('bob'))
+        self.assertEqual(['bob'], self.waiting())
+        self.assertEqual(0, self.conf_key.get().seatsAvailable)
+
+    def testFreedSeatGoesToWaitlistFirst(self):
+        self.register('ann')
+        self.register('bob')
+        self.popTasks(PROMOTE_URL)
+
+        self.assertTrue(self.register('ann', reg=False))
+        self.assertEqual(1, len(self.popTasks(PROMOTE_URL)))
+        self.assertEqual(1, self.conf_key.get().seatsAvailable)
+
+        # cat calls before the promotion task runs: queued behind bob
+        self.assertFalse(self.register('cat'))
+        self.assertFalse(self.attending('cat'))
+        self.assertEqual(['bob', 'cat'], self.waiting())
+        self.assertEqual(1, len(self.popTasks(PROMOTE_URL)))
+
+        promoteWaitlist(self.conf_key)
+        self.assertTrue(self.attending('bob'))
+        self.assertFalse(self.attending('cat'))
+        self.assertEqual(['cat'], self.waiting())
+        self.assertEqual(0, self.conf_key.get().seatsAvailable)
+
+    def testRegisterTwiceOnWaitlist(self):
+        self.register('ann')
+        self.register('bob')
+        self.register('ann', reg=False)
+        self.assertRaises(ConflictException, self.register, 'bob')
+
+    def testUnregisterLeavesWaitlist(self):
+        self.register('ann')
+        self.register('bob')
+        self.assertTrue(self.register('bob', reg=False))
+        self.assertIsNone(waitlistKey(self.conf_key, 'bob').get())
+        self.assertEqual(0, self.conf_key.get().seatsAvailable)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""tracing.py
+
+Udacity conference server-side Python App Engine request tracing; every API
+    request gets a trace ID which rides along in the params of the tasks it
+    enqueues, so the task handlers in main.py continue the same trace.
+    Datastore, memcache & mail calls and task queue delays are written as
+    structured (JSON) span logs tagged with the trace ID
+
+"""
+
+import contextlib
+import json
+import logging
+import threading
+import time
+import uuid
+
+from google.appengine.api import apiproxy_stub_map
+
+TRACE_PARAM = 'traceId'
+ENQUEUED_PARAM = 'enqueuedAt'
+TRACE_HEADER = 'X-Cloud-Trace-Context'
+
+# API services whose calls are logged as spans
+TRACED_SERVICES = ('datastore_v3', 'memcache', 'mail')
+
+# trace ID & RPC start times of the request running on this thread
+_local = threading.local()
+_hooksInstalled = False
+
+
+def startTrace(trace_id=None):
+    """Start (or continue, given its ID) the trace of the current request;
+    returns the trace ID."""
+    _local.traceId = trace_id or uuid.uuid4().hex
+    _local.rpcStarts = {}
+    return _local.traceId
+
+
+def traceIdFromHeader(value):
+    """Return the trace ID part of an X-Cloud-Trace-Context header value."""
+    return (value or '').split('/', 1)[0] or None
+
+
+def currentTraceId():
+    """Return the trace ID of the current request, or None."""
+    return getattr(_local, 'traceId', None)
+
+
+def logSpan(span, ms, **fields):
+    """Write a structured span log line for the current trace."""
+    fields.update(traceId=currentTraceId(), span=span, ms=round(ms, 1))
+    logging.info('span %s', json.dumps(fields, sort_keys=True))
+
+
+@contextlib.contextmanager
+def timedSpan(span, **fields):
+    """Log the time spent in the with block as a span."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        logSpan(span, (time.time() - start) * 1000, **fields)
+
+
+def addTask(url, params, **kwargs):
+    """taskqueue.add with the current trace ID and the enqueue time added
+    to the task params; kwargs are passed on (transactional, countdown...).
+    """
+    from google.appengine.api import taskqueue  # loaded lazily
+    params = dict(params)
+    params[ENQUEUED_PARAM] = '%.6f' % time.time()
+    if currentTraceId():
+        params[TRACE_PARAM] = currentTraceId()
+    return taskqueue.add(url=url, params=params, **kwargs)
+
+
+def logQueueDelay(task, enqueued_at, eta=None, retry_count=None):
+    """Log how long a task waited between being enqueued and running;
+    etaLagMs is the part of it past the task's scheduled time (countdown).
+    """
+    now = time.time()
+    fields = {'task': task}
+    if eta:
+        fields['etaLagMs'] = round((now - float(eta)) * 1000, 1)
+    if retry_count:
+        fields['retries'] = int(retry_count)
+    logSpan('queue_delay', (now - float(enqueued_at)) * 1000, **fields)
+
+
+def _preCall(service, call, request, response, rpc):
+    if currentTraceId():
+        _local.rpcStarts[id(request)] = time.time()
+
+
+def _postCall(service, call, request, response, rpc, error):
+    start = getattr(_local, 'rpcStarts', {}).pop(id(request), None)
+    if start is not None:
+        fields = {'error': type(error).__name__} if error else {}
+        logSpan('%s.%s' % (service, call), (time.time() - start) * 1000,
+                **fields)
+
+
+def installRpcHooks():
+    """Time the calls to TRACED_SERVICES made while a trace is active;
+    safe to call more than once."""
+    global _hooksInstalled
+    if _hooksInstalled:
+        return
+    for service in TRACED_SERVICES:
+        apiproxy_stub_map.apiproxy.GetPreCallHooks().Append(
+            'tracing_pre_' + service, _preCall, service)
+        apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+            'tracing_post_' + service, _postCall, service)
+    _hooksInstalled = True
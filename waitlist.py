@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""waitlist.py
+
+Udacity conference server-side Python App Engine conference waitlist;
+    users registering for a full conference queue up as WaitlistEntry
+    children of the conference and are promoted in FIFO batches by the
+    promote_waitlist task whenever seats free up
+
+"""
+
+from google.appengine.ext import ndb
+
+from models import Attendance
+from models import Profile
+from models import WaitlistEntry
+from profilelists import attendanceKey
+from profilelists import hasLegacyLists
+from profilelists import moveLists
+from tracing import addTask
+
+WAITLIST_BATCH_SIZE = 20
+
+
+def waitlistKey(conf_key, user_id):
+    """Return the WaitlistEntry key of a user for a conference."""
+    return ndb.Key(WaitlistEntry, user_id, parent=conf_key)
+
+
+def enqueuePromotion(conf_key, transactional=False):
+    """Add a promote_waitlist task for the conference; transactional tasks
+    are only enqueued if the surrounding transaction commits.
+    """
+    addTask('/tasks/promote_waitlist',
+            {'websafeConferenceKey': conf_key.urlsafe()},
+            transactional=transactional)
+
+
+@ndb.transactional(xg=True)
+def _claimSeat(entry_key):
+    """Move one waitlisted user into the conference; returns False once
+    the conference has no seats left.
+    """
+    conf_key = entry_key.parent()
+    p_key = ndb.Key(Profile, entry_key.id())
+    a_key = attendanceKey(p_key, conf_key)
+    conf, entry, prof, attendance = ndb.get_multi(
+        [conf_key, entry_key, p_key, a_key])
+    if not conf or conf.seatsAvailable <= 0:
+        return False
+    if entry:
+        if prof:
+            attending = attendance or \
+                conf_key.urlsafe() in prof.conferenceKeysToAttend
+            changed = []
+            if hasLegacyLists(prof):
+                changed = moveLists(prof) + [prof]
+            # register user, take away one seat
+            if not attending:
+                conf.seatsAvailable -= 1
+                changed += [Attendance(key=a_key, conference=conf_key), conf]
+            ndb.put_multi(changed)
+        entry_key.delete()
+    return True
+
+
+def promoteWaitlist(conf_key, batch_size=WAITLIST_BATCH_SIZE):
+    """Promote up to batch_size waitlisted users, oldest first, while seats
+    are available; returns True if another batch may be promoted.
+    """
+    entry_keys = WaitlistEntry.query(ancestor=conf_key)\
+                              .order(WaitlistEntry.created)\
+                              .fetch(batch_size, keys_only=True)
+    for entry_key in entry_keys:
+        if not _claimSeat(entry_key):
+            return False
+    return len(entry_keys) == batch_size